@@ -45,14 +45,14 @@ class AutonomousVehicle(Movable):
         properties = {}
         properties["type"] = self.__class__.__name__
         properties["id"] = self.id
-        properties["gridCoordinates"] = self.getLocation().getGridCoordinates()
+        location = self.getLocationView()
+        properties["gridCoordinates"] = location.getGridCoordinates()
         properties["vehicle_type"] = self.vehicle_type
         # properties["nearPlaceables"] = self.nearPlaceablesCounter
         data["properties"] = properties
 
         geometry = {}
         geometry["type"] = "Point"
-        location = self.getLocation()
         geometry["coordinates"] = [location.getLongitude(), location.getLatitude(), location.getAltitude()]
         data["geometry"] = geometry
 
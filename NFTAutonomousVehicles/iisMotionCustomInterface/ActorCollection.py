@@ -13,10 +13,12 @@ from NFTAutonomousVehicles.utils.statistics import IncrementalEvent, MeanEvent,
 from src.city.ZoneType import ZoneType
 from src.common.CommonFunctions import CommonFunctions
 from src.common.FemtocellLoader import FemtocellLoader
+from src.city.grid.StaticActorIndex import StaticActorIndex
 from src.common.Location import Location
 from src.movement.LocationsTable import LocationsTable
 from src.movement.movementStrategies.MovementStrategyFactory import MovementStrategyFactory
 from src.movement.movementStrategies.MovementStrategyType import MovementStrategyType
+from src.movement.movementStrategies.MovementBackend import MovementBackend
 from src.placeable.movable.Drone import Drone
 from src.placeable.movable.Movable import Movable
 from src.placeable.movable.MovementActivity import MovementActivity
@@ -70,7 +72,8 @@ class ProposedRoute:
 
 class ActorCollection:
 
-    def __init__(self, name, map, ableOfMovement, movementStrategy, mapGrid, secondsPerTick):
+    def __init__(self, name, map, ableOfMovement, movementStrategy, mapGrid, secondsPerTick,
+                 movementBackend=MovementBackend.CUDA):
         self.name = name
         self.map = map
         self.ableOfMovement = ableOfMovement
@@ -78,20 +81,23 @@ class ActorCollection:
         self.actorSet = {}
         self.mapGrid = mapGrid
         self.secondsPerTick = secondsPerTick
+        self.movementBackend = movementBackend
 
         if isinstance(movementStrategy, MovementStrategyType):
             self.movementStrategy = MovementStrategyFactory().getStrategy(movementStrategy, self.locationsTable,
-                                                                        self.actorSet, self.map, self.mapGrid)
+                                                                        self.actorSet, self.map, self.mapGrid,
+                                                                        self.movementBackend)
         else:
             self.movementStrategy = movementStrategy(self.locationsTable, self.actorSet, self.map, self.mapGrid, None)
 
         self.attractors = []
         self.guiEnabled = False
         self.com = CommonFunctions()
+        self.staticIndex = None
         self.sinr_map = None
         self.epsilon = None
         self.a_star = AStarMetric(
-            self.map.driveGraph, self.secondsPerTick, self.mapGrid, None, None)
+            self.map.driveGraph, self.secondsPerTick, self.mapGrid, None, None, self.map.nodesByIdDict)
 
     def setGuiEnabled(self, value: bool) -> 'ActorCollection':
         self.guiEnabled = value
@@ -244,10 +250,7 @@ class ActorCollection:
 
                 for path, raw_path in path_utils.get_shortest_paths(
                     self.map, actor.getLocation(), newTargetLocation,
-                    break_condition=path_utils.break_condition_time(
-                        t_longest,
-                        actor_speed,
-                    )
+                    max_length=t_longest * actor_speed,
                 ):
                     proposed_route = self.getProposedRoute(path, actor, self.secondsPerTick, solver_collection_names)
                     proposed_route.index = proposed_routes_counter
@@ -462,18 +465,23 @@ class ActorCollection:
         solver_finder = SolverFinder(self.sinr_map, self.epsilon)
 
         timestamp = getDateTime()
+        tasks = []
         for actorId in self.locationsTable.getAllIds():
             vehicle: AutonomousVehicle = self.actorSet[int(actorId)]
+            tasks.append(Task(vehicle=vehicle, size_in_megabytes=vehicle.sample_task.size_in_megabytes,
+                              created_at=timestamp, limit_time=vehicle.sample_task.limit_time,
+                              deadline_at=timestamp + timedelta(seconds=vehicle.sample_task.limit_time),
+                              instruction_count=vehicle.sample_task.instruction_count,
+                              solving_time=vehicle.sample_task.solving_time))
+
+        # distances and SINR of all vehicles at all solvers are computed at once, solvers are then searched one task
+        # after another, so tasks received by solvers are visible to the following ones
+        non_signed_nfts = solver_finder.searchForTaskSolversClosest(self.mapGrid, tasks, solver_collection_names)
+        for task, non_signed_nft in zip(tasks, non_signed_nfts):
+            vehicle = task.vehicle
 
             Statistics().incremental_event(IncrementalEvent.GENERATED_TASK)
 
-            task = Task(vehicle=vehicle, size_in_megabytes=vehicle.sample_task.size_in_megabytes,
-                        created_at=timestamp, limit_time=vehicle.sample_task.limit_time,
-                        deadline_at=timestamp + timedelta(seconds=vehicle.sample_task.limit_time),
-                        instruction_count=vehicle.sample_task.instruction_count,
-                        solving_time=vehicle.sample_task.solving_time)
-
-            non_signed_nft = solver_finder.searchForTaskSolverClosest(self.mapGrid, task, solver_collection_names)
             # uplink = connection_handler.get_uplink_ue(vehicle.id)
             # if uplink is not None:
             #     processable = TaskConnectionProcessable(task, task.created_at)
@@ -543,7 +551,8 @@ class ActorCollection:
         locationPredictor = LocationPredictor()
         return locationPredictor.predictLocationsForNextIterations(self.map, self.getActorsInDestinations(),
                                                                           self.actorSet, self.secondsPerTick,
-                                                                          nuOfIterations, movementBackwardsAllowed)
+                                                                          nuOfIterations, movementBackwardsAllowed,
+                                                                          self.movementBackend)
 
     def addPlaceables(self, placeables) -> 'ActorCollection':
         """
@@ -601,10 +610,12 @@ class ActorCollection:
         @param withInitialMove: True/False make steps in random direction to leave the initial location
         @return: no return value
         """
-        for i in range(0, count):
+        vehicles = [AutonomousVehicle(self.locationsTable, self.map, vehicle_type) for i in range(0, count)]
+        for vehicle, row in zip(vehicles, self.locationsTable.insertNewActors(vehicles)):
+            vehicle.tableRow = row
+
+        for vehicle in vehicles:
             location = self.map.getRandomIntersectionNode()
-            vehicle = AutonomousVehicle(self.locationsTable, self.map, vehicle_type)
-            vehicle.tableRow = self.locationsTable.insertNewActor(vehicle)
             vehicle.setSpeed(20 * self.secondsPerTick)
             vehicle.setMap(self.map)
 
@@ -702,6 +713,23 @@ class ActorCollection:
             features.append(movable.getGeoStruct())
         return features
 
+    def getPositions(self):
+        """
+        @return: (N,2) view of latitudes and longitudes of all actors of this collection (no copy), rows are aligned
+        with getIds()
+        """
+        return self.locationsTable.getPositions()
+
+    def getIds(self):
+        return self.locationsTable.getIds()
+
+    def getLocationsFor(self, ids):
+        """
+        @param ids: ids of actors of this collection
+        @return: (len(ids),2) array of latitudes and longitudes of given actors
+        """
+        return self.locationsTable.getPositionsOf([self.actorSet[int(id)].tableRow for id in ids])
+
     def getActorsAtIntersections(self):
         return list(map(self.actorSet.get, self.locationsTable.getIdsAtIntersections()))
 
@@ -715,11 +743,21 @@ class ActorCollection:
         return self
 
     def getMovablesAtGridXY(self, x, y):
-        ids = self.locationsTable.getIdsAtGridXY(x, y)
-        movables = []
-        for id in ids:
-            movables.append(self.actorSet[id])
-        return movables
+        return [self.actorSet[id] for id in self.locationsTable.getIdsAtGridXY(x, y).tolist()]
+
+    def getStaticIndex(self):
+        """
+        :return: StaticActorIndex of actors of the collection (built on first use and after actors are added), None
+        if the collection is able of movement
+        """
+        if self.ableOfMovement:
+            return None
+        if self.staticIndex is None or self.staticIndex.locationsVersion != self.locationsTable.locationsVersion:
+            self.staticIndex = StaticActorIndex(self.locationsTable)
+        return self.staticIndex
+
+    def getActorsForRows(self, rows):
+        return [self.actorSet[id] for id in self.locationsTable.ids[rows].tolist()]
 
     def attractorEffects(self) -> 'ActorCollection':
         global DATETIME
@@ -4,6 +4,7 @@ from src.city.MapZone import MapZone
 from src.city.ZoneType import ZoneType
 from src.city.grid.MapGrid import MapGrid
 from src.common.Location import Location
+from src.movement.movementStrategies.MovementBackend import MovementBackend
 
 from src.common.CommonFunctions import CommonFunctions
 from src.common.FrontendServer import FrontendServer
@@ -18,14 +19,17 @@ class IISMotion:
 
     def __init__(self, radius, location, oneWayEnabled=False, removeDeadends=True, guiEnabled=False, gridRows=10,
                  secondsPerTick=1,
-                 locationLoggingEnabled=False):
+                 locationLoggingEnabled=False, precomputeRoutes=False, sourceGraphPath=None):
         '''
         Highest level class of simulated model
         @param guiEnabled: True/False enable GUI updates to JS frontend
         @param radius: import map in radius from location
         @param location: center location of map that will be imported
+        @param precomputeRoutes: True will answer shortest path queries from precomputed all pairs tables of the map
+        @param sourceGraphPath: pickled drive graph used instead of the map downloaded around the location
         '''
-        self.map = Map(radius=radius, location=location, oneWayEnabled=oneWayEnabled, removeDeadends=removeDeadends)
+        self.map = Map(radius=radius, location=location, oneWayEnabled=oneWayEnabled, removeDeadends=removeDeadends,
+                       precomputeRoutes=precomputeRoutes, sourceGraphPath=sourceGraphPath)
         self.com = CommonFunctions()
         self.movableCollectionsSet = {}
         self.guiEnabled = guiEnabled
@@ -46,8 +50,10 @@ class IISMotion:
     def setSecondsPerTick(self, secondsPerTick):
         self.secondsPerTick = secondsPerTick
 
-    def createActorCollection(self, name, ableOfMovement, movementStrategy) -> ActorCollection:
-        collection = ActorCollection(name, self.map, ableOfMovement, movementStrategy, self.mapGrid,self.secondsPerTick)
+    def createActorCollection(self, name, ableOfMovement, movementStrategy,
+                              movementBackend=MovementBackend.CUDA) -> ActorCollection:
+        collection = ActorCollection(name, self.map, ableOfMovement, movementStrategy, self.mapGrid,self.secondsPerTick,
+                                     movementBackend)
         self.movableCollectionsSet[name] = collection
         return collection
 
@@ -110,9 +116,11 @@ class IISMotion:
 
 
         for actor in movables:
-            location = actor.getLocation()
-            closest, distance = self.mapGrid.getClosestActorAndDistanceFrom(2, [toObjectsOfCollectionNamed], location)
-            if(distance<=distThreshold):
+            location = actor.getLocationView()
+            # rings of cells further than distThreshold are not searched
+            nearest = self.mapGrid.getNearestActors(1, [toObjectsOfCollectionNamed], location, distThreshold)
+            if(len(nearest) > 0):
+                closest, distance = nearest[0]
                 closest.incrementNearPlaceablesCounter()
 
         for key, actor in self.getActorCollection(toObjectsOfCollectionNamed).actorSet.items():
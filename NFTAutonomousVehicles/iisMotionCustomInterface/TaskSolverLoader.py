@@ -5,7 +5,6 @@ from src.placeable.stationary.FemtoCell import FemtoCell
 import requests
 import json
 import os
-import numpy as np
 import os.path
 
 
@@ -20,9 +19,7 @@ class TaskSolverLoader:
 
         while not success_condition(madeSolvers) and attempt < 20:
             attempt += 1
-            madeSolvers.reverse()
-            for s in madeSolvers:
-                locationsTable.table = np.delete(locationsTable.table, s.tableRow, 0)
+            locationsTable.deleteRows([s.tableRow for s in madeSolvers])
             madeSolvers = []
             locations = []
 
@@ -29,7 +29,7 @@ class SINRAwareMovementStrategy(PreloadedLocationsStrategy):
                                         self.map, best_route, shortest_route)
         Statistics().mean_event(MeanEvent.ROUTE_PROLONGATION, prolongation)
 
-        self.preloadLocationsDictForWalkable(walkable, dict_)
+        self.preloadLocationsDictForWalkable(walkable, dict_, location.osmnxNode)
 
         return best_route
 
@@ -37,12 +37,10 @@ class SINRAwareMovementStrategy(PreloadedLocationsStrategy):
         return
 
     def move(self):
-        for actorId in self.locationsTable.getAllIds():
-            walkable: Movable = self.movableSet[int(actorId)]
-            l: Location = self.getPreloadedLocation(walkable, simclock.getDateTime())
-            walkable.setLocation(l)
-
-            dest_node = walkable.getCurrentMovementActivity().destination.osmnxNode
-            if l.osmnxNode is not None and dest_node == l.osmnxNode:
-                walkable.setTargetReached(True)
-                walkable.removeFirstActivity()
\ No newline at end of file
+        # positions and target reached flags are written for the whole table at once,
+        # only vehicles that arrived to their destination are visited
+        arrived = self.moveAlongTrajectories()
+        for row in arrived:
+            walkable: Movable = self.movableSet[int(self.locationsTable.ids[row])]
+            walkable.removeFirstActivity()
+        return arrived
\ No newline at end of file
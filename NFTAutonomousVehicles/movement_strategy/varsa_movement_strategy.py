@@ -178,10 +178,7 @@ class VaRSARouteAlg(RouteAlg):
 
         for path, raw_path in path_utils.get_shortest_paths(
             self.map, source, dest,
-            break_condition=path_utils.break_condition_time(
-                t_longest,
-                speed_ms,
-            )
+            max_length=t_longest * speed_ms,
         ):
             # get "normalized path"
             normalized_path = path_utils.normalize_path(path, self.dist)
@@ -300,7 +297,7 @@ class RoutingAlgorithmMovementStrategy(PreloadedLocationsStrategy):
                                         self.map, best_route, shortest_route)
         Statistics().mean_event(MeanEvent.ROUTE_PROLONGATION, prolongation)
 
-        self.preloadLocationsDictForWalkable(walkable, dict_)
+        self.preloadLocationsDictForWalkable(walkable, dict_, location.osmnxNode)
 
         return best_route
 
@@ -308,15 +305,13 @@ class RoutingAlgorithmMovementStrategy(PreloadedLocationsStrategy):
         return
 
     def move(self):
-        for actorId in self.locationsTable.getAllIds():
-            walkable: Movable = self.movableSet[int(actorId)]
-            l: Location = self.getPreloadedLocation(walkable, simclock.getDateTime())
-            walkable.setLocation(l)
-
-            dest_node = walkable.getCurrentMovementActivity().destination.osmnxNode
-            if l.osmnxNode is not None and dest_node == l.osmnxNode:
-                walkable.setTargetReached(True)
-                walkable.removeFirstActivity()
+        # positions and target reached flags are written for the whole table at once,
+        # only vehicles that arrived to their destination are visited
+        arrived = self.moveAlongTrajectories()
+        for row in arrived:
+            walkable: Movable = self.movableSet[int(self.locationsTable.ids[row])]
+            walkable.removeFirstActivity()
+        return arrived
 
 
 
@@ -1,6 +1,7 @@
 from datetime import datetime, timedelta
-from typing import List, Tuple, Union
+from typing import Iterator, List, Tuple, Union
 from NFTAutonomousVehicles.utils.sinr_map import SINRMap
+from NFTAutonomousVehicles.utils.sinr_matrix import SINRMatrix
 
 from src.common.CommonFunctions import CommonFunctions
 from src.common.Location import Location
@@ -25,7 +26,8 @@ class SolverFinder:
             time_limit=task.limit_time,
             task_size_in_megabytes=task.size_in_megabytes)
 
-        solvers_list = mapGrid.getActorsInRadius(effective_radius, solver_collection_names, task.vehicle.getLocation())
+        vehicle_loc = task.vehicle.getLocationView()
+        solvers_list = mapGrid.getActorsInRadius(effective_radius, solver_collection_names, vehicle_loc)
         # if not solvers_list:
             # print(f"Could not find solver for {task.vehicle.getLocation().toString()} within radius of {effective_radius}m")
             # raise ValueError(f"Could not find solver for {task.vehicle.getLocation().toString()} within radius of {effective_radius}m")
@@ -33,8 +35,9 @@ class SolverFinder:
         start_timestamp = task.created_at
         for solver in solvers_list:
             # direct allocation attempt
-            single_transfer_time = self.com_solving.getTransferTimeInSeconds(task.vehicle.getLocation(), solver.getLocation(), task.size_in_megabytes)
-            transfer_rate = self.com_solving.getConnectionSpeedInMegabytesPerSecondBetweenLocations(task.vehicle.getLocation(), solver.getLocation())
+            solver_loc = solver.getLocationView()
+            single_transfer_time = self.com_solving.getTransferTimeInSeconds(vehicle_loc, solver_loc, task.size_in_megabytes)
+            transfer_rate = self.com_solving.getConnectionSpeedInMegabytesPerSecondBetweenLocations(vehicle_loc, solver_loc)
             end_timestamp = start_timestamp +timedelta(seconds=task.solving_time ) + timedelta(seconds=(2 * single_transfer_time))
             unsigned_nft = solver.getUnsignedNFT(start_timestamp, end_timestamp, task.instruction_count / task.solving_time, single_transfer_time, transfer_rate, task.vehicle)
             if unsigned_nft is not None:
@@ -54,7 +57,7 @@ class SolverFinder:
         effective_radius = 900
         epsilon_ratio = 1 - self.epsilon
 
-        vehicle_loc = task.vehicle.getLocation()
+        vehicle_loc = task.vehicle.getLocationView()
 
         potential_solvers = map_grid.getActorsInRadius(
             effective_radius,
@@ -115,7 +118,7 @@ class SolverFinder:
         effective_radius = 900
         epsilon_ratio = 1 - self.epsilon
 
-        vehicle_loc = task.vehicle.getLocation()
+        vehicle_loc = task.vehicle.getLocationView()
         potential_solvers = map_grid.getActorsInRadius(
             effective_radius,
             solver_collection_names,
@@ -160,6 +163,80 @@ class SolverFinder:
 
         return nft_unsigned
 
+    def searchForTaskSolversClosest(
+        self,
+        map_grid,
+        tasks: List[Task],
+        solver_collection_names,
+    ) -> Iterator[Union[None,NFT]]:
+        """Same as searchForTaskSolverClosest for every task, distances and
+        SINR of all vehicles at all solvers are computed at once.
+
+        Unsigned NFTs are yielded one by one, so capacity checks of later
+        tasks see tasks the caller sent to solvers for earlier ones.
+        """
+        effective_radius = 900
+        epsilon_ratio = 1 - self.epsilon
+
+        solvers = [
+            actor
+            for collection_name in solver_collection_names
+            for actor in map_grid.actorCollectionsSet[collection_name]
+                                 .actorSet.values()
+        ]
+        sinr_matrix = SINRMatrix(solvers).update(
+            [task.vehicle.getLocationView() for task in tasks],
+            interference_radius=effective_radius,
+        )
+        closest = sinr_matrix.closest_in_radius(effective_radius)
+
+        for row, task in enumerate(tasks):
+            if closest[row] < 0:
+                yield None
+                continue
+            solver = solvers[closest[row]]
+
+            start_timestamp = task.created_at
+            end_timestamp = start_timestamp + timedelta(seconds=task.limit_time)
+
+            relaxed_limit_time = task.limit_time * epsilon_ratio
+            relaxed_solving_time = task.solving_time * epsilon_ratio
+
+            max_single_transfer_time = (relaxed_limit_time - relaxed_solving_time) / 2
+            min_data_rate_mbps = task.size_in_megabytes / max_single_transfer_time
+
+            ips_required = task.instruction_count / relaxed_solving_time
+
+            result = bs_metrics(
+                solver,
+                task.vehicle.getLocationView(),
+                min_data_rate_mbps,
+                None,
+                ips_required,
+                (start_timestamp, end_timestamp),
+                self.sinr_map,
+                sinr_value=sinr_matrix.sinr[row, closest[row]],
+            )
+
+            if result is None:
+                yield None
+                continue
+
+            rbs, _, solver, datarate = result
+            transfer_time = task.size_in_megabytes / datarate
+
+            nft_unsigned = solver.getUnsignedNFT(
+                start_timestamp,
+                end_timestamp,
+                ips_required,
+                transfer_time,
+                datarate,
+                task.vehicle
+            )
+            nft_unsigned.reserved_rbs = rbs
+
+            yield nft_unsigned
+
 
     # def searchForBestProvidersUselessVersion(self, timestamps_locations, iismotion: IISMotion, collection_names, task: Task):
     #     #output in form of dictinary:  key:timestamp  value:nft
@@ -239,15 +316,21 @@ def bs_metrics(
     base_stations: List[TaskSolver],
     required_ips: float,
     timeinterval: Tuple[datetime, datetime],
-    sinr_map: SINRMap
+    sinr_map: SINRMap,
+    sinr_value: float = None
 ) -> Union[None, Tuple[int, TaskSolver, float, float]]:
+    """sinr_value is used instead of calculating SINR against base_stations
+    when the SINR map has no value at location (see SINRMatrix)."""
     if not bs.checkAvailableCapacityBetweenTimestamps(
             *timeinterval, required_ips):
         return None
 
     sinrval = sinr_map.get_from_bs_map_loc(location, bs.id)
     if sinrval == sinr_map.init_sinr_val:
-        sinrval = sinr.calculate_sinr(location, bs, base_stations)
+        if sinr_value is None:
+            sinrval = sinr.calculate_sinr(location, bs, base_stations)
+        else:
+            sinrval = float(sinr_value)
         sinr_map.update_bs_map_loc(location, sinrval, bs.id)
 
     if sinrval < -6.9:
@@ -1,5 +1,6 @@
-from collections import defaultdict
+from collections import OrderedDict, defaultdict
 import copy
+import sys
 import numpy as np
 from dataclasses import dataclass
 from datetime import datetime, timedelta
@@ -7,12 +8,13 @@ from functools import reduce
 from heapq import heappush, heappop
 from pickletools import stackslice
 from turtle import distance
-from typing import Any, DefaultDict, Dict, Generator, Iterator, List, NamedTuple, Set, Tuple, TypeVar, Union
+from typing import Any, DefaultDict, Dict, Generator, Iterator, List, NamedTuple, Optional, Set, Tuple, TypeVar, Union
 from NFTAutonomousVehicles.entities.AutonomousVehicle import AutonomousVehicle
 from NFTAutonomousVehicles.taskProcessing.NFT import NFT
 from NFTAutonomousVehicles.taskProcessing.SolverFinder import SolverFinder
 from NFTAutonomousVehicles.taskProcessing.Task import Task
 from NFTAutonomousVehicles.utils import path_utils
+from src.common import Distance
 from src.common.Location import Location
 import networkx as nx
 from src.city.grid.MapGrid import MapGrid
@@ -51,13 +53,22 @@ def add_tuples(a: M, b: M) -> M:
     return type(a)(*tuple(map(sum,zip(a,b))))
 
 
-def node_to_loc(graph: nx.Graph, node) -> Location:
+def node_to_loc(graph: nx.Graph, node, nodes_by_id: Optional[Dict[int, Location]] = None) -> Location:
+    """Location of the graph node, shared instance from nodes_by_id
+    (Map.nodesByIdDict) if it is available."""
+    if nodes_by_id is not None and node in nodes_by_id:
+        return nodes_by_id[node]
     lat, long = graph.nodes[node]['y'], graph.nodes[node]['x']
     return Location(lat, long, osmnxNode=node)
 
 
-def reconstruct_path(G: nx.Graph, came_from: Dict[Node, CameFromData], current: Node) -> Result:
-    total_path = [node_to_loc(G, current.osmnx_node)]
+def reconstruct_path(
+    G: nx.Graph,
+    came_from: Dict[Node, CameFromData],
+    current: Node,
+    nodes_by_id: Optional[Dict[int, Location]] = None,
+) -> Result:
+    total_path = [node_to_loc(G, current.osmnx_node, nodes_by_id)]
 
     nft_dict = {}
     loc_dict = {}
@@ -69,7 +80,7 @@ def reconstruct_path(G: nx.Graph, came_from: Dict[Node, CameFromData], current:
         loc_dict.update(current_data.location_dict)
 
         current = current_data.node
-        l = node_to_loc(G, current.osmnx_node)
+        l = node_to_loc(G, current.osmnx_node, nodes_by_id)
         total_path.insert(0, l)
 
     return Result(total_path, nft_dict, loc_dict)
@@ -83,11 +94,39 @@ class AStarMetric:
         map_grid: MapGrid,
         solver_coll_names: List[str],
         solver_finder: SolverFinder,
+        nodes_by_id: Optional[Dict[int, Location]] = None,
+        heuristic: str = 'manhattan',
+        heuristic_cache_bytes: int = 32 * 1024 * 1024,
     ) -> None:
+        """
+        Args:
+            heuristic (str): 'manhattan' (rotated manhattan distance, see
+                    manhattan_distances) or 'haversine' (great circle
+                    distance, a lower bound of the path length).
+            heuristic_cache_bytes (int): memory limit of heuristic tables,
+                    one table (distances of all nodes) is kept for each of
+                    the recently used destinations.
+        """
         self.graph = graph
+        self.nodes_by_id = nodes_by_id
         self.step = 0
         self.com = CommonFunctions()
-        self.cache_distance = {}
+        self.heuristic = heuristic
+        self.node_index = {node: i for i, node in enumerate(graph.nodes)}
+        self.node_latitudes = np.array(
+            [node_to_loc(graph, node, nodes_by_id).latitude
+             for node in graph.nodes], dtype=np.float64)
+        self.node_longitudes = np.array(
+            [node_to_loc(graph, node, nodes_by_id).longitude
+             for node in graph.nodes], dtype=np.float64)
+        # tables are lists of python floats, each node takes a list slot
+        # and a float object, not the 8 bytes of the float64 array
+        node_count = len(self.node_index)
+        table_bytes = (sys.getsizeof([0.0] * node_count)
+                       + node_count * sys.getsizeof(0.0))
+        self.max_heuristic_tables = max(
+            1, heuristic_cache_bytes // table_bytes)
+        self.heuristic_tables: 'OrderedDict[int, List[float]]' = OrderedDict()
         self.dt = dt
         self.map_grid = map_grid
         self.solver_coll_names: List[str] = solver_coll_names
@@ -120,7 +159,7 @@ class AStarMetric:
             current_node = heappop(stack)[-1]
 
             if current_node.osmnx_node == destination:
-                return reconstruct_path(self.graph, came_from, current_node)
+                return reconstruct_path(self.graph, came_from, current_node, self.nodes_by_id)
 
             for neighbor in self._neighbours(current_node, came_from):
                 g_metrics, neighbor_node, t_nft, t_loc = self.g(current_node, neighbor, vehicle)
@@ -150,8 +189,8 @@ class AStarMetric:
 
 
     def g(self, node1: Node, node2: int, vehicle: AutonomousVehicle) -> Tuple[Metrics, Node]:
-        node1_loc = node_to_loc(self.graph, node1.osmnx_node)
-        node2_loc = node_to_loc(self.graph, node2)
+        node1_loc = node_to_loc(self.graph, node1.osmnx_node, self.nodes_by_id)
+        node2_loc = node_to_loc(self.graph, node2, self.nodes_by_id)
 
         gen = path_utils.location_from_path_generator(
             [node1_loc, node2_loc], vehicle.getSpeed())
@@ -195,66 +234,77 @@ class AStarMetric:
         return Metrics(missing_nfts, rbs, dist), Node(node2, timestamp), timestamp_nft_dict, timestamp_location_dict
 
     def h(self, node: int, destination: int) -> Metrics:
-        key = (node,destination)
-
-        if key in self.cache_distance:
-            return Metrics(0, 0, self.cache_distance[key])
-        d = manhattan_dist(
-            node_to_loc(self.graph, node),
-            node_to_loc(self.graph, destination),
-        )
-        # d = self.com.getCuda2dDistance(
-        #     node_to_loc(self.graph, node),
-        #     node_to_loc(self.graph, destination),
-        # )
-        self.cache_distance[key] = d
-        return Metrics(0, 0, d)
-
-_com = CommonFunctions()
-def manhattan_dist(l1: Location, l2: Location, bearing_angle: float = 0):
-    # source: https://medium.com/@simplyjk/why-manhattan-distance-formula-doesnt-apply-to-manhattan-7db0ebb1c5f6
-
-    lat1, lon1 = [l1.latitude], [l1.longitude]
-    lat2, lon2 = [l2.latitude], [l2.longitude]
-
-    # Pickup coordinates
-    p = np.stack([lat1, lon1], axis = 1)
-
-    # Dropoff coordinates
-    d = np.stack([lat2, lon2], axis = 1)
-
-    theta1 = np.radians(-bearing_angle)
-    theta2 = np.radians(bearing_angle)
-
-    ## Rotation matrix
-    R1 = np.array([[np.cos(theta1), np.sin(theta1)],
-                   [-np.sin(theta1), np.cos(theta1)]]
-                 )
-    R2 = np.array([[np.cos(theta2), np.sin(theta2)],
-                   [-np.sin(theta2), np.cos(theta2)]]
-                 )
-
-    # Rotate Pickup and Dropoff coordinates by -29 degress in World2
-    pT = R1 @ p.T
-    dT = R1 @ d.T
-
-    # Coordinates of Hinge point in the rotated world
-    vT = np.stack((pT[0,:], dT[1,:]))
-    # Coordinates of Hinge point in the real world
-    v = R2 @ vT
-    """ Finally,
-
-    Manhattan distance
-            =
-    Haversine dist between Pickup & Hingept
-            +
-    Haversine dist between Hinge pt & Dropoff location
+        return Metrics(
+            0, 0, self.heuristic_table(destination)[self.node_index[node]])
+
+    def heuristic_table(self, destination: int) -> List[float]:
+        """Heuristic distances of all nodes (in order of graph nodes) to the
+        destination, computed at once and kept for recently used
+        destinations."""
+        table = self.heuristic_tables.get(destination)
+        if table is not None:
+            self.heuristic_tables.move_to_end(destination)
+            return table
+
+        dest_index = self.node_index[destination]
+        dest_lat = self.node_latitudes[dest_index]
+        dest_lon = self.node_longitudes[dest_index]
+        if self.heuristic == 'haversine':
+            distances = Distance.distancesFrom(
+                dest_lat, dest_lon, self.node_latitudes, self.node_longitudes,
+                Distance.DistanceMode.HAVERSINE)
+        else:
+            distances = manhattan_distances(
+                self.node_latitudes, self.node_longitudes, dest_lat, dest_lon)
+        # python floats, single values are read on every expansion
+        table = distances.tolist()
+
+        self.heuristic_tables[destination] = table
+        if len(self.heuristic_tables) > self.max_heuristic_tables:
+            self.heuristic_tables.popitem(last=False)
+        return table
+
+def manhattan_distances(
+    latitudes: np.ndarray,
+    longitudes: np.ndarray,
+    dest_latitude: float,
+    dest_longitude: float,
+    bearing_angle: float = 0,
+) -> np.ndarray:
+    """Manhattan distances of many points to a single destination.
+
+    Manhattan distance = haversine distance between the point and the
+    hinge point + haversine distance between the hinge point and the
+    destination, where the hinge point is the corner of the rectangle in
+    the world rotated by bearing_angle.
+    source: https://medium.com/@simplyjk/why-manhattan-distance-formula-doesnt-apply-to-manhattan-7db0ebb1c5f6
     """
-    origin_l = Location(p.T[0], p.T[1])
-    v_l = Location(v[0], v[1])
-    dest_l = Location(d.T[0], d.T[1])
-    return (_com.getCuda2dDistance(origin_l, v_l) +
-            _com.getCuda2dDistance(v_l, dest_l))
+    latitudes = np.asarray(latitudes, dtype=np.float64)
+    longitudes = np.asarray(longitudes, dtype=np.float64)
+    theta = np.radians(bearing_angle)
+    cos, sin = np.cos(theta), np.sin(theta)
+
+    # rotate points and destination by -bearing_angle
+    p_rot_lat = cos * latitudes - sin * longitudes
+    d_rot_lon = sin * dest_latitude + cos * dest_longitude
+
+    # hinge point (p_rot_lat, d_rot_lon) rotated back to the real world
+    hinge_lat = cos * p_rot_lat + sin * d_rot_lon
+    hinge_lon = -sin * p_rot_lat + cos * d_rot_lon
+
+    haversine = Distance.DistanceMode.HAVERSINE
+    return (Distance.sphericalDistances(
+                latitudes, longitudes, hinge_lat, hinge_lon, haversine)
+            + Distance.sphericalDistances(
+                hinge_lat, hinge_lon, dest_latitude, dest_longitude,
+                haversine))
+
+
+def manhattan_dist(l1: Location, l2: Location, bearing_angle: float = 0):
+    """Manhattan distance of two locations (see manhattan_distances)."""
+    return float(manhattan_distances(
+        [l1.latitude], [l1.longitude], l2.latitude, l2.longitude,
+        bearing_angle)[0])
 
 class AStar:
     def __init__(self, graph, g, h) -> None:
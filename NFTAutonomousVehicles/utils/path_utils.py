@@ -1,8 +1,10 @@
 from datetime import datetime, timedelta
 import math
-from typing import Any, Callable, Dict, Generator, Tuple, Union, List
+from typing import Any, Callable, Dict, Generator, Optional, Tuple, Union, List
 import functools
+import itertools
 import networkx as nx
+import numpy as np
 import osmnx as ox
 import matplotlib.pyplot as plt
 
@@ -113,7 +115,10 @@ def path_time(map: Map, path, speed, weight='length') -> float:
         return 0
     if isinstance(path[0], Location):
         path = to_raw_path(path)
-    length = nx.path_weight(map.driveGraph, path, weight=weight)
+    if weight == 'length':
+        length = map.getPathLength(path)
+    else:
+        length = nx.path_weight(map.driveGraph, path, weight=weight)
     return length / speed
 
 def path_length_diff(map: Map, path1, path2, weight='length') -> float:
@@ -131,18 +136,19 @@ def break_condition_time(
     return fun
 
 
-def convert_path(map: Map, path) -> List[Location]:
-    """Convert nx path to "list of locations path" """
-    nodes = map.gdfNodes.loc[path]
-    loc_list = []
-    for i in range(0, len(nodes.index)): # preco bolo od 1??
-        node = nodes.iloc[i]
-        loc = Location()
-        loc.setLatitude(node['y'])
-        loc.setLongitude(node['x'])
-        loc.osmnxNode = nodes.index.get_level_values(0).values[i]
-        loc_list.append(loc)
-    return loc_list
+def convert_path(
+    map: Map, path, as_arrays: bool = False
+) -> Union[List[Location], Tuple[np.ndarray, np.ndarray]]:
+    """Convert nx path to "list of locations path" (shared node locations,
+    see Map.getNodeLocation).
+
+    Args:
+        map (Map): Map.
+        path (list): nx path (list of nodes ids).
+        as_arrays (bool, optional): Return arrays of latitudes and
+            longitudes instead of locations. Defaults to False.
+    """
+    return map.getLocationsOfNodes(path, asArrays=as_arrays)
 
 
 def to_raw_path(locs: List[Location]) -> list:
@@ -160,8 +166,9 @@ def get_shortest_path(
     orig_node = map.getNearestNode(orig)
     dest_node = map.getNearestNode(dest)
 
-    p = ox.shortest_path(map.driveGraph, orig_node, dest_node)
-    return convert_path(map, p), p
+    path_indexes, _ = map.getShortestPathIndexes(orig_node, dest_node)
+    p = map.routingEngine.nodeIds[path_indexes].tolist()
+    return map.getLocationsOfNodeIndexes(path_indexes), p
 
 
 def get_shortest_paths(
@@ -169,7 +176,8 @@ def get_shortest_paths(
     orig: Location,
     dest: Location,
     break_condition=None,
-    k=None
+    k=None,
+    max_length: Optional[float] = None,
 ) -> Generator[Tuple[List[Location], list], None, None]:
     """Get shortest paths from origin to destination.
 
@@ -180,20 +188,40 @@ def get_shortest_paths(
         break_condition ([type], optional): Function that defines break
             condition. Defaults to None.
         k ([type], optional): [description]. Max number of paths to be yielded.
+        max_length (Optional[float], optional): Paths longer than max_length
+            (metres) are neither searched for nor yielded. Defaults to None.
 
     Yields:
         Generator[Tuple[List[Location], list], None, None]:
             The next shortest path
     """
+    for path, _ in get_shortest_paths_with_lengths(
+        map, orig, dest, break_condition, k, max_length
+    ):
+        yield convert_path(map, path), path
+
+
+def get_shortest_paths_with_lengths(
+    map: Map,
+    orig: Location,
+    dest: Location,
+    break_condition=None,
+    k=None,
+    max_length: Optional[float] = None,
+) -> Generator[Tuple[list, float], None, None]:
+    """Same as get_shortest_paths, but yields nx paths (lists of nodes ids)
+    with their lengths in metres (see RoutingEngine.iterateShortestPaths)."""
     orig_node = map.getNearestNode(orig)
     dest_node = map.getNearestNode(dest)
 
-    for path in ox.k_shortest_paths(map.driveGraph, orig_node, dest_node, k=k):
+    paths = map.routingEngine.iterateShortestPaths(
+        orig_node, dest_node, max_length)
+    for path, length in itertools.islice(paths, k):
 
         if break_condition is not None and break_condition(map, path):
             break
 
-        yield convert_path(map, path), path
+        yield path, length
 
 
 def location_from_path_generator(
@@ -1,52 +1,84 @@
 import math
+import numpy as np
 from src.common.Location import Location
-from typing import Any, List, Tuple
+from typing import Any, List, Tuple, Union
 from src.common.CommonFunctions import CommonFunctions
 
 
 __com = CommonFunctions()
 __m_kHZ = -87.55
+# k * T  : k - boltzmann constant, T - room temperature in kelvin
+kT = 4.002e-21
+# added to interference in W before conversion to dBm, so it is never log of 0
+min_interference_w = 1e-26
 
 def calculate_sinr(
     location: Location,
     gNB,
     other_gNBs: list
 ) -> float:
+    distance = __com.getReal2dDistance(location, gNB.getLocationView())
+    distances = __com.getReal2dDistances(
+        location,
+        [gNB_inter.getLocationView() for gNB_inter in other_gNBs]
+    )
+    return sinr_from_distances(gNB, distance, other_gNBs, distances)
+
+
+def sinr_from_distances(
+    gNB,
+    distance: float,
+    other_gNBs: list,
+    distances: np.ndarray
+) -> float:
+    """
+    SINR of gNB at a location with already known distances of the location
+    to gNB and to other_gNBs (computed at once, see
+    CommonFunctions.getReal2dDistances).
+
+    Args:
+        gNB: serving base station.
+        distance (float): distance to gNB in metres.
+        other_gNBs (list): base stations that may interfere.
+        distances (np.ndarray): distances to other_gNBs in metres.
+
+    Returns:
+        float: SINR value
+    """
     eps = 1
-    distance = max(eps, __com.getReal2dDistance(location, gNB.getLocation()))
+    distance = max(eps, distance)
     # fspl = free_space_path_loss(distance, gNB.Tx_frequency)
     cpl = city_path_loss(distance/1000)
-    # print('fspl', fspl)
-    # print('cpl', cpl)
 
     S = (w_to_dbm(gNB.tx_power) - cpl)
     # I = w_to_dbm(1e-19)
     I = 0
 
-    for gNB_inter in other_gNBs:
-        if gNB_inter.id == gNB.id:
-            continue #skip the one we use
-
-        if gNB_inter.tx_frequency != gNB.tx_frequency:
-            #skip even if the frequency is not the same - interference is ~0
-            continue
-
-        distance = max(
-            eps,
-            __com.getReal2dDistance(location, gNB_inter.getLocation())
-        )
-
-        if distance <= gNB_inter.association_coverage_radius:
-            # fspl = free_space_path_loss(distance, gNB_inter.Tx_frequency)
-            cpl = city_path_loss(distance/1000)
-
-            # I += w_to_dbm(gNB_inter.Tx_power) - cpl
-            I += dbm_to_w(w_to_dbm(gNB_inter.tx_power) - cpl)
+    if len(other_gNBs) > 0:
+        distances = np.maximum(eps, distances)
+        # skip the one we use and those with another frequency - interference
+        # is ~0, and those out of their coverage
+        interfering = np.array([
+            gNB_inter.id != gNB.id
+            and gNB_inter.tx_frequency == gNB.tx_frequency
+            for gNB_inter in other_gNBs
+        ])
+        coverage = np.array([
+            gNB_inter.association_coverage_radius for gNB_inter in other_gNBs
+        ])
+        interfering &= distances <= coverage
+        if interfering.any():
+            tx_power = np.array([
+                gNB_inter.tx_power for gNB_inter in other_gNBs
+            ])[interfering]
+            cpl = city_path_loss(distances[interfering] / 1000)
+            # sum of dbm_to_w(w_to_dbm(tx_power) - cpl) of interfering gNBs
+            I = float(np.sum(
+                np.power(10, (10 * np.log10(tx_power * 1000) - cpl) / 10) / 1000
+            ))
 
-    # k * T  : k - boltzmann constant, T - room temperature in kelvin
-    kT = 4.002e-21
     N = w_to_dbm(kT * gNB.bandwidth)
-    I = w_to_dbm(I+1e-26)
+    I = w_to_dbm(I+min_interference_w)
     return sinr_ltecalc(S, N, I)
 
 
@@ -67,9 +99,12 @@ def free_space_path_loss(distance: float, frequency: float):
     return (20*math.log10(distance) + 20*math.log10(frequency/1000) + __m_kHZ)
 
 
-def city_path_loss(distance: float):
+def city_path_loss(
+    distance: Union[float, np.ndarray]
+) -> Union[float, np.ndarray]:
+    """Path loss in dB at distance in km, element-wise for arrays."""
     #TODO use frequency
-    return 128.1+37.6*math.log10(distance)
+    return 128.1+37.6*np.log10(distance)
 
 
 def calculate_highest_sinr(
@@ -88,13 +123,16 @@ def calculate_highest_sinr(
         Tuple[float, BaseStationVirtual]: SINR value, respective BS
     """
     best = -1000, None
-    for b in base_stations:
-        dist = __com.getCuda2dDistance(l, b.getLocation())
+    distances = __com.getReal2dDistances(
+        l,
+        [b.getLocationView() for b in base_stations]
+    )
+    for b, dist in zip(base_stations, distances.tolist()):
         if b.association_coverage_radius < dist:
             continue
 
-        s = calculate_sinr(l, b, base_stations)
+        s = sinr_from_distances(b, dist, base_stations, distances)
 
         if s > best[0]:
             best = s, b
-    return best
\ No newline at end of file
+    return best
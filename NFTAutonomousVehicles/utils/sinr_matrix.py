@@ -0,0 +1,127 @@
+from typing import Union
+import numpy as np
+
+from NFTAutonomousVehicles.utils import sinr
+from src.common import Distance
+
+
+class SINRMatrix:
+    """Distance, path loss, received power and SINR of all vehicles (rows) at
+    all base stations (columns), computed at once for the current step.
+    Radio model (path loss, noise, interference floor) is the one of
+    sinr.calculate_sinr."""
+
+    def __init__(self, base_stations: list) -> None:
+        """
+        Args:
+            base_stations (list): base stations (columns of the matrices),
+                    their radio parameters are read once.
+        """
+        self.base_stations = list(base_stations)
+        self.column_by_id = {
+            bs.id: column for column, bs in enumerate(self.base_stations)
+        }
+        self.bs_latitudes = np.array(
+            [bs.getLocationView().getLatitude() for bs in self.base_stations],
+            dtype=np.float64
+        )
+        self.bs_longitudes = np.array(
+            [bs.getLocationView().getLongitude() for bs in self.base_stations],
+            dtype=np.float64
+        )
+        self.tx_power = np.array(
+            [bs.tx_power for bs in self.base_stations], dtype=np.float64)
+        self.tx_frequency = np.array(
+            [bs.tx_frequency for bs in self.base_stations], dtype=np.float64)
+        self.coverage = np.array(
+            [bs.association_coverage_radius for bs in self.base_stations],
+            dtype=np.float64
+        )
+        self.noise_w = sinr.kT * np.array(
+            [bs.bandwidth for bs in self.base_stations], dtype=np.float64)
+
+        # gNBs interfere only with gNBs on the same frequency (never with
+        # themselves), interference from another frequency is ~0
+        ids = [bs.id for bs in self.base_stations]
+        self.same_frequency = (
+            (self.tx_frequency[:, None] == self.tx_frequency[None, :])
+            & (np.array(ids, dtype=object)[:, None]
+               != np.array(ids, dtype=object)[None, :])
+        ).astype(np.float64)
+
+        self.distances = np.zeros((0, len(self.base_stations)))
+        self.path_loss = np.zeros((0, len(self.base_stations)))
+        self.rx_power_w = np.zeros((0, len(self.base_stations)))
+        self.sinr = np.zeros((0, len(self.base_stations)))
+
+    def update(
+        self,
+        locations: list,
+        interference_radius: Union[float, None] = None
+    ) -> 'SINRMatrix':
+        """Recalculate all matrices for locations (rows).
+
+        SINR at a row and column is the same value sinr.calculate_sinr
+        returns for the base station, when interfering base stations are the
+        ones closer than interference_radius (all when None).
+
+        Args:
+            locations (list): Locations of vehicles.
+            interference_radius (Union[float, None]): base stations further
+                    than this from a vehicle do not interfere.
+
+        Returns:
+            SINRMatrix: self
+        """
+        latitudes, longitudes = Distance.locationsToArrays(locations)
+        self.distances = Distance.distanceMatrix(
+            latitudes, longitudes, self.bs_latitudes, self.bs_longitudes)
+
+        eps = 1
+        distances = np.maximum(eps, self.distances)
+        self.path_loss = sinr.city_path_loss(distances / 1000)
+        # dbm_to_w(w_to_dbm(tx_power) - path_loss)
+        self.rx_power_w = self.tx_power[None, :] * np.power(
+            10, -self.path_loss / 10)
+
+        interfering = distances <= self.coverage[None, :]
+        if interference_radius is not None:
+            interfering &= self.distances < interference_radius
+        interference_w = (
+            np.where(interfering, self.rx_power_w, 0) @ self.same_frequency)
+
+        # sinr_ltecalc(S, N, I) with S, N, I converted back to watts
+        self.sinr = 10 * np.log10(
+            self.rx_power_w
+            / (self.noise_w[None, :] + interference_w
+               + sinr.min_interference_w)
+        )
+        return self
+
+    def column(self, bs) -> int:
+        return self.column_by_id[bs.id]
+
+    def get_sinr(self, row: int, bs) -> float:
+        return float(self.sinr[row, self.column(bs)])
+
+    def get_distance(self, row: int, bs) -> float:
+        return float(self.distances[row, self.column(bs)])
+
+    def closest_in_radius(self, radius: float) -> np.ndarray:
+        """Column of the closest base station closer than radius for every
+        row, -1 when there is none"""
+        if self.distances.shape[1] == 0:
+            return np.full(self.distances.shape[0], -1)
+        masked = np.where(self.distances < radius, self.distances, np.inf)
+        closest = masked.argmin(axis=1)
+        return np.where(np.isfinite(masked.min(axis=1)), closest, -1)
+
+    def best_in_coverage(self) -> np.ndarray:
+        """Column of the base station with the highest SINR within its
+        coverage for every row, -1 when no base station covers the row"""
+        if self.sinr.shape[1] == 0:
+            return np.full(self.sinr.shape[0], -1)
+        masked = np.where(
+            self.distances <= self.coverage[None, :], self.sinr, -np.inf)
+        best = masked.argmax(axis=1)
+        return np.where(np.isfinite(masked.max(axis=1)), best, -1)
@@ -56,10 +56,7 @@ class SINRRouteALG:
 
         for path, raw_path in path_utils.get_shortest_paths(
             self.map, l1, l2,
-            break_condition=path_utils.break_condition_time(
-                t_longest,
-                vehicle_speed_ms,
-            )
+            max_length=t_longest * vehicle_speed_ms,
         ):
             # get "normalized path"
             normalized_path = path_utils.normalize_path(path, self.dist)
@@ -167,7 +167,8 @@ def main_run(config_dict: Dict[str, Any]):
                         guiEnabled=guiEnabled,
                         gridRows=gridRows,
                         secondsPerTick=secondsPerTick,
-                        removeDeadends=True
+                        removeDeadends=True,
+                        sourceGraphPath="iism_cache/driveGraphCache/middleMap.pkl"
                         )  # initialize IISMotion
 
     map_grid = iismotion.mapGrid
@@ -304,6 +305,7 @@ def main_run(config_dict: Dict[str, Any]):
         elapsed = end - start
         print("================== Simulation finished ===================")
         print("elapsed time:", elapsed)
+        print(iismotion.map.routeCache)
         nonlocal sim_time
         sim_time = elapsed
 
@@ -53,9 +53,8 @@ class Building():
             self.height = 0
 
     def pointInBuilding(self, testPoint=Location):
-        poly = Polygon(self.getTupleNodeLocations())
         point = self.com.getPointFromLocation(testPoint)
-        return point.within(poly)
+        return point.within(self.getGeometryShapely())
 
 
     def getGeoJson(self):
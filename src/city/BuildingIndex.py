@@ -0,0 +1,85 @@
+import numpy
+import shapely
+from shapely.geometry import Point
+from shapely.strtree import STRtree
+
+# shapely 2 queries the tree with arrays of geometries and predicates, shapely 1 returns candidate geometries only
+SHAPELY_2 = hasattr(shapely, "points")
+
+
+class BuildingIndex:
+
+    def __init__(self, buildings):
+        '''
+        STRtree over polygons of buildings (cached on buildings, see Building.getGeometryShapely) and over their
+        centroids. Coordinates are (latitude, longitude) pairs, same as everywhere else in the Map. When buildings
+        overlap, the first one in the list of buildings is returned, same as a loop over buildings would.
+        :param buildings: list of Building objects
+        '''
+        self.buildings = buildings
+        self.polygons = [building.getGeometryShapely() for building in buildings]
+        self.centroids = [Point(building.getCentroid().getLatitude(), building.getCentroid().getLongitude())
+                          for building in buildings]
+        self.polygonTree = STRtree(self.polygons)
+        self.centroidTree = STRtree(self.centroids)
+        if not SHAPELY_2:
+            self.polygonIndexes = {id(polygon): index for index, polygon in enumerate(self.polygons)}
+            self.centroidIndexes = {id(centroid): index for index, centroid in enumerate(self.centroids)}
+
+    def getBuildingIndexesAt(self, latitudes, longitudes):
+        '''
+        index of the first building containing the point for every point (-1 when the point is not in any building)
+        :return: numpy array of indexes into buildings
+        '''
+        latitudes = numpy.asarray(latitudes, dtype=numpy.float64)
+        longitudes = numpy.asarray(longitudes, dtype=numpy.float64)
+        result = numpy.full(len(latitudes), -1, dtype=numpy.int64)
+        if len(latitudes) == 0 or len(self.buildings) == 0:
+            return result
+
+        if SHAPELY_2:
+            points, buildings = self.polygonTree.query(shapely.points(latitudes, longitudes), predicate="within")
+            # reversed assignment leaves the smallest building index for points inside of more buildings
+            order = numpy.argsort(buildings, kind="stable")[::-1]
+            result[points[order]] = buildings[order]
+            return result
+
+        for i in range(len(latitudes)):
+            point = Point(latitudes[i], longitudes[i])
+            candidates = [self.polygonIndexes[id(polygon)] for polygon in self.polygonTree.query(point)]
+            for index in sorted(candidates):
+                if point.within(self.polygons[index]):
+                    result[i] = index
+                    break
+        return result
+
+    def getBuildingAt(self, location):
+        '''
+        :return: first building containing the location, None if there is no such building
+        '''
+        index = self.getBuildingIndexesAt([location.getLatitude()], [location.getLongitude()])[0]
+        if index < 0:
+            return None
+        return self.buildings[index]
+
+    def getBuildingsAt(self, latitudes, longitudes):
+        '''
+        batch version of getBuildingAt
+        :return: list of buildings (None for points outside of buildings)
+        '''
+        return [self.buildings[index] if index >= 0 else None
+                for index in self.getBuildingIndexesAt(latitudes, longitudes).tolist()]
+
+    def getBuildingsWithCentroidIn(self, polygon):
+        '''
+        :param polygon: shapely polygon of (latitude, longitude) coordinates
+        :return: buildings with centroid inside of the polygon, in the order of buildings
+        '''
+        if len(self.buildings) == 0:
+            return []
+        if SHAPELY_2:
+            indexes = numpy.sort(self.centroidTree.query(polygon, predicate="contains")).tolist()
+        else:
+            indexes = sorted(self.centroidIndexes[id(centroid)] for centroid in self.centroidTree.query(polygon)
+                             if centroid.within(polygon))
+        return [self.buildings[index] for index in indexes]
@@ -7,19 +7,28 @@ import pandas as pd
 import pickle
 import random
 
+import numpy
+from scipy.spatial import cKDTree
+
+from src.city.MapCache import MapCache
 from src.city.MapEdge import MapEdge
 from src.city.MapZone import MapZone
+from src.city.RouteCache import RouteCache
+from src.city.RouteTable import RouteTable
+from src.city.RoutingEngine import RoutingEngine
 from src.city.ZoneType import ZoneType
 from src.common.CommonFunctions import CommonFunctions
-from src.common.Location import Location
+from src.common.Location import Location, FrozenLocation
 from src.city.Building import Building
+from src.city.BuildingIndex import BuildingIndex
 from os import path
 from random import randrange
 
 
 class Map:
 
-    def __init__(self, radius, location: Location, oneWayEnabled=False, removeDeadends=True):
+    def __init__(self, radius, location: Location, oneWayEnabled=False, removeDeadends=True, precomputeRoutes=False,
+                 sourceGraphPath=None):
         """
         Map class is a "wrapper" for osmnx package functionality
         :param radius:          radius of downloaded map
@@ -28,57 +37,176 @@ class Map:
                                 oneWayEnabled=False enables actors to move one-way roads the opposite way, we use it
                                 because agents got stuck at the edges of map on one-ways if enabled
         :param removeDeadends:  True will remove all map nodes that are part of a single edge
+        :param precomputeRoutes: True will answer shortest path queries from all pairs tables stored next to the map
+                                cache (see RouteTable), suitable for maps with a few thousand nodes
+        :param sourceGraphPath: path of a pickled drive graph (e.g. iism_cache/driveGraphCache/middleMap.pkl) used as
+                                it is instead of the map downloaded around the location
         """
         ox.config(use_cache=True, log_console=False)
         print("Osmnx version: " + ox.__version__)
         self.oneWayEnabled = oneWayEnabled
         self.removeDeadends = removeDeadends
         self.comm = CommonFunctions()
-        self.gdfBuildings = ox.geometries_from_point((location.latitude, location.longitude), tags={"building": True},
-                                                     dist=radius)
-        self.buildings = self.parseBuildings(self.gdfBuildings)
-
-        # attempt to load driveGraph from cache
-        cacheDriveGraphFilename = f"loc={location.toString()}__r={radius}__ow={oneWayEnabled}__rd={removeDeadends}"
-        # self.driveGraph = self.loadDriveGraphFromCache(filename=cacheDriveGraphFilename)
-
-        self.driveGraph = self.loadDriveGraphFromCache(filename="middleMap")
-        # fig, ax = ox.plot_graph(self.driveGraph, figsize=(10, 10), node_size=1.5, edge_linewidth=1.0, save=True,
-        #                         show=False, filepath=f"iism_cache/driveGraphCache/manhattan_map.png")
-        if (self.driveGraph is None):
-            self.driveGraph = ox.graph_from_point((location.latitude, location.longitude), dist=radius,
-                                                  network_type='drive', simplify=False)
-            if (oneWayEnabled == False):
-                self.driveGraph = self.driveGraph.to_undirected()
-            self.gdfNodes, self.gdfEdges = ox.graph_to_gdfs(self.driveGraph)
-            self.intersections_by_coordinates, self.intersections_by_id = self.getIntersectionDicts(self.gdfNodes)
-            self.nodesByCoordinatesDict, self.nodesByIdDict = self.getNodeDicts(self.gdfNodes)
-            self.edgesByNodeIdDict, self.edgesByIdDict = self.getMapEdgesForEachNode(self.gdfEdges,
-                                                                                     self.nodesByIdDict)
-            if removeDeadends:
-                self.driveGraph = self.removeDeadEnds(self.driveGraph)
-                self.gdfNodes, self.gdfEdges = ox.graph_to_gdfs(self.driveGraph)
-                self.intersections_by_coordinates, self.intersections_by_id = self.getIntersectionDicts(self.gdfNodes)
-                self.nodesByCoordinatesDict, self.nodesByIdDict = self.getNodeDicts(self.gdfNodes)
-                self.edgesByNodeIdDict, self.edgesByIdDict = self.getMapEdgesForEachNode(self.gdfEdges,
-                                                                                         self.nodesByIdDict)
-            self.storeDriveGraphToCache(driveGraph=self.driveGraph, filename=cacheDriveGraphFilename)
-
+        self.buildingIndex = None
+        self.location = location
+        self.radius = radius
+
+        # fully preprocessed map is loaded from the map cache when available (no osmnx calls are needed then)
+        self.mapCache = MapCache(location, radius, oneWayEnabled, removeDeadends, sourceGraphPath=sourceGraphPath,
+                                 preprocessing=[self.removeDeadEnds, self.createMapArrays])
+        # buildings are not stored as geodataframe in the map cache, see plotCity
+        self.gdfBuildings = None
+        # drive graph of a cached map is created on first use, see driveGraph
+        self.loadedDriveGraph = None
+        cachedMap = self.mapCache.load()
+        if cachedMap is not None:
+            self.buildings, mapArrays, edgeColumns = cachedMap
         else:
-            self.gdfNodes, self.gdfEdges = ox.graph_to_gdfs(self.driveGraph)
-            self.intersections_by_coordinates, self.intersections_by_id = self.getIntersectionDicts(self.gdfNodes)
-            self.nodesByCoordinatesDict, self.nodesByIdDict = self.getNodeDicts(self.gdfNodes)
-            self.edgesByNodeIdDict, self.edgesByIdDict = self.getMapEdgesForEachNode(self.gdfEdges,
-                                                                                     self.nodesByIdDict)
-
-        self.latitudeInterval = [self.gdfNodes['y'].min(), self.gdfNodes['y'].max()]
-        self.longitudeInterval = [self.gdfNodes['x'].min(), self.gdfNodes['x'].max()]
+            self.gdfBuildings = self.downloadBuildings(location, radius)
+            self.buildings = self.parseBuildings(self.gdfBuildings)
+
+            if sourceGraphPath is not None:
+                driveGraph = self.loadDriveGraph(sourceGraphPath)
+                # fig, ax = ox.plot_graph(driveGraph, figsize=(10, 10), node_size=1.5, edge_linewidth=1.0, save=True,
+                #                         show=False, filepath=f"iism_cache/driveGraphCache/manhattan_map.png")
+            else:
+                driveGraph = ox.graph_from_point((location.latitude, location.longitude), dist=radius,
+                                                 network_type='drive', simplify=False)
+                if (oneWayEnabled == False):
+                    driveGraph = driveGraph.to_undirected()
+                if removeDeadends:
+                    driveGraph = self.removeDeadEnds(driveGraph)
+                cacheDriveGraphFilename = f"loc={location.toString()}__r={radius}__ow={oneWayEnabled}__rd={removeDeadends}"
+                self.storeDriveGraphToCache(driveGraph=driveGraph, filename=cacheDriveGraphFilename)
+            mapArrays, edgeColumns = self.createMapArrays(driveGraph)
+            self.mapCache.store(driveGraph, mapArrays, edgeColumns, self.buildings)
+            self.loadedDriveGraph = driveGraph
+
+        self.buildMapStructures(mapArrays, edgeColumns)
+        self.routeCache = RouteCache()
+        self.routeTable = None
+        if precomputeRoutes:
+            self.routeTable = RouteTable(self.routingEngine, self.mapCache.cacheDir, self.mapCache.key)
+
         print("MAP INTERVALS: ")
         print("Latitude interval: ", self.latitudeInterval)
         print("Longitudeinterval: ", self.longitudeInterval)
         self.mapZones = {}
         self.mapGrid = None
 
+    @property
+    def driveGraph(self):
+        """
+        networkx drive graph of the map, Map itself works with arrays, so a map loaded from the map cache creates
+        the graph only when it is used
+        """
+        if self.loadedDriveGraph is None:
+            self.loadedDriveGraph = self.mapCache.loadDriveGraph()
+        return self.loadedDriveGraph
+
+    def createMapArrays(self, driveGraph):
+        """
+        extracts everything the map is built from (see buildMapStructures) from the preprocessed drive graph into
+        arrays, which are stored in the map cache, so a cached map needs no osmnx or networkx work
+        nodes and edges are in order of the graph (same as ox.graph_to_gdfs), edges without geometry get a straight
+        line between their nodes (same as osmnx)
+        :param driveGraph: preprocessed drive graph
+        :return: dictionary of numpy arrays, dictionary of lists of non numeric edge attributes
+        """
+        nodes = list(driveGraph.nodes(data=True))
+        nodeIds = numpy.array([nodeId for nodeId, _ in nodes], dtype=numpy.int64)
+        nodeLatitudes = numpy.array([data['y'] for _, data in nodes], dtype=numpy.float64)
+        nodeLongitudes = numpy.array([data['x'] for _, data in nodes], dtype=numpy.float64)
+        nodeIsIntersection = numpy.array([data.get('street_count', 0) > 2 for _, data in nodes], dtype=bool)
+
+        edges = list(driveGraph.edges(keys=True, data=True))
+        nodePositions = pd.Index(nodeIds.tolist())
+        firstPositions = nodePositions.get_indexer([u for u, _, _, _ in edges])
+        secondPositions = nodePositions.get_indexer([v for _, v, _, _ in edges])
+        geometries = [numpy.asarray(data['geometry'].coords, dtype=numpy.float64).reshape(-1, 2)
+                      if 'geometry' in data else
+                      numpy.array([(nodeLongitudes[first], nodeLatitudes[first]),
+                                   (nodeLongitudes[second], nodeLatitudes[second])], dtype=numpy.float64)
+                      for (_, _, _, data), first, second in zip(edges, firstPositions, secondPositions)]
+        geometryOffsets = self.mapCache.getOffsets(geometries)
+        geometryCoords = self.mapCache.concatenate(geometries)
+
+        # nodes at the ends of geometries, the ends are the nodes of the edge unless the geometry was stored in the
+        # opposite direction (see getEdgeEndNodeId)
+        nodesByCoordinates, _ = self.getNodeDicts(nodeIds, nodeLatitudes, nodeLongitudes)
+        edgeStartNodes = self.getEdgeEndNodeIds(geometryCoords[geometryOffsets[:-1]], firstPositions, secondPositions,
+                                                nodeIds, nodeLatitudes, nodeLongitudes, nodesByCoordinates)
+        edgeEndNodes = self.getEdgeEndNodeIds(geometryCoords[geometryOffsets[:-1] + 1], secondPositions,
+                                              firstPositions, nodeIds, nodeLatitudes, nodeLongitudes,
+                                              nodesByCoordinates)
+
+        routingArrays = RoutingEngine.fromDriveGraph(driveGraph).getArrays()
+        mapArrays = {
+            "nodeIds": nodeIds,
+            "nodeLatitudes": nodeLatitudes,
+            "nodeLongitudes": nodeLongitudes,
+            "nodeIsIntersection": nodeIsIntersection,
+            "routeIndptr": routingArrays["indptr"],
+            "routeIndices": routingArrays["indices"],
+            "routeLengths": routingArrays["lengths"],
+            "routeDirected": numpy.array(routingArrays["directed"]),
+            "edgeFirstNodes": numpy.array([u for u, _, _, _ in edges], dtype=numpy.int64),
+            "edgeSecondNodes": numpy.array([v for _, v, _, _ in edges], dtype=numpy.int64),
+            "edgeKeys": numpy.array([key for _, _, key, _ in edges], dtype=numpy.int64),
+            "edgeStartNodes": edgeStartNodes,
+            "edgeEndNodes": edgeEndNodes,
+            "edgeLengths": numpy.array([data.get('length', numpy.nan) for _, _, _, data in edges],
+                                       dtype=numpy.float64),
+            "edgeHasGeometry": numpy.array(['geometry' in data for _, _, _, data in edges], dtype=bool),
+            "geometryOffsets": geometryOffsets,
+            "geometryCoords": geometryCoords,
+        }
+        edgeColumns = {column: [data.get(column, numpy.nan) for _, _, _, data in edges]
+                       for column in ('osmid', 'oneway', 'highway', 'name')}
+        return mapArrays, edgeColumns
+
+    def getEdgeEndNodeIds(self, coords, expectedPositions, otherPositions, nodeIds, nodeLatitudes, nodeLongitudes,
+                          nodesByCoordinates):
+        """
+        vectorized getEdgeEndNodeId
+        :param coords: (longitude, latitude) rows of the ends of edge geometries
+        :return: numpy array of osmnx ids, -1 where no node lies at the end
+        """
+        endNodes = numpy.full(len(coords), -1, dtype=numpy.int64)
+        for positions in (expectedPositions, otherPositions):
+            matches = (endNodes < 0) & (nodeLatitudes[positions] == coords[:, 1]) & (
+                    nodeLongitudes[positions] == coords[:, 0])
+            endNodes[matches] = nodeIds[positions[matches]]
+        for index in numpy.flatnonzero(endNodes < 0).tolist():
+            roundedString = Location(float(coords[index, 1]), float(coords[index, 0])).toRoundedString()
+            endNodes[index] = nodesByCoordinates.get(roundedString, -1)
+        return endNodes
+
+    def buildMapStructures(self, mapArrays, edgeColumns):
+        """
+        builds node and edge dictionaries, node index and routing engine of the map from arrays created by
+        createMapArrays
+        :return: nothing
+        """
+        nodeIds = mapArrays["nodeIds"]
+        nodeLatitudes = mapArrays["nodeLatitudes"]
+        nodeLongitudes = mapArrays["nodeLongitudes"]
+        intersections = mapArrays["nodeIsIntersection"]
+
+        self.intersections_by_coordinates, self.intersections_by_id = self.getIntersectionDicts(
+            nodeIds[intersections], nodeLatitudes[intersections], nodeLongitudes[intersections])
+        self.nodesByCoordinatesDict, self.nodesByIdDict = self.getNodeDicts(nodeIds, nodeLatitudes, nodeLongitudes)
+        self.edgesByNodeIdDict, self.edgesByIdDict = self.getMapEdgesForEachNode(mapArrays, edgeColumns,
+                                                                                 self.nodesByIdDict)
+
+        self.buildNodeIndex(nodeIds, nodeLatitudes, nodeLongitudes)
+        self.routingEngine = RoutingEngine(nodeIds, mapArrays["routeIndptr"], mapArrays["routeIndices"],
+                                           mapArrays["routeLengths"], mapArrays["routeDirected"])
+        self.buildNodeArrays()
+
+        self.latitudeInterval = [nodeLatitudes.min(), nodeLatitudes.max()]
+        self.longitudeInterval = [nodeLongitudes.min(), nodeLongitudes.max()]
+
     def setMapGrid(self, mapGrid):
         """
         setter for mapGrid functionality, grid is created in IISMotion class but we may use it somewhere here too
@@ -93,21 +221,16 @@ class Map:
         :param location: in case location object is passed, method will return different node than was passed
         :return: location object of random node
         """
-        nodes = self.gdfNodes.sample(n=1)
-        ran_loc = Location()
-        ran_loc.setLatitude(nodes.iloc[0]['y'])
-        ran_loc.setLongitude(nodes.iloc[0]['x'])
-        ran_loc.osmnxNode = nodes.index.get_level_values(0).values[0]
-
+        ran_loc = self.sampleNode()
         while (ran_loc.equlsWithLocation(location)):
-            nodes = self.gdfNodes.sample(n=1)
-            ran_loc = Location()
-            ran_loc.setLatitude(nodes.iloc[0]['y'])
-            ran_loc.setLongitude(nodes.iloc[0]['x'])
-            ran_loc.osmnxNode = nodes.index.get_level_values(0).values[0]
-
+            ran_loc = self.sampleNode()
         return ran_loc
 
+    def sampleNode(self) -> Location:
+        # numpy random state is used the same way as by gdfNodes.sample(n=1), so seeded runs pick the same nodes
+        index = numpy.random.choice(len(self.nodeIds), size=1, replace=False)[0]
+        return Location(self.nodeLatitudes[index], self.nodeLongitudes[index], osmnxNode=self.nodeIds[index])
+
     def getRandomIntersectionNode(self, location=None) -> Location:
         """
         returns random intersection node included in a simulated area
@@ -133,17 +256,10 @@ class Map:
         dest_node = self.getNearestNode(locationB)
 
         # print("-----------Getting route between nodes>")
-        route = nx.shortest_path(self.driveGraph, orig_node, dest_node, weight='length')
+        pathIndexes, _ = self.getShortestPathIndexes(orig_node, dest_node)
         # nx_route_len = nx.shortest_path_length(self.driveGraph,orig_node,dest_node, weight='length')
 
-        locList = []
-        nodes = self.gdfNodes.loc[route]
-        for i in range(1, len(nodes.index)):
-            loc = Location()
-            loc.setLatitude(nodes.iloc[i]['y'])
-            loc.setLongitude(nodes.iloc[i]['x'])
-            loc.osmnxNode = nodes.index.get_level_values(0).values[i]
-            locList.append(loc)
+        locList = self.getLocationsOfNodeIndexes(pathIndexes[1:])
             # print(f"{i}: {loc.toJson()}")
         # print("----------->")
         # print(f"Route len comparison ox:{nx_route_len} vs cuda:{self.getRouteLength(locList, 0)}")
@@ -165,26 +281,20 @@ class Map:
 
         # exclude nodes
         if (excludedLocationPairs):
-            modifiedDriveGraph = copy.deepcopy(self.driveGraph)
-            for excludedLocationPair in excludedLocationPairs:
-                firstLocation = excludedLocationPair[0]
-                secondLocation = excludedLocationPair[1]
-                modifiedDriveGraph.remove_edge(firstLocation.getOsmnxNode(), secondLocation.getOsmnxNode())
-            route = nx.shortest_path(modifiedDriveGraph, orig_node, dest_node, weight='length')
+            # excluded edges are masked in the routing engine, the drive graph is neither copied nor modified
+            excludedEdgesMask = self.routingEngine.getExcludedEdgesMask(
+                (firstLocation.getOsmnxNode(), secondLocation.getOsmnxNode())
+                for firstLocation, secondLocation in excludedLocationPairs)
+            pathIndexes, _ = self.routingEngine.getShortestPathIndexes(self.routingEngine.getNodeIndex(orig_node),
+                                                                       self.routingEngine.getNodeIndex(dest_node),
+                                                                       excludedEdgesMask)
             # nx_route_len = nx.shortest_path_length(self.driveGraph, orig_node, dest_node, weight='length')
             # print(f"Excluded - Route len comparison ox:{nx_route_len} vs cuda:{self.getRouteLength(route, 0)}")
         else:
             # print("-----------Getting route between nodes>")
-            route = nx.shortest_path(self.driveGraph, orig_node, dest_node, weight='length')
+            pathIndexes, _ = self.getShortestPathIndexes(orig_node, dest_node)
             # nx_route_len = nx.shortest_path_length(self.driveGraph, orig_node, dest_node, weight='length')
-        locList = []
-        nodes = self.gdfNodes.loc[route]
-        for i in range(1, len(nodes.index)):
-            loc = Location()
-            loc.setLatitude(nodes.iloc[i]['y'])
-            loc.setLongitude(nodes.iloc[i]['x'])
-            loc.osmnxNode = nodes.index.get_level_values(0).values[i]
-            locList.append(loc)
+        locList = self.getLocationsOfNodeIndexes(pathIndexes[1:])
             # print(f"{i}: {loc.toJson()}")
         # print("----------->")
         # print(f"Excluded - Route len comparison ox:{nx_route_len} vs cuda:{self.getRouteLength(locList, 0)}")
@@ -200,9 +310,66 @@ class Map:
         """
         orig_node = self.getNearestNode(locationA)
         dest_node = self.getNearestNode(locationB)
-        length = nx.shortest_path_length(self.driveGraph, orig_node, dest_node, weight='length')
+        return self.getShortestPathLength(orig_node, dest_node)
+
+    def getShortestPath(self, origNode, destNode):
+        """
+        shortest path between 2 nodes (see getShortestPathIndexes)
+        :param origNode: osmnx id of starting node
+        :param destNode: osmnx id of destination node
+        :return: list of osmnx ids (including both origNode and destNode)
+        """
+        pathIndexes, _ = self.getShortestPathIndexes(origNode, destNode)
+        return self.routingEngine.nodeIds[pathIndexes].tolist()
+
+    def getShortestPathLength(self, origNode, destNode):
+        """
+        length of shortest path between 2 nodes, looked up in the route table when routes were precomputed (the path
+        itself is not needed then), see getShortestPathIndexes otherwise
+        :param origNode: osmnx id of starting node
+        :param destNode: osmnx id of destination node
+        :return: distance in metres
+        """
+        if self.routeTable is None:
+            _, length = self.getShortestPathIndexes(origNode, destNode)
+            return length
+        length = self.routeTable.getPathLength(self.routingEngine.getNodeIndex(origNode),
+                                               self.routingEngine.getNodeIndex(destNode))
+        if numpy.isinf(length):
+            raise nx.NetworkXNoPath(f"Node {destNode} not reachable from {origNode}")
         return length
 
+    def getShortestPathIndexes(self, origNode, destNode):
+        """
+        shortest path between 2 nodes as indexes of routingEngine nodes, paths are stored in the route cache
+        shared by all users of the map, the route table is walked on a cache miss when routes were precomputed
+        (length is then read from its distances)
+        :param origNode: osmnx id of starting node
+        :param destNode: osmnx id of destination node
+        :return: read only int32 array of node indexes, length of the path in metres
+        """
+        originIndex = self.routingEngine.getNodeIndex(origNode)
+        destinationIndex = self.routingEngine.getNodeIndex(destNode)
+        cached = self.routeCache.get(originIndex, destinationIndex)
+        if cached is not None:
+            return cached
+
+        if self.routeTable is not None:
+            pathIndexes = self.routeTable.getPathIndexes(originIndex, destinationIndex)
+            length = self.routeTable.getPathLength(originIndex, destinationIndex)
+        else:
+            pathIndexes, length = self.routingEngine.getShortestPathIndexes(originIndex, destinationIndex)
+        self.routeCache.put(originIndex, destinationIndex, pathIndexes, length)
+        return pathIndexes, length
+
+    def getPathLength(self, path):
+        """
+        sum of lengths of edges along the path (same as nx.path_weight with weight='length')
+        :param path: list of osmnx ids
+        :return: distance in metres
+        """
+        return self.routingEngine.getPathLength(path)
+
     def getRandomPoint(self) -> Location:
         """
         method that returns random location within simulated area
@@ -220,8 +387,7 @@ class Map:
         :return: id of osmnx node
         """
         if (location.osmnxNode is None):
-            location.osmnxNode = ox.distance.nearest_nodes(self.driveGraph, location.getLongitude(),
-                                                           location.getLatitude())
+            location.osmnxNode = self.getNearestNodeId(location.getLatitude(), location.getLongitude())
         return location.osmnxNode
 
 
@@ -232,10 +398,60 @@ class Map:
         :return: id of osmnx node
         """
         if (location.osmnxNode is None):
-            location.osmnxNode = ox.distance.nearest_nodes(self.driveGraph, location.getLongitude(),
-                                                           location.getLatitude())
+            location.osmnxNode = self.getNearestNodeId(location.getLatitude(), location.getLongitude())
         return location
 
+    # nearest nodes are remembered for coordinates rounded to this number of decimals (~1 cm)
+    nearestNodeMemoDecimals = 7
+    nearestNodeMemoCapacity = 2 ** 18
+
+    def buildNodeIndex(self, nodeIds, latitudes, longitudes):
+        """
+        builds KD-tree over nodes of the drive graph, nodes are mapped to points on the unit sphere, so the nearest
+        node by euclidean distance in the tree is the nearest node by great circle distance (same as osmnx)
+        :param nodeIds: numpy array of osmnx ids of nodes
+        :param latitudes: numpy array of latitudes of nodes
+        :param longitudes: numpy array of longitudes of nodes
+        :return: nothing
+        """
+        self.nodeIds = nodeIds
+        self.nodeIndex = cKDTree(self.toUnitSphere(latitudes, longitudes))
+        self.nearestNodeMemo = {}
+
+    def toUnitSphere(self, latitudes, longitudes):
+        latitudes = numpy.radians(latitudes)
+        longitudes = numpy.radians(longitudes)
+        cosLatitudes = numpy.cos(latitudes)
+        return numpy.column_stack((cosLatitudes * numpy.cos(longitudes), cosLatitudes * numpy.sin(longitudes),
+                                   numpy.sin(latitudes)))
+
+    def getNearestNodes(self, latitudes, longitudes):
+        """
+        returns osmnx ids of nearest nodes for arrays of coordinates, all points are looked up in the tree at once
+        :param latitudes: array like of latitudes
+        :param longitudes: array like of longitudes
+        :return: list of osmnx node ids
+        """
+        latitudes = numpy.asarray(latitudes, dtype=numpy.float64)
+        longitudes = numpy.asarray(longitudes, dtype=numpy.float64)
+        if len(latitudes) == 0:
+            return []
+        distances, indexes = self.nodeIndex.query(self.toUnitSphere(latitudes, longitudes))
+        return self.nodeIds[indexes].tolist()
+
+    def getNearestNodeId(self, latitude, longitude):
+        """
+        returns osmnx id of the nearest node, results are memoized by rounded coordinates
+        """
+        key = (round(latitude, self.nearestNodeMemoDecimals), round(longitude, self.nearestNodeMemoDecimals))
+        node = self.nearestNodeMemo.get(key)
+        if node is None:
+            if len(self.nearestNodeMemo) >= self.nearestNodeMemoCapacity:
+                self.nearestNodeMemo.clear()
+            node = self.getNearestNodes([latitude], [longitude])[0]
+            self.nearestNodeMemo[key] = node
+        return node
+
     def getRouteBetweenPoints(self, locationA: Location, locationB: Location) -> [Location]:
         """
         returns list with a single location object
@@ -253,10 +469,7 @@ class Map:
         :param point: location that is verified
         :return: boolean value (True = location is inside building)
         """
-        for building in self.buildings:
-            if (building.pointInBuilding(point)):
-                return True
-        return False
+        return self.getBuildingIndex().getBuildingAt(point) is not None
 
     def getOnBuildingHeight(self, point: Location):
         """
@@ -265,10 +478,35 @@ class Map:
         :param point: location that is verified
         :return: height in meters, id of building
         """
-        for building in self.buildings:
-            if (building.pointInBuilding(point)):
-                return building.height, building.id
-        return 0, None
+        building = self.getBuildingIndex().getBuildingAt(point)
+        if building is None:
+            return 0, None
+        return building.height, building.id
+
+    def getBuildingIndex(self) -> BuildingIndex:
+        """
+        spatial index of buildings, it is built on first use
+        :return: BuildingIndex of self.buildings
+        """
+        if self.buildingIndex is None:
+            self.buildingIndex = BuildingIndex(self.buildings)
+        return self.buildingIndex
+
+    def getBuildingsAt(self, locations):
+        """
+        returns building containing each of given locations, all locations are looked up at once
+        :param locations: list of locations
+        :return: list of buildings (None for locations that are not inside of any building)
+        """
+        return self.getBuildingIndex().getBuildingsAt([location.getLatitude() for location in locations],
+                                                      [location.getLongitude() for location in locations])
+
+    def downloadBuildings(self, location: Location, radius):
+        """
+        downloads buildings around the location
+        :return: osmnx building data (geodataframe)
+        """
+        return ox.geometries_from_point((location.latitude, location.longitude), tags={"building": True}, dist=radius)
 
     def parseBuildings(self, gdfBuild):
         """
@@ -319,6 +557,8 @@ class Map:
             fig, ax = ox.plot_graph(self.driveGraph, figsize=(30, 30), node_size=1.2, edge_linewidth=0.5, save=True,
                                     show=False, filepath=name + ".pdf")
         if type == 'buildings':
+            if self.gdfBuildings is None:
+                self.gdfBuildings = self.downloadBuildings(self.location, self.radius)
             fig, ax = ox.plot_buildings(ox.project_gdf(self.gdfBuildings), save=True, show=False,
                                         filepath=name + ".pdf")
 
@@ -357,20 +597,21 @@ class Map:
             if (randomInt <= tmpProbability):
                 return zone.getRandomBuilding()
 
-    def getIntersectionDicts(self, gdfNodes):
+    def getIntersectionDicts(self, nodeIds, latitudes, longitudes):
         """
-        returns intersection dictionaries based on given osmnx dataframe
+        returns intersection dictionaries based on given arrays of intersection nodes
         1st dict contains locations of intersections (with osmnx node id) under lat-lon key
         2nd dict contains locations of intersections (with osmnx node id) under osmnx node id key
-        :param gdfNodes: osmnx dataframe
+        :param nodeIds: numpy array of osmnx ids of intersection nodes
+        :param latitudes: numpy array of latitudes of the nodes
+        :param longitudes: numpy array of longitudes of the nodes
         :return: intersections_by_coordinates, intersections_by_id
         """
         intersections_by_coordinates = {}
         intersections_by_id = {}
 
-        intersection_nodes = gdfNodes[gdfNodes['street_count'] > 2]
-        for index, node in intersection_nodes.iterrows():
-            location = Location(node["y"], node["x"], osmnxNode=index)
+        for index, latitude, longitude in zip(nodeIds.tolist(), latitudes.tolist(), longitudes.tolist()):
+            location = Location(latitude, longitude, osmnxNode=index)
             intersections_by_coordinates[location.toRoundedString()] = index
             intersections_by_id[index] = location
         return intersections_by_coordinates, intersections_by_id
@@ -384,23 +625,68 @@ class Map:
         result = location.toRoundedString() in self.intersections_by_coordinates
         return result
 
-    def getNodeDicts(self, gdfNodes):
+    def getNodeDicts(self, nodeIds, latitudes, longitudes):
         """
-        returns node dictionaries based on given osmnx dataframe
+        returns node dictionaries based on given arrays of nodes
         1st dict contains locations of nodes (with osmnx node id) under lat-lon key
-        2nd dict contains locations of nodes (with osmnx node id) under osmnx node id key
-        :param gdfNodes: osmnx dataframe
+        2nd dict contains locations of nodes (with osmnx node id) under osmnx node id key, locations are immutable
+        and shared by all routes passing through the node
+        :param nodeIds: numpy array of osmnx ids of nodes
+        :param latitudes: numpy array of latitudes of nodes
+        :param longitudes: numpy array of longitudes of nodes
         :return: nodesByCoordinatesDict, nodesByIdDict
         """
         nodesByCoordinatesDict = {}
         nodesByIdDict = {}
 
-        for index, node in gdfNodes.iterrows():
-            location = Location(node["y"], node["x"], osmnxNode=index)
+        for index, latitude, longitude in zip(nodeIds.tolist(), latitudes.tolist(), longitudes.tolist()):
+            location = FrozenLocation(latitude, longitude, osmnxNode=index)
             nodesByCoordinatesDict[location.toRoundedString()] = index
             nodesByIdDict[index] = location
         return nodesByCoordinatesDict, nodesByIdDict
 
+    def getNodeLocation(self, nodeId) -> Location:
+        """
+        returns shared (immutable) location of the node, use toLocation() on it to obtain a modifiable copy
+        :param nodeId: osmnx node id
+        :return: FrozenLocation from nodesByIdDict
+        """
+        return self.nodesByIdDict[nodeId]
+
+    def buildNodeArrays(self):
+        """
+        builds arrays of node coordinates and node locations in order of routingEngine node indexes, so paths of
+        node indexes are converted by a single gather
+        :return: nothing
+        """
+        self.nodeLocationsByIndex = [self.nodesByIdDict[nodeId] for nodeId in self.routingEngine.nodeIds.tolist()]
+        self.nodeLatitudes = numpy.array([location.latitude for location in self.nodeLocationsByIndex],
+                                         dtype=numpy.float64)
+        self.nodeLongitudes = numpy.array([location.longitude for location in self.nodeLocationsByIndex],
+                                          dtype=numpy.float64)
+
+    def getLocationsOfNodeIndexes(self, nodeIndexes, asArrays=False):
+        """
+        :param nodeIndexes: indexes of nodes (see RoutingEngine.getNodeIndex)
+        :param asArrays: True returns numpy arrays of latitudes and longitudes instead of locations
+        :return: list of shared node locations (see getNodeLocation) or tuple of arrays (latitudes, longitudes)
+        """
+        if asArrays:
+            return self.nodeLatitudes[nodeIndexes], self.nodeLongitudes[nodeIndexes]
+        locations = self.nodeLocationsByIndex
+        return [locations[index] for index in numpy.asarray(nodeIndexes).tolist()]
+
+    def getLocationsOfNodes(self, nodeIds, asArrays=False):
+        """
+        :param nodeIds: osmnx ids of nodes (e.g. nx path)
+        :param asArrays: True returns numpy arrays of latitudes and longitudes instead of locations
+        :return: list of shared node locations (see getNodeLocation) or tuple of arrays (latitudes, longitudes)
+        """
+        if asArrays:
+            return self.getLocationsOfNodeIndexes(self.routingEngine.getNodeIndexes(nodeIds), asArrays=True)
+        nodesByIdDict = self.nodesByIdDict
+        return [nodesByIdDict[nodeId] for nodeId in nodeIds]
+
     def getNodeId(self, location: Location):
         """
         returns osmnx node of given node location
@@ -412,93 +698,151 @@ class Map:
         else:
             return None
 
-    def getMapEdgesForEachNode(self, gdfEdges, nodesByIdDict):
+    def getMapEdgesForEachNode(self, mapArrays, edgeColumns, nodesByIdDict):
         """
-        returns edge dictionaries based on given osmnx dataframe
+        returns edge dictionaries based on given edge arrays
         1st dict contains edge objects stored under osmnx node id keys
         2nd dict contains  edge objects stored under edge id keys
-        :param gdfEdges: osmnx dataframe of edges
+        edges are created in a single pass over the arrays, every node lists edges where it is the first node of
+        the edge followed by edges where it is the second one (both in order of the edges)
+        :param mapArrays: arrays created by createMapArrays
+        :param edgeColumns: non numeric edge attributes created by createMapArrays
         :param nodesByIdDict: dictionary of nodes (stored under osmnx id key)
         :return: edgesByNodeIdDict, edgesByIdDict
         """
+        firstNodes = mapArrays["edgeFirstNodes"].tolist()
+        secondNodes = mapArrays["edgeSecondNodes"].tolist()
+        geometryOffsets = mapArrays["geometryOffsets"]
+        geometryCoords = mapArrays["geometryCoords"]
+        geometries = [geometryCoords[start:end] for start, end in
+                      zip(geometryOffsets[:-1].tolist(), geometryOffsets[1:].tolist())]
+        startCoords = geometryCoords[geometryOffsets[:-1]].tolist()
+        endCoords = geometryCoords[geometryOffsets[:-1] + 1].tolist()
+        mapEdges = [self.createMapEdgeFromArrays(osmid, oneway, length, highway, name, geometry, start, end, startNode,
+                                                 endNode)
+                    for osmid, oneway, length, highway, name, geometry, start, end, startNode, endNode in
+                    zip(edgeColumns['osmid'], edgeColumns['oneway'], mapArrays["edgeLengths"].tolist(),
+                        edgeColumns['highway'], edgeColumns['name'], geometries, startCoords, endCoords,
+                        mapArrays["edgeStartNodes"].tolist(), mapArrays["edgeEndNodes"].tolist())]
+
+        edgesWhereFirst = {nodeId: [] for nodeId in nodesByIdDict}
+        edgesWhereSecond = {nodeId: [] for nodeId in nodesByIdDict}
+        for mapEdge, firstNode, secondNode in zip(mapEdges, firstNodes, secondNodes):
+            if firstNode in edgesWhereFirst:
+                edgesWhereFirst[firstNode].append(mapEdge)
+            if secondNode in edgesWhereSecond:
+                edgesWhereSecond[secondNode].append(mapEdge)
+
+        # single node can be assigned to multpile edges, therefor we store them into a list
         edgesByNodeIdDict = {}
         edgesByIdDict = {}
-
-        nodeIds = [*nodesByIdDict]
-        for nodeId in nodeIds:
-            # filter edges where given nodeId is starting node of route
-            routesWhereFirst = None
-            try:
-                routesWhereFirst = gdfEdges.loc[[nodeId]]
-            except:
-                pass
-
-            # filter edges where given nodeId is end node of route, but node is bidirectional
-            routesWhereSecond = None
-            try:
-                routesWhereSecond = gdfEdges.xs(nodeId, axis=0, level=1, drop_level=False)
-            except:
-                pass
-
-            edges = pd.concat([routesWhereFirst, routesWhereSecond])
-
-            # single node can be assigned to multpile edges, therefor we store them into a list
-            listOfMapEdgesForGivenNode = []
-            for index, row in edges.iterrows():
-                mapEdge = self.getMapEdgeBasedOnGdfEdge(row)
+        for nodeId in nodesByIdDict:
+            edgesByNodeIdDict[nodeId] = edgesWhereFirst[nodeId] + edgesWhereSecond[nodeId]
+            for mapEdge in edgesByNodeIdDict[nodeId]:
                 edgesByIdDict[mapEdge.edgeId] = mapEdge
-                listOfMapEdgesForGivenNode.append(mapEdge)
-
-            # list of edges is stored in output directory under nodeId as a key
-            edgesByNodeIdDict[nodeId] = listOfMapEdgesForGivenNode
         return edgesByNodeIdDict, edgesByIdDict
 
     def removeDeadEnds(self, driveGraph):
         """
         method modifies drive graph in a loop to the point it does not contain dead ends
+        every iteration removes all nodes with a single edge at once (as a round of k-core decomposition), degrees
+        of their neighbours are decreased and the next iteration continues with nodes that became dead ends
         :param driveGraph: osmnx dataframe
         :return: modified driveGraph
         """
         print("-----------  Map preprocessing started - removal of dead ends  -----------")
-        deadendRemovalNeeded = True
+        nodeIds = pd.Index(list(driveGraph.nodes))
+        edges = list(driveGraph.edges())
+        firstNodes = nodeIds.get_indexer([edge[0] for edge in edges])
+        secondNodes = nodeIds.get_indexer([edge[1] for edge in edges])
+        degrees = numpy.bincount(numpy.concatenate((firstNodes, secondNodes)), minlength=len(nodeIds))
+        removedNodes = numpy.zeros(len(nodeIds), dtype=bool)
+        removedEdges = numpy.zeros(len(edges), dtype=bool)
+
         iterationNumber = 1
-        while deadendRemovalNeeded:
+        while True:
             print(f"Removal of deadends iteration #{iterationNumber}")
-            deadendRemovalNeeded = False
-            gdfNodes, gdfEdges = ox.graph_to_gdfs(driveGraph)
-            nodesByCoordinatesDict, nodesByIdDict = self.getNodeDicts(gdfNodes)
-            edgesByNodeIdDict, edgesByIdDict = self.getMapEdgesForEachNode(gdfEdges, nodesByIdDict)
-            for nodeId, edgeList in edgesByNodeIdDict.items():
-                if (len(edgeList) == 1):
-                    deadendRemovalNeeded = True
-                    driveGraph.remove_node(nodeId)
+            deadEnds = (degrees == 1) & ~removedNodes
+            if not deadEnds.any():
+                break
+            removedNodes |= deadEnds
+            edgesOfDeadEnds = ~removedEdges & (removedNodes[firstNodes] | removedNodes[secondNodes])
+            removedEdges |= edgesOfDeadEnds
+            degrees = degrees - numpy.bincount(numpy.concatenate((firstNodes[edgesOfDeadEnds],
+                                                                  secondNodes[edgesOfDeadEnds])),
+                                               minlength=len(nodeIds))
             iterationNumber += 1
+
+        driveGraph.remove_nodes_from(nodeIds[removedNodes].tolist())
         print("-----------  Map preprocessing finished  -----------")
         return driveGraph
 
     def getMapEdgeBasedOnGdfEdge(self, gdfEdge) -> MapEdge:
         """
         constructs objects of MapEdge accroding to a single line of osmnx edges data
-        :param gdfEdge: single line from self.gdfEdges = ox.graph_to_gdfs(self.driveGraph)
+        :param gdfEdge: single line of edges from ox.graph_to_gdfs(self.driveGraph)
+        :return: object of a MapEdge
+        """
+        return self.createMapEdge(gdfEdge['osmid'], gdfEdge['oneway'], gdfEdge['length'], gdfEdge['highway'],
+                                  gdfEdge['geometry'], gdfEdge['name'], gdfEdge.name[0], gdfEdge.name[1])
+
+    def createMapEdge(self, osmid, oneway, length, highway, geometry, name, firstNode, secondNode) -> MapEdge:
+        """
+        constructs objects of MapEdge from values of a single line of osmnx edges data
+        :param firstNode: osmnx id of the first node of the edge (u)
+        :param secondNode: osmnx id of the second node of the edge (v)
         :return: object of a MapEdge
         """
         mapEdge = MapEdge()
-        mapEdge.osmid = gdfEdge['osmid']
-        mapEdge.oneway = gdfEdge['oneway']
+        mapEdge.osmid = osmid
+        mapEdge.oneway = oneway
         # mapEdge.lanes = gdfEdge['lanes']
         # mapEdge.maxspeed = gdfEdge['maxspeed']
-        mapEdge.length = gdfEdge['length']
-        mapEdge.highway = gdfEdge['highway']
-        mapEdge.geometry = gdfEdge['geometry']
-        mapEdge.name = gdfEdge['name']
-        mapEdge.startLocation = Location(mapEdge.geometry.coords[0][1], mapEdge.geometry.coords[0][0])
-        mapEdge.endLocation = Location(mapEdge.geometry.coords[1][1], mapEdge.geometry.coords[1][0])
-
-        mapEdge.startLocation.osmnxNode = self.getNodeId(mapEdge.startLocation)
-        mapEdge.endLocation.osmnxNode = self.getNodeId(mapEdge.endLocation)
+        mapEdge.length = length
+        mapEdge.highway = highway
+        mapEdge.geometry = geometry
+        mapEdge.name = name
+        coords = geometry.coords
+        mapEdge.startLocation = Location(coords[0][1], coords[0][0])
+        mapEdge.endLocation = Location(coords[1][1], coords[1][0])
+
+        # ends of the geometry are the nodes of the edge unless the geometry was stored in the opposite direction
+        mapEdge.startLocation.osmnxNode = self.getEdgeEndNodeId(mapEdge.startLocation, firstNode, secondNode)
+        mapEdge.endLocation.osmnxNode = self.getEdgeEndNodeId(mapEdge.endLocation, secondNode, firstNode)
+        mapEdge.edgeId = mapEdge.toString()
+        return mapEdge
+
+    def createMapEdgeFromArrays(self, osmid, oneway, length, highway, name, geometryCoords, startCoords, endCoords,
+                                startNode, endNode) -> MapEdge:
+        """
+        constructs objects of MapEdge from values stored in arrays (see createMapArrays), shapely geometry of the edge
+        is created from its coordinates on first use
+        :param geometryCoords: numpy array of (longitude, latitude) rows
+        :param startCoords: first (longitude, latitude) of the geometry
+        :param endCoords: second (longitude, latitude) of the geometry
+        :param startNode: osmnx id of the node at startCoords, -1 if there is none
+        :param endNode: osmnx id of the node at endCoords, -1 if there is none
+        :return: object of a MapEdge
+        """
+        mapEdge = MapEdge()
+        mapEdge.osmid = osmid
+        mapEdge.oneway = oneway
+        mapEdge.length = length
+        mapEdge.highway = highway
+        mapEdge.geometryCoords = geometryCoords
+        mapEdge.name = name
+        mapEdge.startLocation = Location(startCoords[1], startCoords[0], osmnxNode=startNode if startNode >= 0 else None)
+        mapEdge.endLocation = Location(endCoords[1], endCoords[0], osmnxNode=endNode if endNode >= 0 else None)
         mapEdge.edgeId = mapEdge.toString()
         return mapEdge
 
+    def getEdgeEndNodeId(self, location: Location, expectedNode, otherNode):
+        for nodeId in (expectedNode, otherNode):
+            node = self.nodesByIdDict.get(nodeId)
+            if node is not None and node.latitude == location.latitude and node.longitude == location.longitude:
+                return nodeId
+        return self.getNodeId(location)
+
     def getPossibleSequelsToLocationList(self, route, movementBackwardsAllowed):
         """
         method that will find all possible extensions of given route
@@ -667,8 +1011,16 @@ class Map:
         """
         pathname = f"iism_cache/driveGraphCache/{filename}.pkl"
         if path.exists(pathname):
-            print(f"Drive graph will be loaded from cache file: {pathname}")
-            with open(pathname, 'rb') as inp:
-                return pickle.load(inp)
+            return self.loadDriveGraph(pathname)
         else:
             return None
+
+    def loadDriveGraph(self, pathname):
+        """
+        loads pickled drive graph
+        :param pathname: path of the pickle file
+        :return: osmnx drive graph
+        """
+        print(f"Drive graph will be loaded from cache file: {pathname}")
+        with open(pathname, 'rb') as inp:
+            return pickle.load(inp)
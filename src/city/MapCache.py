@@ -0,0 +1,195 @@
+import hashlib
+import inspect
+import json
+import os
+import tempfile
+
+import networkx as nx
+import numpy
+from shapely.geometry import LineString
+
+from src.city.Building import Building
+from src.common.Location import Location
+
+
+class MapCache:
+
+    def __init__(self, location: Location, radius, oneWayEnabled, removeDeadends, sourceGraphPath=None,
+                 preprocessing=(), cacheDir=os.path.join('iism_cache', 'mapCache')):
+        '''
+        Cache of preprocessed Map state stored as numpy arrays in an npz file (nodes, CSR adjacency of the routing
+        engine, edges with their geometries and end nodes, buildings) together with json files of non numeric
+        attributes, so Map builds all of its structures from arrays without any osmnx or networkx work. Entry is
+        addressed by a hash of all inputs of the Map preprocessing including the source code of the preprocessing,
+        so changing any of them leads to a different entry.
+        :param sourceGraphPath: pickled drive graph used instead of a download, its content is part of the key
+        :param preprocessing: functions (e.g. methods of Map) creating the stored data, their source is part of the key
+        '''
+        self.cacheDir = cacheDir
+        sourceGraphHash = None
+        if sourceGraphPath is not None:
+            with open(sourceGraphPath, 'rb') as inp:
+                sourceGraphHash = hashlib.sha1(inp.read()).hexdigest()
+        self.inputs = {
+            "location": location.toRoundedString(),
+            "radius": radius,
+            "oneWayEnabled": oneWayEnabled,
+            "removeDeadends": removeDeadends,
+            "sourceGraph": sourceGraphHash,
+            "version": self.getPreprocessingVersion(preprocessing),
+        }
+        self.key = hashlib.sha1(json.dumps(self.inputs, sort_keys=True).encode()).hexdigest()[:20]
+        self.arraysPath = os.path.join(cacheDir, f"{self.key}.npz")
+        self.graphPath = os.path.join(cacheDir, f"{self.key}.graph.json")
+        self.metaPath = os.path.join(cacheDir, f"{self.key}.json")
+
+    def getPreprocessingVersion(self, preprocessing):
+        '''
+        hash of the source code of this class and of the preprocessing functions, entries stored by a different
+        version of the code are not used
+        '''
+        sources = [inspect.getsource(MapCache)] + [inspect.getsource(function) for function in preprocessing]
+        return hashlib.sha1("\n".join(sources).encode()).hexdigest()[:20]
+
+    def exists(self):
+        return os.path.exists(self.arraysPath) and os.path.exists(self.graphPath) and os.path.exists(self.metaPath)
+
+    def store(self, driveGraph, mapArrays, edgeColumns, buildings):
+        '''
+        stores the preprocessed map, meta json file is written last and acts as a marker of a complete entry
+        :param driveGraph: preprocessed drive graph, its attributes are stored for loadDriveGraph
+        :param mapArrays: dictionary of numpy arrays (see Map.createMapArrays), edges in order of driveGraph.edges
+        :param edgeColumns: dictionary of lists of non numeric edge attributes (see Map.createMapArrays)
+        :param buildings: list of Building objects
+        '''
+        os.makedirs(self.cacheDir, exist_ok=True)
+
+        buildingCoords = [numpy.array([(point.latitude, point.longitude) for point in building.geometryLocations],
+                                      dtype=numpy.float64).reshape(-1, 2) for building in buildings]
+        centroids = [building.getCentroid() for building in buildings]
+        arraysFile, temporaryArraysPath = self.createTemporaryFile(".npz")
+        with os.fdopen(arraysFile, 'wb') as outp:
+            numpy.savez(outp,
+                        buildingOffsets=self.getOffsets(buildingCoords),
+                        buildingCoords=self.concatenate(buildingCoords),
+                        buildingHeights=numpy.array([building.height for building in buildings], dtype=numpy.float64),
+                        buildingCentroids=numpy.array([(centroid.latitude, centroid.longitude)
+                                                       for centroid in centroids], dtype=numpy.float64).reshape(-1, 2),
+                        **mapArrays)
+        self.replace(temporaryArraysPath, self.arraysPath)
+
+        # attributes of the drive graph, only needed when the networkx graph itself is used (see loadDriveGraph)
+        graph = {
+            "directed": driveGraph.is_directed(),
+            "graph": dict(driveGraph.graph),
+            "nodeAttributes": [dict(data) for _, data in driveGraph.nodes(data=True)],
+            "edgeAttributes": [{name: value for name, value in data.items() if name != 'geometry'}
+                               for _, _, data in driveGraph.edges(data=True)],
+        }
+        self.writeJson(graph, self.graphPath)
+        self.writeJson({"inputs": self.inputs, "edgeColumns": edgeColumns}, self.metaPath)
+
+    def writeJson(self, data, path):
+        jsonFile, temporaryPath = self.createTemporaryFile(".json")
+        with os.fdopen(jsonFile, 'w') as outp:
+            json.dump(data, outp, default=self.toJsonValue)
+        self.replace(temporaryPath, path)
+
+    def createTemporaryFile(self, suffix):
+        '''
+        every writer gets its own temporary file, processes storing the same entry at once do not collide
+        :return: file descriptor and path of the temporary file
+        '''
+        return tempfile.mkstemp(dir=self.cacheDir, prefix=f"{self.key}.", suffix=suffix + ".tmp")
+
+    def replace(self, temporaryPath, path):
+        '''
+        moves finished temporary file to its final name, when the move fails but another process already stored
+        the file, its copy is used
+        '''
+        try:
+            os.replace(temporaryPath, path)
+        except OSError:
+            if os.path.exists(temporaryPath):
+                os.remove(temporaryPath)
+            if not os.path.exists(path):
+                raise
+
+    def load(self):
+        '''
+        loads the preprocessed map without any osmnx or networkx call
+        :return: buildings, mapArrays, edgeColumns (same as passed to store), None when there is no complete entry
+                 for the inputs
+        '''
+        if not self.exists():
+            return None
+        with open(self.metaPath, 'r') as inp:
+            meta = json.load(inp)
+        if meta.get("inputs") != self.inputs:
+            return None
+        print(f"Preprocessed map will be loaded from cache file: {self.arraysPath}")
+
+        with numpy.load(self.arraysPath) as arrays:
+            mapArrays = {name: arrays[name] for name in arrays.files}
+        buildingCoords = self.splitCoords(mapArrays.pop("buildingOffsets"), mapArrays.pop("buildingCoords"))
+        buildingHeights = mapArrays.pop("buildingHeights").tolist()
+        buildingCentroids = mapArrays.pop("buildingCentroids").tolist()
+
+        # buildings are created first, same as in Map.__init__, so they get the same ids
+        buildings = [self.createBuilding(coords, height, centroid)
+                     for coords, height, centroid in zip(buildingCoords, buildingHeights, buildingCentroids)]
+        return buildings, mapArrays, meta["edgeColumns"]
+
+    def loadDriveGraph(self):
+        '''
+        creates the networkx drive graph of the entry (edges get their stored geometries)
+        :return: networkx MultiGraph or MultiDiGraph
+        '''
+        with open(self.graphPath, 'r') as inp:
+            graph = json.load(inp)
+        with numpy.load(self.arraysPath) as arrays:
+            nodeIds = arrays["nodeIds"].tolist()
+            firstNodes = arrays["edgeFirstNodes"].tolist()
+            secondNodes = arrays["edgeSecondNodes"].tolist()
+            keys = arrays["edgeKeys"].tolist()
+            hasGeometry = arrays["edgeHasGeometry"]
+            geometries = self.splitCoords(arrays["geometryOffsets"], arrays["geometryCoords"])
+
+        driveGraph = nx.MultiDiGraph() if graph["directed"] else nx.MultiGraph()
+        driveGraph.graph.update(graph["graph"])
+        driveGraph.add_nodes_from(zip(nodeIds, graph["nodeAttributes"]))
+        for u, v, key, data, coords, withGeometry in zip(firstNodes, secondNodes, keys, graph["edgeAttributes"],
+                                                         geometries, hasGeometry.tolist()):
+            if withGeometry:
+                data = dict(data, geometry=LineString(coords))
+            driveGraph.add_edge(u, v, key=key, **data)
+        return driveGraph
+
+    def createBuilding(self, coords, height, centroid):
+        building = Building()
+        building.geometryLocations = [Location(latitude, longitude) for latitude, longitude in coords.tolist()]
+        building.height = height
+        # stored centroid, so no polygon is created until the shape of the building is needed
+        building.centroid = Location(centroid[0], centroid[1], height)
+        return building
+
+    def getOffsets(self, coordsList):
+        offsets = numpy.zeros(len(coordsList) + 1, dtype=numpy.int64)
+        offsets[1:] = numpy.cumsum([len(coords) for coords in coordsList])
+        return offsets
+
+    def concatenate(self, coordsList):
+        if len(coordsList) == 0:
+            return numpy.zeros((0, 2), dtype=numpy.float64)
+        return numpy.concatenate(coordsList)
+
+    def splitCoords(self, offsets, coords):
+        return [coords[offsets[i]:offsets[i + 1]] for i in range(len(offsets) - 1)]
+
+    def toJsonValue(self, value):
+        # numpy scalars and other values json does not know, NaN is kept as json NaN
+        if isinstance(value, numpy.generic):
+            return value.item()
+        if isinstance(value, set):
+            return list(value)
+        return str(value)
@@ -1,3 +1,5 @@
+from shapely.geometry import LineString
+
 from src.common.Location import Location
 
 
@@ -10,12 +12,24 @@ class MapEdge:
         # self.maxspeed
         self.length = None
         self.highway = None
-        self.geometry = None
+        self.geometryShapely = None
+        # (longitude, latitude) rows of the geometry, edges built from map arrays create the shapely geometry lazily
+        self.geometryCoords = None
         self.name = None
         self.startLocation = None
         self.endLocation = None
         self.edgeId = None
 
+    @property
+    def geometry(self):
+        if self.geometryShapely is None and self.geometryCoords is not None:
+            self.geometryShapely = LineString(self.geometryCoords)
+        return self.geometryShapely
+
+    @geometry.setter
+    def geometry(self, geometry):
+        self.geometryShapely = geometry
+
     def getOppsiteEnd(self, location: Location):
         if (location.equlsWithLocation(self.startLocation)):
             return self.endLocation
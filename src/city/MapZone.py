@@ -22,9 +22,7 @@ class MapZone:
 
         self.polygon = Polygon(polygonList)
 
-        for building in map.buildings:
-            if self.com.getPointFromLocation(building.centroid).within(self.polygon):
-                self.buildings.append(building)
+        self.buildings = map.getBuildingIndex().getBuildingsWithCentroidIn(self.polygon)
 
     def printBuildings(self):
         print(">  Buildings for Map Zone ", self.name, " with type ", self.zoneType, " with centroid at: ",
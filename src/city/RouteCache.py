@@ -0,0 +1,69 @@
+from collections import OrderedDict
+
+
+class RouteCache:
+    # estimated memory of a single entry apart from the path array (key tuple, entry tuple, dict slot, array header)
+    entryOverheadBytes = 250
+
+    def __init__(self, maxBytes=64 * 1024 * 1024):
+        '''
+        least recently used cache of shortest paths between pairs of nodes bounded by estimated memory of the entries,
+        paths are stored as read only int32 arrays of RoutingEngine node indexes together with their lengths
+        :param maxBytes: estimated memory limit of all entries
+        '''
+        self.maxBytes = maxBytes
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, originIndex, destinationIndex):
+        '''
+        :return: (path indexes, length) or None when the pair is not cached
+        '''
+        key = (originIndex, destinationIndex)
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def put(self, originIndex, destinationIndex, pathIndexes, length):
+        key = (originIndex, destinationIndex)
+        if key in self.entries:
+            return
+        entrySize = pathIndexes.nbytes + self.entryOverheadBytes
+        if entrySize > self.maxBytes:
+            return
+        pathIndexes.flags.writeable = False
+        self.entries[key] = (pathIndexes, length)
+        self.bytes += entrySize
+        while self.bytes > self.maxBytes:
+            _, (evictedPath, _) = self.entries.popitem(last=False)
+            self.bytes -= evictedPath.nbytes + self.entryOverheadBytes
+            self.evictions += 1
+
+    def clear(self):
+        self.entries.clear()
+        self.bytes = 0
+
+    def getHitRatio(self):
+        requests = self.hits + self.misses
+        return self.hits / requests if requests > 0 else 0.0
+
+    def getStats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hitRatio": self.getHitRatio(),
+            "entries": len(self.entries),
+            "bytes": self.bytes,
+            "evictions": self.evictions,
+        }
+
+    def __str__(self):
+        return (f"RouteCache hits: {self.hits}, misses: {self.misses}, hit ratio: {self.getHitRatio():.3f}, "
+                f"entries: {len(self.entries)}, memory: {self.bytes / 1024 / 1024:.1f} MB")
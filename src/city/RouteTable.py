@@ -0,0 +1,134 @@
+import os
+import time
+
+import networkx as nx
+import numpy
+from numpy.lib.format import open_memmap
+from scipy.sparse.csgraph import dijkstra
+
+
+class RouteTable:
+
+    # lock of a builder that did not finish within this time (e.g. killed process) is removed by waiting processes
+    staleLockSeconds = 3600
+
+    def __init__(self, routingEngine, cacheDir, name, blockSize=256):
+        '''
+        All pairs shortest distances and next hops of the drive graph stored as .npy files in the map cache directory
+        and memory-mapped read-only, so processes working with the same map share a single copy in the page cache.
+        Tables are indexed [destination, node] (indexes of RoutingEngine): nextHop[j, i] is the node following i on
+        the shortest path from i to j, distances[j, i] is the length of that path. Distances are stored as float32.
+        Tables are computed by the first process that needs them (see build), which takes about a second per
+        thousand nodes, other processes wait for it (see buildOrWait) and open the finished tables.
+        :param routingEngine: RoutingEngine of the map
+        :param cacheDir: directory of the tables (map cache directory)
+        :param name: prefix of the files, MapCache key of the map
+        :param blockSize: number of destinations searched at once while building the tables
+        '''
+        self.routingEngine = routingEngine
+        self.distancesPath = os.path.join(cacheDir, f"{name}.distances.npy")
+        self.nextHopPath = os.path.join(cacheDir, f"{name}.nextHop.npy")
+        self.lockPath = os.path.join(cacheDir, f"{name}.routes.lock")
+        self.blockSize = blockSize
+        if not self.exists():
+            self.buildOrWait()
+        self.open()
+
+    def exists(self):
+        return os.path.exists(self.distancesPath) and os.path.exists(self.nextHopPath)
+
+    def buildOrWait(self):
+        '''
+        tables are built by a single process holding an exclusive lock file, the others wait until the tables exist
+        '''
+        os.makedirs(os.path.dirname(self.lockPath) or ".", exist_ok=True)
+        while not self.exists():
+            try:
+                lock = os.open(self.lockPath, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                try:
+                    if time.time() - os.path.getmtime(self.lockPath) > self.staleLockSeconds:
+                        os.remove(self.lockPath)
+                except FileNotFoundError:
+                    pass
+                time.sleep(0.5)
+                continue
+            try:
+                # tables may have been finished between the check and acquiring of the lock
+                if not self.exists():
+                    self.build()
+            finally:
+                os.close(lock)
+                os.remove(self.lockPath)
+
+    def open(self):
+        self.distances = numpy.load(self.distancesPath, mmap_mode='r')
+        self.nextHop = numpy.load(self.nextHopPath, mmap_mode='r')
+
+    def build(self):
+        '''
+        searches from every destination on the reversed graph, predecessors in those trees are the next hops
+        towards the destination, files are written under temporary names (unique for the process) and renamed when
+        complete
+        '''
+        print(f"-----------  Precomputation of routes started: {self.distancesPath}  -----------")
+        os.makedirs(os.path.dirname(self.distancesPath) or ".", exist_ok=True)
+        nodeCount = len(self.routingEngine.nodeIds)
+        nextHopType = numpy.int16 if nodeCount < numpy.iinfo(numpy.int16).max else numpy.int32
+        temporaryDistancesPath = f"{self.distancesPath}.{os.getpid()}.tmp.npy"
+        temporaryNextHopPath = f"{self.nextHopPath}.{os.getpid()}.tmp.npy"
+        distances = open_memmap(temporaryDistancesPath, mode='w+', dtype=numpy.float32, shape=(nodeCount, nodeCount))
+        nextHop = open_memmap(temporaryNextHopPath, mode='w+', dtype=nextHopType, shape=(nodeCount, nodeCount))
+
+        reversedGraph = self.routingEngine.graph.transpose().tocsr()
+        for start in range(0, nodeCount, self.blockSize):
+            destinations = numpy.arange(start, min(start + self.blockSize, nodeCount))
+            blockDistances, blockPredecessors = dijkstra(reversedGraph, directed=True, indices=destinations,
+                                                         return_predecessors=True)
+            distances[destinations] = blockDistances
+            nextHop[destinations] = numpy.where(blockPredecessors < 0, -1, blockPredecessors)
+
+        distances.flush()
+        nextHop.flush()
+        del distances, nextHop
+        os.replace(temporaryDistancesPath, self.distancesPath)
+        os.replace(temporaryNextHopPath, self.nextHopPath)
+        print("-----------  Precomputation of routes finished  -----------")
+
+    def __getstate__(self):
+        # memory maps are opened again after unpickling instead of copying the tables to the other process
+        state = self.__dict__.copy()
+        del state['distances']
+        del state['nextHop']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.open()
+
+    def getPathLength(self, originIndex, destinationIndex):
+        '''
+        :param originIndex: node index (see RoutingEngine.getNodeIndex) of the origin
+        :param destinationIndex: node index of the destination
+        :return: length of the shortest path in metres (inf if the destination is unreachable)
+        '''
+        return float(self.distances[destinationIndex, originIndex])
+
+    def getPathIndexes(self, originIndex, destinationIndex):
+        '''
+        walks the next hop table from the origin to the destination, no search is made
+        :param originIndex: node index (see RoutingEngine.getNodeIndex) of the origin
+        :param destinationIndex: node index of the destination
+        :return: int32 array of node indexes on the path, including origin and destination
+        :raises nx.NetworkXNoPath: if the destination is not reachable
+        '''
+        row = self.nextHop[destinationIndex]
+        current = originIndex
+        path = [current]
+        while current != destinationIndex:
+            current = int(row[current])
+            if current < 0:
+                nodeIds = self.routingEngine.nodeIds
+                raise nx.NetworkXNoPath(f"Node {nodeIds[destinationIndex]} not reachable from {nodeIds[originIndex]}")
+            path.append(current)
+        return numpy.array(path, dtype=numpy.int32)
@@ -0,0 +1,386 @@
+from heapq import heappush, heappop
+
+import networkx as nx
+import numpy
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra
+
+
+class RoutingEngine:
+
+    def __init__(self, nodeIds, indptr, indices, lengths, directed):
+        '''
+        Shortest paths over a CSR adjacency of the drive graph computed by scipy.sparse.csgraph. Nodes are numbered
+        0..n-1 (nodeIds maps index -> osmnx id), neighbours of node i are indices[indptr[i]:indptr[i + 1]] sorted by
+        index. Use fromDriveGraph to create the engine from a networkx graph, getArrays returns the arguments of the
+        constructor (e.g. for MapCache).
+        :param nodeIds: osmnx ids of nodes
+        :param indptr: CSR row pointers
+        :param indices: CSR column indexes (target nodes of edges)
+        :param lengths: lengths of edges in metres
+        :param directed: False when the adjacency holds both directions of every edge of an undirected graph
+        '''
+        self.directed = bool(directed)
+        self.nodeIds = numpy.asarray(nodeIds, dtype=numpy.int64)
+        self.indexByNodeId = {nodeId: index for index, nodeId in enumerate(self.nodeIds.tolist())}
+        nodeCount = len(self.nodeIds)
+
+        self.indptr = numpy.asarray(indptr, dtype=numpy.int32)
+        self.indices = numpy.asarray(indices, dtype=numpy.int32)
+        lengths = numpy.asarray(lengths, dtype=numpy.float64)
+        self.lengths = lengths.astype(numpy.float32)
+        # (source, target) pairs of CSR entries as sorted keys source * n + target, used to look edges up
+        sources = numpy.repeat(numpy.arange(nodeCount, dtype=numpy.int64), numpy.diff(self.indptr))
+        self.edgeKeys = sources * nodeCount + self.indices
+        # scipy computes in float64, matrix is converted once instead of on every query
+        self.graph = csr_matrix((lengths, self.indices, self.indptr), shape=(nodeCount, nodeCount))
+        self.reversedGraph = None
+        self.adjacencyLists = None
+
+    @classmethod
+    def fromDriveGraph(cls, driveGraph, weight='length'):
+        '''
+        nodes are numbered in order of driveGraph.nodes, parallel edges are merged into the shortest one and self
+        loops are left out as they are never part of a shortest path, undirected graphs are stored with both
+        directions of every edge
+        :param driveGraph: networkx (multi)graph of the map
+        :param weight: edge attribute used as a length of the edge
+        '''
+        directed = driveGraph.is_directed()
+        nodeIds = numpy.array(list(driveGraph.nodes), dtype=numpy.int64)
+        indexByNodeId = {nodeId: index for index, nodeId in enumerate(nodeIds.tolist())}
+        nodeCount = len(nodeIds)
+
+        edges = [(u, v, data.get(weight, 1)) for u, v, data in driveGraph.edges(data=True) if u != v]
+        sources = numpy.array([indexByNodeId[u] for u, _, _ in edges], dtype=numpy.int64)
+        targets = numpy.array([indexByNodeId[v] for _, v, _ in edges], dtype=numpy.int64)
+        lengths = numpy.array([length for _, _, length in edges], dtype=numpy.float64)
+        if not directed:
+            sources, targets = numpy.concatenate((sources, targets)), numpy.concatenate((targets, sources))
+            lengths = numpy.concatenate((lengths, lengths))
+
+        # shortest of parallel edges: sort by (source, target, length) and keep the first of every pair
+        order = numpy.lexsort((lengths, targets, sources))
+        sources, targets, lengths = sources[order], targets[order], lengths[order]
+        first = numpy.ones(len(sources), dtype=bool)
+        first[1:] = (sources[1:] != sources[:-1]) | (targets[1:] != targets[:-1])
+        sources, targets, lengths = sources[first], targets[first], lengths[first]
+
+        indptr = numpy.zeros(nodeCount + 1, dtype=numpy.int32)
+        indptr[1:] = numpy.cumsum(numpy.bincount(sources, minlength=nodeCount))
+        return cls(nodeIds, indptr, targets, lengths, directed)
+
+    def getArrays(self):
+        '''
+        :return: dictionary of constructor arguments, lengths are the float64 lengths used by the searches
+        '''
+        return {
+            "nodeIds": self.nodeIds,
+            "indptr": self.indptr,
+            "indices": self.indices,
+            "lengths": self.graph.data,
+            "directed": self.directed,
+        }
+
+    def getReversedGraph(self):
+        '''
+        :return: CSR matrix of the graph with reversed edges (searches from it give distances towards the origin)
+        '''
+        if self.reversedGraph is None:
+            self.reversedGraph = self.graph.transpose().tocsr()
+        return self.reversedGraph
+
+    def getAdjacencyLists(self):
+        '''
+        :return: indptr, indices and lengths of the CSR adjacency as python lists (for searches written in python)
+        '''
+        if self.adjacencyLists is None:
+            self.adjacencyLists = (self.indptr.tolist(), self.indices.tolist(), self.graph.data.tolist())
+        return self.adjacencyLists
+
+    def getNodeIndex(self, nodeId) -> int:
+        return self.indexByNodeId[nodeId]
+
+    def getNodeIndexes(self, nodeIds):
+        return numpy.array([self.indexByNodeId[nodeId] for nodeId in nodeIds], dtype=numpy.int64)
+
+    def getNeighbourIndexes(self, index):
+        return self.indices[self.indptr[index]:self.indptr[index + 1]]
+
+    def getEdgePositions(self, sourceIndexes, targetIndexes):
+        '''
+        :return: numpy array of positions of edges in CSR entries (indices, lengths), -1 if there is no such edge
+        '''
+        keys = numpy.asarray(sourceIndexes, dtype=numpy.int64) * len(self.nodeIds) + numpy.asarray(targetIndexes,
+                                                                                                    dtype=numpy.int64)
+        if len(self.edgeKeys) == 0:
+            return numpy.full(len(keys), -1, dtype=numpy.int64)
+        positions = numpy.minimum(numpy.searchsorted(self.edgeKeys, keys), len(self.edgeKeys) - 1)
+        return numpy.where(self.edgeKeys[positions] == keys, positions, -1)
+
+    def getEdgeLengths(self, sourceIndexes, targetIndexes):
+        '''
+        :return: numpy array of lengths of edges (the shortest one of parallel edges), nan if there is no such edge
+        '''
+        positions = self.getEdgePositions(sourceIndexes, targetIndexes)
+        if len(self.edgeKeys) == 0:
+            return numpy.full(len(positions), numpy.nan)
+        return numpy.where(positions >= 0, self.graph.data[positions], numpy.nan)
+
+    def getPathLength(self, path):
+        '''
+        same result as nx.path_weight(driveGraph, path, weight='length') without walking networkx adjacency dicts
+        :param path: list of osmnx ids
+        :raises nx.NetworkXNoPath: if two consecutive nodes of the path are not connected
+        '''
+        if len(path) < 2:
+            return 0.0
+        indexes = self.getNodeIndexes(path)
+        lengths = self.getEdgeLengths(indexes[:-1], indexes[1:])
+        if numpy.isnan(lengths).any():
+            raise nx.NetworkXNoPath("path does not exist")
+        return float(lengths.sum())
+
+    def getShortestPathTree(self, origins):
+        '''
+        :param origins: osmnx id or list of osmnx ids of origin nodes
+        :return: distances (metres, inf for unreachable nodes) and predecessors (-9999 for origin and unreachable
+                 nodes) of all nodes, 1d arrays for a single origin, one row for every origin otherwise
+        '''
+        if numpy.ndim(origins) == 0:
+            indexes = self.getNodeIndex(origins)
+        else:
+            indexes = self.getNodeIndexes(origins)
+        return dijkstra(self.graph, directed=True, indices=indexes, return_predecessors=True)
+
+    def getDistancesFromNearestOrigin(self, origins):
+        '''
+        multi-source search
+        :param origins: list of osmnx ids of origin nodes
+        :return: distance of every node to the closest origin and osmnx id of that origin (-1 when unreachable)
+        '''
+        distances, _, sources = dijkstra(self.graph, directed=True, indices=self.getNodeIndexes(origins),
+                                         min_only=True, return_predecessors=True)
+        return distances, numpy.where(sources >= 0, self.nodeIds[numpy.maximum(sources, 0)], -1)
+
+    def indexesFromPredecessors(self, predecessors, originIndex, destinationIndex):
+        '''
+        :return: int32 array of node indexes from the origin to the destination, None if the destination is
+                 unreachable
+        '''
+        path = [destinationIndex]
+        current = destinationIndex
+        while current != originIndex:
+            current = predecessors[current]
+            if current < 0:
+                return None
+            path.append(current)
+        return numpy.array(path[::-1], dtype=numpy.int32)
+
+    def pathFromPredecessors(self, predecessors, originIndex, destinationIndex):
+        '''
+        :return: list of osmnx ids from the origin to the destination, None if the destination is unreachable
+        '''
+        indexes = self.indexesFromPredecessors(predecessors, originIndex, destinationIndex)
+        if indexes is None:
+            return None
+        return self.nodeIds[indexes].tolist()
+
+    def getShortestPathIndexes(self, originIndex, destinationIndex, excludedEdgesMask=None):
+        '''
+        :param originIndex: node index (see getNodeIndex) of the origin
+        :param destinationIndex: node index of the destination
+        :param excludedEdgesMask: boolean array over CSR entries (see getExcludedEdgesMask), masked edges are not
+                                  used by the path, the graph itself is never copied or modified
+        :return: int32 array of node indexes on the shortest path and its length in metres
+        :raises nx.NetworkXNoPath: if the destination is not reachable
+        '''
+        graph = self.graph
+        if excludedEdgesMask is not None:
+            # same structure of the matrix with infinite lengths of excluded edges, only lengths are new
+            graph = csr_matrix((numpy.where(excludedEdgesMask, numpy.inf, self.graph.data), self.indices, self.indptr),
+                               shape=self.graph.shape)
+        distances, predecessors = dijkstra(graph, directed=True, indices=originIndex, return_predecessors=True)
+        indexes = self.indexesFromPredecessors(predecessors, originIndex, destinationIndex)
+        if indexes is None:
+            raise nx.NetworkXNoPath(f"Node {self.nodeIds[destinationIndex]} not reachable from "
+                                    f"{self.nodeIds[originIndex]}")
+        return indexes, float(distances[destinationIndex])
+
+    def getExcludedEdgesMask(self, excludedEdges):
+        '''
+        :param excludedEdges: iterable of (osmnx id, osmnx id) pairs, edges of undirected graphs are excluded in both
+                              directions
+        :return: boolean array over CSR entries, True for excluded edges
+        :raises nx.NetworkXError: if a pair is not an edge of the graph (same as driveGraph.remove_edge)
+        '''
+        excludedEdges = list(excludedEdges)
+        sources = self.getNodeIndexes([edge[0] for edge in excludedEdges])
+        targets = self.getNodeIndexes([edge[1] for edge in excludedEdges])
+        if not self.directed:
+            sources, targets = numpy.concatenate((sources, targets)), numpy.concatenate((targets, sources))
+        positions = self.getEdgePositions(sources, targets)
+        if (positions < 0).any():
+            missing = int(numpy.flatnonzero(positions < 0)[0])
+            raise nx.NetworkXError(f"The edge {self.nodeIds[sources[missing]]}-{self.nodeIds[targets[missing]]} is not "
+                                   f"in the graph")
+        mask = numpy.zeros(len(self.indices), dtype=bool)
+        mask[positions] = True
+        return mask
+
+    def getShortestPath(self, origin, destination):
+        '''
+        same result as nx.shortest_path(driveGraph, origin, destination, weight='length') (when there is just one
+        shortest path)
+        :return: list of osmnx ids of nodes on the path, including origin and destination
+        '''
+        return self.getShortestPaths([origin], [destination])[0]
+
+    def getShortestPathLength(self, origin, destination):
+        return self.getShortestPathLengths([origin], [destination])[0]
+
+    def getShortestPaths(self, origins, destinations):
+        '''
+        batched version of getShortestPath, a single search is made from every distinct origin
+        :return: list of paths, one for every (origin, destination) pair
+        :raises nx.NetworkXNoPath: if any destination is not reachable from its origin
+        '''
+        originIndexes = self.getNodeIndexes(origins)
+        destinationIndexes = self.getNodeIndexes(destinations)
+        if len(originIndexes) == 0:
+            return []
+        uniqueOrigins, rows = numpy.unique(originIndexes, return_inverse=True)
+        _, predecessors = dijkstra(self.graph, directed=True, indices=uniqueOrigins, return_predecessors=True)
+
+        paths = []
+        for row, originIndex, destinationIndex in zip(rows.reshape(-1).tolist(), originIndexes.tolist(),
+                                                      destinationIndexes.tolist()):
+            path = self.pathFromPredecessors(predecessors[row], originIndex, destinationIndex)
+            if path is None:
+                raise nx.NetworkXNoPath(f"Node {self.nodeIds[destinationIndex]} not reachable from "
+                                        f"{self.nodeIds[originIndex]}")
+            paths.append(path)
+        return paths
+
+    def getShortestPathLengths(self, origins, destinations):
+        '''
+        batched version of getShortestPathLength
+        :return: numpy array of lengths in metres (inf for unreachable destinations)
+        '''
+        originIndexes = self.getNodeIndexes(origins)
+        destinationIndexes = self.getNodeIndexes(destinations)
+        if len(originIndexes) == 0:
+            return numpy.zeros(0)
+        uniqueOrigins, rows = numpy.unique(originIndexes, return_inverse=True)
+        distances = dijkstra(self.graph, directed=True, indices=uniqueOrigins)
+        return distances.reshape(len(uniqueOrigins), -1)[rows.reshape(-1), destinationIndexes]
+
+    def iterateShortestPaths(self, origin, destination, maxLength=None):
+        '''
+        generator of loopless paths from the origin to the destination in order of increasing length (Yen's
+        algorithm), same paths as nx.shortest_simple_paths(driveGraph, origin, destination, weight='length') up to
+        the order of paths of equal length
+        distances towards the destination are searched once and reused by all spur searches: as a lower bound of A*
+        (spurs longer than maxLength are never expanded) and as a shortest path tree, whose branch is the spur path
+        whenever it avoids the removed nodes and edges, so most spurs need no search at all
+        :param origin: osmnx id of the origin
+        :param destination: osmnx id of the destination
+        :param maxLength: paths longer than maxLength (metres) are not searched for, None for no limit
+        :return: generator of tuples (list of osmnx ids, length of the path in metres)
+        '''
+        originIndex = self.getNodeIndex(origin)
+        destinationIndex = self.getNodeIndex(destination)
+        # small tolerance, so rounding of sums of lengths does not drop paths exactly maxLength long
+        maxLength = numpy.inf if maxLength is None else maxLength + 1e-6
+        toDestination, nextHop = dijkstra(self.getReversedGraph(), directed=True, indices=destinationIndex,
+                                          return_predecessors=True)
+        if numpy.isinf(toDestination[originIndex]) or toDestination[originIndex] > maxLength:
+            return
+        toDestination = toDestination.tolist()
+        nextHop = nextHop.tolist()
+
+        path = self.followTree(nextHop, originIndex, destinationIndex)
+        pathLength = toDestination[originIndex]
+        acceptedPaths = []
+        seenPaths = {tuple(path)}
+        candidates = []
+        while True:
+            acceptedPaths.append(path)
+            yield self.nodeIds[path].tolist(), pathLength
+
+            edgeLengths = self.getEdgeLengths(path[:-1], path[1:]).tolist()
+            rootLength = 0.0
+            for i in range(len(path) - 1):
+                spurIndex = path[i]
+                rootPath = path[:i + 1]
+                bannedNodes = set(path[:i])
+                # edges leaving the spur node along accepted paths sharing the root path
+                bannedNextNodes = {acceptedPath[i + 1] for acceptedPath in acceptedPaths
+                                   if len(acceptedPath) > i + 1 and acceptedPath[:i + 1] == rootPath}
+                spurPath, spurLength = self.searchSpurPath(spurIndex, destinationIndex, toDestination, nextHop,
+                                                           bannedNodes, bannedNextNodes, maxLength - rootLength)
+                if spurPath is not None:
+                    candidate = rootPath[:-1] + spurPath
+                    if tuple(candidate) not in seenPaths:
+                        seenPaths.add(tuple(candidate))
+                        heappush(candidates, (rootLength + spurLength, len(candidate), candidate))
+                rootLength += edgeLengths[i]
+
+            if len(candidates) == 0:
+                return
+            pathLength, _, path = heappop(candidates)
+            if pathLength > maxLength:
+                return
+
+    def followTree(self, nextHop, index, destinationIndex):
+        path = [index]
+        while index != destinationIndex:
+            index = nextHop[index]
+            path.append(index)
+        return path
+
+    def searchSpurPath(self, spurIndex, destinationIndex, toDestination, nextHop, bannedNodes, bannedNextNodes,
+                       maxLength):
+        '''
+        shortest path from the spur node to the destination avoiding banned nodes and edges from the spur node to
+        banned next nodes, A* with exact distances in the unrestricted graph as a heuristic
+        :return: list of node indexes and length of the path, (None, None) if there is no path within maxLength
+        '''
+        if toDestination[spurIndex] > maxLength:
+            return None, None
+
+        # branch of the shortest path tree is optimal when it does not use anything that was removed
+        treePath = self.followTree(nextHop, spurIndex, destinationIndex)
+        if len(treePath) > 1 and treePath[1] not in bannedNextNodes and bannedNodes.isdisjoint(treePath):
+            return treePath, toDestination[spurIndex]
+
+        indptr, indices, lengths = self.getAdjacencyLists()
+        bestLengths = {spurIndex: 0.0}
+        previous = {spurIndex: -1}
+        closed = set()
+        heap = [(toDestination[spurIndex], 0.0, spurIndex)]
+        while heap:
+            _, length, node = heappop(heap)
+            if node in closed:
+                continue
+            if node == destinationIndex:
+                path = [node]
+                while previous[node] >= 0:
+                    node = previous[node]
+                    path.append(node)
+                return path[::-1], length
+            closed.add(node)
+            for position in range(indptr[node], indptr[node + 1]):
+                neighbour = indices[position]
+                if neighbour in closed or neighbour in bannedNodes or (
+                        node == spurIndex and neighbour in bannedNextNodes):
+                    continue
+                neighbourLength = length + lengths[position]
+                estimate = neighbourLength + toDestination[neighbour]
+                if estimate == numpy.inf or estimate > maxLength:
+                    continue
+                if neighbourLength < bestLengths.get(neighbour, numpy.inf):
+                    bestLengths[neighbour] = neighbourLength
+                    previous[neighbour] = node
+                    heappush(heap, (estimate, neighbourLength, neighbour))
+        return None, None
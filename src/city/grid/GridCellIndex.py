@@ -0,0 +1,50 @@
+import numpy
+
+
+class GridCellIndex:
+
+    def __init__(self, gridRows):
+        '''
+        Bucket index of rows of a LocationsTable by their grid cell. Rows are ordered by cell with a counting sort
+        (stable, rows of a cell keep their table order) and every cell keeps the range of its rows, so rows of a cell
+        are found in O(number of occupants) instead of a scan of the whole table. Rows outside of the grid are not
+        indexed.
+        :param gridRows: number of grid rows (and columns) of the MapGrid
+        '''
+        self.gridRows = gridRows
+        self.cellCount = gridRows * gridRows
+        self.builtForVersion = None
+        self.order = numpy.zeros(0, dtype=numpy.int64)
+        self.cellStarts = numpy.zeros(self.cellCount + 1, dtype=numpy.int64)
+
+    def build(self, grid):
+        '''
+        :param grid: (N,2) grid x/y of rows in use
+        :return:
+        '''
+        x = grid[:, 0]
+        y = grid[:, 1]
+        inside = (x >= 0) & (x < self.gridRows) & (y >= 0) & (y < self.gridRows)
+        # rows outside of the grid go to the extra last bucket which is never returned
+        cells = numpy.where(inside, x.astype(numpy.int64) * self.gridRows + y, self.cellCount)
+        counts = numpy.bincount(cells, minlength=self.cellCount + 1)
+        self.cellStarts = numpy.concatenate(([0], numpy.cumsum(counts[:self.cellCount])))
+        # stable sort of small integer keys is a radix (counting) sort in numpy
+        keyType = numpy.uint16 if self.cellCount < 2 ** 16 else numpy.int64
+        self.order = numpy.argsort(cells.astype(keyType), kind='stable')
+
+    def isInside(self, x, y):
+        return 0 <= x < self.gridRows and 0 <= y < self.gridRows
+
+    def getRowsAt(self, x, y):
+        '''
+        :return: rows of the table in cell x, y (in table order), cell has to be inside of the grid
+        '''
+        cell = x * self.gridRows + y
+        return self.order[self.cellStarts[cell]:self.cellStarts[cell + 1]]
+
+    def getCounts(self):
+        '''
+        :return: (gridRows, gridRows) matrix of number of rows per cell
+        '''
+        return numpy.diff(self.cellStarts).reshape(self.gridRows, self.gridRows)
@@ -2,6 +2,7 @@ import math
 
 import numpy
 from src.city.grid.MapCell import MapCell
+from src.common import Distance
 from src.common.CommonFunctions import CommonFunctions
 from src.common.Location import Location
 
@@ -54,13 +55,13 @@ class MapGrid:
         movables = []
         for collectionName in collectionNames:
             collection = self.actorCollectionsSet[collectionName]
-            movables = movables + collection.getMovablesAtGridXY(x, y)
+            movables.extend(collection.getMovablesAtGridXY(x, y))
         return movables
 
     def getMovablesAtXY(self, x, y):
         movables = []
         for key, collection in self.actorCollectionsSet.items():
-            movables = movables + collection.getMovablesAtGridXY(x, y)
+            movables.extend(collection.getMovablesAtGridXY(x, y))
         return movables
 
     def getCountPerCell(self, collectionNames):
@@ -77,10 +78,7 @@ class MapGrid:
     def getCountPerCell(self):
         countMatrix = numpy.zeros((self.rows, self.rows), dtype=int)
         for key, collection in self.actorCollectionsSet.items():
-            for x in range(self.rows):
-                for y in range(self.rows):
-                    movables = collection.getMovablesAtGridXY(x, y)
-                    countMatrix[x, y] = countMatrix[x, y] + len(movables)
+            countMatrix = countMatrix + collection.locationsTable.getGridCellIndex().getCounts()
         return countMatrix
 
     def getRssPerCell(self):
@@ -93,72 +91,210 @@ class MapGrid:
         return rssMatrix
 
     def getClosestActorAndDistanceFrom(self, distance, collectionNames, loc=Location):
-        actors =  self.getClosestActorsFrom(distance, collectionNames, loc)
-        return self.com.getClosestActorFromListAndDistance(loc,actors)
+        """
+        :param distance: kept for compatibility, the search is not limited to a square, closest actor is exact
+        :return: closest actor of collections and its distance, None, None when collections are empty
+        """
+        nearest = self.getNearestActors(1, collectionNames, loc)
+        if len(nearest) == 0:
+            return None, None
+        return nearest[0]
 
-    def getClosestActorsFrom(self, distance, collectionNames, location=Location):
+    def getNearestActors(self, k, collectionNames, location=Location, maxDistance=None):
+        """
+        k nearest actors of collections, rings of cells around the location are visited one after another until
+        k found actors are closer than any cell of the next ring could be
+        :param maxDistance: actors further than this (metres) are not returned and rings beyond it are not visited
+        :return: list of (actor, distance), closest first
+        """
         x, y = self.getGridCoordinates(location)
+        collections = [self.actorCollectionsSet[collectionName] for collectionName in collectionNames]
         actors = []
-        for xx in range(x - distance, x + distance + 1):
-            for yy in range(y - distance, y + distance + 1):
-                if (xx >= 0 and yy >= 0 and xx < self.rows and yy < self.rows):
-                    for collectionName in collectionNames:
-                        collection = self.actorCollectionsSet[collectionName]
-                        actors = actors + collection.getMovablesAtGridXY(xx, yy)
-
-        if (len(actors) == 0 and distance < self.rows):
-            # print("Number of agents found at distance: ", distance, "is: ", len(actors), "starting recursion")
-            actors = self.getClosestActorsFrom(distance + 1, collectionNames, location)
+        distances = []
+        for distance, cells in self.iterateRings(x, y):
+            ringActors = []
+            for xx, yy in cells:
+                for collection in collections:
+                    ringActors.extend(collection.getMovablesAtGridXY(xx, yy))
+            if len(ringActors) > 0:
+                actors.extend(ringActors)
+                distances.extend(self.com.getReal2dDistances(
+                    location, [actor.getLocationView() for actor in ringActors]).tolist())
 
-        # print("Found",len(actors)," RESULTS : ",actors)
-        return actors
+            bound = self.getRingLowerBound(location, distance)
+            if maxDistance is not None and bound > maxDistance:
+                break
+            if len(actors) >= k and sorted(distances)[k - 1] <= bound:
+                break
 
+        # stable sort, equally distant actors stay in the order of visited cells
+        order = sorted(range(len(actors)), key=distances.__getitem__)
+        nearest = [(actors[i], distances[i]) for i in order[:k]]
+        return [(actor, distance) for actor, distance in nearest if maxDistance is None or distance <= maxDistance]
 
-    def getClosestActorsFromV2(self, distance, collectionNames, location=Location, visitedMatrix=None):
-        if (visitedMatrix == None):
-            visitedMatrix = [[0 for x in range(self.rows)] for y in range(self.rows)]
-            for x in range(0, self.rows):
-                for y in range(0, self.rows):
-                    visitedMatrix[x][y] = False
-        x, y = self.getGridCoordinates(location)
-        actors = []
-        for xx in range(x - distance, x + distance + 1):
-            for yy in range(y - distance, y + distance + 1):
-                if (xx >= 0 and yy >= 0 and xx < self.rows and yy < self.rows and visitedMatrix[xx][yy] == False):
-                    visitedMatrix[xx][yy] = True
-                    for collectionName in collectionNames:
-                        collection = self.actorCollectionsSet[collectionName]
-                        actors = actors + collection.getMovablesAtGridXY(xx, yy)
-
-        if (len(actors) == 0 and distance < self.rows):
-            # print("Number of agents found at distance: ", distance, "is: ", len(actors), "starting recursion")
-            actors = self.getClosestActorsFromV2(distance + 1, collectionNames, location, visitedMatrix)
+    def iterateRings(self, x, y):
+        """
+        generator of rings of cells around cell x, y (the cell itself is ring 0), only cells inside of the grid are
+        yielded, it stops once the whole grid was visited
+        :return: (chebyshev distance, cells of the ring)
+        """
+        lastRing = max(x, y, self.rows - 1 - x, self.rows - 1 - y)
+        yield 0, [(x, y)] if 0 <= x < self.rows and 0 <= y < self.rows else []
+        for distance in range(1, lastRing + 1):
+            yield distance, self.getRingCells(x, y, distance)
 
-        # print("Found",len(actors)," RESULTS : ",actors)
-        return actors
+    # geodesic (or planar) distance is smaller than haversine distance by less than this ratio
+    ringBoundTolerance = 0.01
 
-    def getClosestActorsFromV3(self, distance, collectionNames, location=Location):
+    def getRingLowerBound(self, location, distance):
+        """
+        :return: metres from location to the closest point outside of the square of rings up to distance, no actor
+        of further rings can be closer
+        """
+        x, y = self.getGridCoordinates(location)
+        latitude = location.getLatitude()
+        longitude = location.getLongitude()
+        latitudeBound = min(latitude - (self.latmin + (x - distance) * self.latStep),
+                            self.latmin + (x + distance + 1) * self.latStep - latitude)
+        longitudeBound = min(longitude - (self.lonmin + (y - distance) * self.lonStep),
+                             self.lonmin + (y + distance + 1) * self.lonStep - longitude)
+        # longitude degree is the shortest at the latitude furthest from equator
+        metresPerDegree = Distance.R * math.pi / 180
+        lonScale = math.cos(math.radians(max(abs(self.latmin), abs(self.latmax), abs(latitude))))
+        bound = min(latitudeBound * metresPerDegree, longitudeBound * metresPerDegree * lonScale)
+        return max(0.0, bound * (1 - self.ringBoundTolerance))
+
+    def getClosestActorsFrom(self, distance, collectionNames, location=Location):
         x, y = self.getGridCoordinates(location)
+        collections = [self.actorCollectionsSet[collectionName] for collectionName in collectionNames]
         actors = []
-        for xx in range(x - distance, x + distance + 1):
-            for yy in range(y - distance, y + distance + 1):
-                if (xx >= 0 and yy >= 0 and xx < self.rows and yy < self.rows):
-                    for collectionName in collectionNames:
-                        collection = self.actorCollectionsSet[collectionName]
-                        actors = actors + collection.getMovablesAtGridXY(xx, yy)
-
-        if (len(actors) == 0 and distance < self.rows):
+        for xx in range(max(x - distance, 0), min(x + distance + 1, self.rows)):
+            for yy in range(max(y - distance, 0), min(y + distance + 1, self.rows)):
+                for collection in collections:
+                    actors.extend(collection.getMovablesAtGridXY(xx, yy))
+
+        # square is empty, so the bigger one contains only actors from its border ring (same order as a full scan)
+        while (len(actors) == 0 and distance < self.rows):
             # print("Number of agents found at distance: ", distance, "is: ", len(actors), "starting recursion")
-            actors = self.getClosestActorsFromV3(distance + 1, collectionNames, location)
+            distance = distance + 1
+            for xx, yy in self.getRingCells(x, y, distance):
+                for collection in collections:
+                    actors.extend(collection.getMovablesAtGridXY(xx, yy))
 
         # print("Found",len(actors)," RESULTS : ",actors)
         return actors
 
+    def getRingCells(self, x, y, distance):
+        '''
+        :return: cells inside of the grid at chebyshev distance from x, y, ordered by x and y
+        '''
+        cells = []
+        for xx in range(max(x - distance, 0), min(x + distance + 1, self.rows)):
+            if (abs(xx - x) == distance):
+                cells.extend((xx, yy) for yy in range(max(y - distance, 0), min(y + distance + 1, self.rows)))
+            else:
+                cells.extend((xx, yy) for yy in (y - distance, y + distance) if 0 <= yy < self.rows)
+        return cells
+
+
+    def getClosestActorsFromV2(self, distance, collectionNames, location=Location, visitedMatrix=None):
+        # visits only the new ring when the square is enlarged, same result as before without the visited matrix
+        return self.getClosestActorsFrom(distance, collectionNames, location)
+
+    def getClosestActorsFromV3(self, distance, collectionNames, location=Location):
+        return self.getClosestActorsFrom(distance, collectionNames, location)
+
     def getActorsInRadius(self, radius, collectionNames, location=Location):
+        if self.hasStaticIndexes(collectionNames):
+            return self.getStaticActorsInRadius(radius, collectionNames, location)
         gridDistance = math.ceil(radius / self.cellWidthAndHeight)
         actorsInGrid = self.getClosestActorsFrom(gridDistance, collectionNames, location)
-        actorsInRadius = []
-        for actor in actorsInGrid:
-            if self.com.getReal2dDistance(actor.getLocation(), location) < radius:
-                actorsInRadius.append(actor)
-        return actorsInRadius
+        if len(actorsInGrid) == 0:
+            return actorsInGrid
+        distances = self.com.getReal2dDistances(location, [actor.getLocationView() for actor in actorsInGrid])
+        return [actorsInGrid[i] for i in numpy.flatnonzero(distances < radius).tolist()]
+
+    def hasStaticIndexes(self, collectionNames):
+        for collectionName in collectionNames:
+            if self.actorCollectionsSet[collectionName].getStaticIndex() is None:
+                return False
+        return True
+
+    # haversine distance of the index and distances of other Distance modes differ by less than this ratio, only
+    # actors in between are measured again in the configured mode
+    staticIndexTolerance = 0.01
+
+    def getStaticActorsInRadius(self, radius, collectionNames, location=Location):
+        """
+        same result as getActorsInRadius (including the order of actors), answered from static indexes of collections
+        that are not able of movement instead of grid cells
+        """
+        x, y = self.getGridCoordinates(location)
+        gridDistance = math.ceil(radius / self.cellWidthAndHeight)
+        collections = [self.actorCollectionsSet[collectionName] for collectionName in collectionNames]
+
+        # grid search considers only cells of the square around the location, the square is enlarged until it
+        # contains some actor (see getClosestActorsFrom)
+        closest = min([self.getGridDistances(collection.getStaticIndex().grid, x, y).min(initial=self.rows + 1)
+                       for collection in collections], default=self.rows + 1)
+        if (closest > gridDistance):
+            if (closest > max(gridDistance, self.rows)):
+                return []
+            gridDistance = closest
+
+        keys = []
+        actors = []
+        for collectionIndex, collection in enumerate(collections):
+            index = collection.getStaticIndex()
+            rows, distances = index.queryRadius(location.getLatitude(), location.getLongitude(),
+                                                radius * (1 + self.staticIndexTolerance))
+            grid = index.grid[rows]
+            inSquare = self.getGridDistances(grid, x, y) <= gridDistance
+            rows, distances, grid = rows[inSquare], distances[inSquare], grid[inSquare]
+            if Distance.getDistanceMode() != Distance.DistanceMode.HAVERSINE:
+                band = distances >= radius * (1 - self.staticIndexTolerance)
+                distances[band] = Distance.distancesFrom(location.getLatitude(), location.getLongitude(),
+                                                         index.latitudes[rows[band]], index.longitudes[rows[band]])
+            inRadius = distances < radius
+            rows, grid = rows[inRadius], grid[inRadius]
+            actors.extend(collection.getActorsForRows(rows))
+            keys.extend(zip(grid[:, 0].tolist(), grid[:, 1].tolist(), [collectionIndex] * len(rows), rows.tolist()))
+        order = sorted(range(len(actors)), key=keys.__getitem__)
+        return [actors[i] for i in order]
+
+    def getGridDistances(self, grid, x, y):
+        '''
+        :param grid: (N,2) grid coordinates
+        :return: chebyshev distance of cells from cell x, y, cells outside of the grid are never visited (rows + 1)
+        '''
+        inside = (grid[:, 0] >= 0) & (grid[:, 0] < self.rows) & (grid[:, 1] >= 0) & (grid[:, 1] < self.rows)
+        distances = numpy.maximum(numpy.abs(grid[:, 0] - x), numpy.abs(grid[:, 1] - y))
+        return numpy.where(inside, distances, self.rows + 1)
+
+    def getActorsInRadiusBatch(self, radius, collectionNames, latitudes, longitudes):
+        """
+        radius query for many locations at once, collections have to be static (see ActorCollection.getStaticIndex)
+        :return: list of actors within radius (haversine distance) for every location, ordered by collection and row
+        """
+        result = [[] for i in range(len(latitudes))]
+        for collectionName in collectionNames:
+            collection = self.actorCollectionsSet[collectionName]
+            index = collection.getStaticIndex()
+            if index is None:
+                raise ValueError(f"Collection {collectionName} is able of movement, it has no static index")
+            for actors, rows in zip(result, index.queryRadiusBatch(latitudes, longitudes, radius)):
+                actors.extend(collection.getActorsForRows(rows))
+        return result
+
+    def getNearestStaticActors(self, k, collectionNames, location=Location):
+        """
+        :return: list of (actor, haversine distance) of k nearest actors from static collections, closest first
+        """
+        found = []
+        for collectionName in collectionNames:
+            collection = self.actorCollectionsSet[collectionName]
+            rows, distances = collection.getStaticIndex().queryNearest(location.getLatitude(),
+                                                                       location.getLongitude(), k)
+            found.extend(zip(collection.getActorsForRows(rows), distances.tolist()))
+        found.sort(key=lambda actorAndDistance: actorAndDistance[1])
+        return found[:k]
@@ -0,0 +1,76 @@
+import math
+
+import numpy
+from scipy.spatial import cKDTree
+
+
+class StaticActorIndex:
+    R = 6371000
+
+    def __init__(self, locationsTable):
+        '''
+        KD-tree over rows of a LocationsTable of actors that never move (e.g. task solvers). Locations are mapped to
+        points on the unit sphere, so euclidean (chord) distance in the tree is monotonic with the haversine distance
+        and radius queries are exact on the sphere. Tree is built once, rebuild it when rows are added.
+        :param locationsTable: LocationsTable
+        '''
+        self.locationsVersion = locationsTable.locationsVersion
+        self.rows = locationsTable.rows
+        self.latitudes = numpy.array(locationsTable.position[:self.rows, 0], dtype=numpy.float64)
+        self.longitudes = numpy.array(locationsTable.position[:self.rows, 1], dtype=numpy.float64)
+        self.grid = locationsTable.grid[:self.rows].copy()
+        self.tree = cKDTree(self.toUnitSphere(self.latitudes, self.longitudes))
+
+    def toUnitSphere(self, latitudes, longitudes):
+        lat = numpy.radians(numpy.asarray(latitudes, dtype=numpy.float64))
+        lon = numpy.radians(numpy.asarray(longitudes, dtype=numpy.float64))
+        cosLat = numpy.cos(lat)
+        return numpy.column_stack((cosLat * numpy.cos(lon), cosLat * numpy.sin(lon), numpy.sin(lat)))
+
+    def toChord(self, distance):
+        return 2 * math.sin(min(distance / (2 * self.R), math.pi / 2))
+
+    def toDistance(self, chord):
+        return 2 * self.R * numpy.arcsin(numpy.minimum(numpy.asarray(chord) / 2, 1))
+
+    def queryRadius(self, latitude, longitude, radius):
+        '''
+        :param radius: metres
+        :return: rows within radius (ascending) and their haversine distances in metres
+        '''
+        point = self.toUnitSphere([latitude], [longitude])
+        rows = numpy.array(sorted(self.tree.query_ball_point(point[0], self.toChord(radius))), dtype=numpy.int64)
+        if len(rows) == 0:
+            return rows, numpy.zeros(0)
+        return rows, self.toDistance(numpy.linalg.norm(self.tree.data[rows] - point, axis=1))
+
+    def queryRadiusBatch(self, latitudes, longitudes, radius):
+        '''
+        radius query for many locations at once
+        :return: list with an array of rows (ascending) for every location
+        '''
+        points = self.toUnitSphere(latitudes, longitudes)
+        if len(points) == 0:
+            return []
+        return [numpy.array(sorted(rows), dtype=numpy.int64)
+                for rows in self.tree.query_ball_point(points, self.toChord(radius))]
+
+    def queryNearest(self, latitude, longitude, k=1):
+        '''
+        :return: rows of k nearest actors (closest first) and their haversine distances in metres
+        '''
+        rows, distances = self.queryNearestBatch([latitude], [longitude], k)
+        return rows[0], distances[0]
+
+    def queryNearestBatch(self, latitudes, longitudes, k=1):
+        '''
+        :return: (len(latitudes), k) arrays of rows and distances, k is limited by the number of rows
+        '''
+        k = min(k, self.rows)
+        points = self.toUnitSphere(latitudes, longitudes)
+        if k == 0:
+            return numpy.zeros((len(points), 0), dtype=numpy.int64), numpy.zeros((len(points), 0))
+        chords, rows = self.tree.query(points, k=k)
+        rows = numpy.asarray(rows, dtype=numpy.int64).reshape(len(points), k)
+        distances = self.toDistance(numpy.asarray(chords).reshape(len(points), k))
+        return rows, distances
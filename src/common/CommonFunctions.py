@@ -1,5 +1,6 @@
 
 from src.common.Location import Location
+from src.common import Distance
 from shapely.geometry import Point
 import geopy.distance
 import math
@@ -12,9 +13,17 @@ from src.common.SimulationClock import *
 class CommonFunctions:
 
     def getReal2dDistance(self, first=Location, second=Location):
-        coords_1 = (first.getLatitude(), first.getLongitude())
-        coords_2 = (second.getLatitude(), second.getLongitude())
-        return geopy.distance.geodesic(coords_1, coords_2).m
+        # accuracy is given by the configured Distance mode (haversine by default)
+        return Distance.distance(first.getLatitude(), first.getLongitude(), second.getLatitude(),
+                                 second.getLongitude())
+
+    def getReal2dDistances(self, location, locations):
+        '''
+        distances from location to every location of the list, computed at once
+        :return: numpy array of distances in metres
+        '''
+        latitudes, longitudes = Distance.locationsToArrays(locations)
+        return Distance.distancesFrom(location.getLatitude(), location.getLongitude(), latitudes, longitudes)
 
     # def get2dCoordDistance(self, first=Location, second=Location): #Deprecated
     #     latDifference = first.getLatitude() - second.getLatitude()
@@ -97,11 +106,8 @@ class CommonFunctions:
 
     def getShortestDistanceFromLocations(self, locations, point=Location):
         shortest = 9999999.9
-        for location in locations:
-            distance = self.getReal2dDistance(location, point)
-            if (distance < shortest):
-                shortest = distance
-
+        if len(locations) > 0:
+            shortest = min(shortest, float(self.getReal2dDistances(point, locations).min()))
         return shortest
 
     def getRandomLocationWithinCity(self, latitudeInterval, longitudeInterval, height):
@@ -111,30 +117,18 @@ class CommonFunctions:
         return location
 
     def getClosestActorFromList(self, location, collection):
-        closestActor = collection[0]
-        shortestDistance = self.getReal2dDistance(location, closestActor.getLocation())
-
-        for actor in collection:
-            newDistance= self.getReal2dDistance(location, actor.getLocation())
-            if(newDistance < shortestDistance):
-                shortestDistance = newDistance
-                closestActor = actor
-        return closestActor
+        distances = self.getReal2dDistances(location, [actor.getLocationView() for actor in collection])
+        # argmin returns the first of equally distant actors, as the original loop did
+        return collection[int(distances.argmin())]
 
 
     def getClosestActorFromListAndDistance(self, location, collection):
         if(len(collection)==0):
             return None, None
 
-        closestActor = collection[0]
-        shortestDistance = self.getReal2dDistance(location, closestActor.getLocation())
-
-        for actor in collection:
-            newDistance= self.getReal2dDistance(location, actor.getLocation())
-            if(newDistance < shortestDistance):
-                shortestDistance = newDistance
-                closestActor = actor
-        return closestActor, shortestDistance
+        distances = self.getReal2dDistances(location, [actor.getLocationView() for actor in collection])
+        closest = int(distances.argmin())
+        return collection[closest], float(distances[closest])
 
     def getTimeFromNormalDistribution(self, sigma, mu, minutesFromUniform: bool):
 
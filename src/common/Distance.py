@@ -0,0 +1,121 @@
+import math
+from enum import Enum
+
+import numpy
+
+try:
+    from pyproj import Geod
+    GEOD = Geod(ellps='WGS84')
+except ImportError:
+    GEOD = None
+
+R = 6371000
+
+
+class DistanceMode(Enum):
+    # equirectangular approximation, good enough within a city
+    PLANAR = "planar"
+    # great circle distance on a sphere, error against the ellipsoid is below 0.5%
+    HAVERSINE = "haversine"
+    # distance on the WGS-84 ellipsoid (pyproj if installed, geopy otherwise)
+    GEODESIC = "geodesic"
+
+
+DISTANCE_MODE = DistanceMode.HAVERSINE
+
+
+def setDistanceMode(mode: DistanceMode):
+    global DISTANCE_MODE
+    DISTANCE_MODE = mode
+
+
+def getDistanceMode():
+    global DISTANCE_MODE
+    return DISTANCE_MODE
+
+
+def distance(latitude1, longitude1, latitude2, longitude2, mode=None):
+    '''
+    distance of two points in metres, scalar version without numpy overhead
+    :param mode: DistanceMode, the configured mode (see setDistanceMode) when None
+    '''
+    mode = DISTANCE_MODE if mode is None else mode
+    if mode == DistanceMode.GEODESIC:
+        return float(geodesicDistances(latitude1, longitude1, numpy.array([latitude2]), numpy.array([longitude2]))[0])
+
+    lat1 = math.radians(latitude1)
+    lat2 = math.radians(latitude2)
+    dLat = lat2 - lat1
+    dLon = math.radians(longitude2 - longitude1)
+    if mode == DistanceMode.PLANAR:
+        return R * math.hypot(dLat, dLon * math.cos((lat1 + lat2) / 2))
+    a = math.sin(dLat / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin(dLon / 2) ** 2
+    return 2 * R * math.asin(min(1.0, math.sqrt(a)))
+
+
+def distancesFrom(latitude, longitude, latitudes, longitudes, mode=None):
+    '''
+    distances from one point to many points
+    :param latitudes: array like of latitudes of the points
+    :param longitudes: array like of longitudes of the points
+    :param mode: DistanceMode, the configured mode (see setDistanceMode) when None
+    :return: numpy array of distances in metres
+    '''
+    mode = DISTANCE_MODE if mode is None else mode
+    latitudes = numpy.asarray(latitudes, dtype=numpy.float64)
+    longitudes = numpy.asarray(longitudes, dtype=numpy.float64)
+    if mode == DistanceMode.GEODESIC:
+        return geodesicDistances(latitude, longitude, latitudes, longitudes)
+    return sphericalDistances(numpy.float64(latitude), numpy.float64(longitude), latitudes, longitudes, mode)
+
+
+def distanceMatrix(latitudes1, longitudes1, latitudes2, longitudes2, mode=None):
+    '''
+    distances between every pair of two sets of points
+    :param mode: DistanceMode, the configured mode (see setDistanceMode) when None
+    :return: (len(latitudes1), len(latitudes2)) numpy array of distances in metres
+    '''
+    mode = DISTANCE_MODE if mode is None else mode
+    latitudes1 = numpy.asarray(latitudes1, dtype=numpy.float64)
+    longitudes1 = numpy.asarray(longitudes1, dtype=numpy.float64)
+    latitudes2 = numpy.asarray(latitudes2, dtype=numpy.float64)
+    longitudes2 = numpy.asarray(longitudes2, dtype=numpy.float64)
+    if mode == DistanceMode.GEODESIC:
+        matrix = numpy.zeros((len(latitudes1), len(latitudes2)))
+        for i in range(len(latitudes1)):
+            matrix[i] = geodesicDistances(latitudes1[i], longitudes1[i], latitudes2, longitudes2)
+        return matrix
+    return sphericalDistances(latitudes1[:, None], longitudes1[:, None], latitudes2[None, :], longitudes2[None, :],
+                              mode)
+
+
+def sphericalDistances(latitudes1, longitudes1, latitudes2, longitudes2, mode):
+    lat1 = numpy.radians(latitudes1)
+    lat2 = numpy.radians(latitudes2)
+    dLat = lat2 - lat1
+    dLon = numpy.radians(longitudes2 - longitudes1)
+    if mode == DistanceMode.PLANAR:
+        return R * numpy.hypot(dLat, dLon * numpy.cos((lat1 + lat2) / 2))
+    a = numpy.sin(dLat / 2) ** 2 + numpy.cos(lat1) * numpy.cos(lat2) * numpy.sin(dLon / 2) ** 2
+    return 2 * R * numpy.arcsin(numpy.sqrt(numpy.minimum(a, 1.0)))
+
+
+def geodesicDistances(latitude, longitude, latitudes, longitudes):
+    if GEOD is not None:
+        count = len(latitudes)
+        _, _, distances = GEOD.inv(numpy.full(count, longitude), numpy.full(count, latitude), longitudes, latitudes)
+        return numpy.asarray(distances, dtype=numpy.float64)
+
+    import geopy.distance
+    return numpy.array([geopy.distance.geodesic((latitude, longitude), (lat, lon)).m
+                        for lat, lon in zip(latitudes.tolist(), longitudes.tolist())], dtype=numpy.float64)
+
+
+def locationsToArrays(locations):
+    '''
+    :param locations: iterable of Location / LocationView
+    :return: numpy arrays of latitudes and longitudes
+    '''
+    latitudes = numpy.array([location.getLatitude() for location in locations], dtype=numpy.float64)
+    longitudes = numpy.array([location.getLongitude() for location in locations], dtype=numpy.float64)
+    return latitudes, longitudes
@@ -2,6 +2,9 @@ import json
 
 
 class Location:
+    # no per-instance __dict__, locations are created by the million during route planning
+    __slots__ = ('latitude', 'longitude', 'altitude', 'osmnxNode', 'gridCoordinates', 'roundedStringCache')
+
     def __init__(self, latitude=0, longitude=0, altitude=0, osmnxNode=None):
         '''
         Location class representing point with GPS coordinates
@@ -14,6 +17,8 @@ class Location:
         self.altitude = altitude
         self.osmnxNode = osmnxNode
         self.gridCoordinates = []
+        # (latitude, longitude, toRoundedString()) of the last call, reused while coordinates do not change
+        self.roundedStringCache = None
 
     def getLatitude(self):
         return self.latitude
@@ -83,5 +88,45 @@ class Location:
         return f"osmid={self.osmnxNode}_latitude={self.latitude},longitude={self.longitude}"
 
     def toRoundedString(self):
-        return format(self.latitude, '.6f') + "_" + format(self.longitude, '.6f')
+        cache = self.roundedStringCache
+        if cache is not None and cache[0] == self.latitude and cache[1] == self.longitude:
+            return cache[2]
+        roundedString = format(self.latitude, '.6f') + "_" + format(self.longitude, '.6f')
+        self.roundedStringCache = (self.latitude, self.longitude, roundedString)
+        return roundedString
         # return str(round(self.latitude, 6)) + "_" + str(round(self.longitude, 6))
+
+    def toLocation(self) -> 'Location':
+        '''
+        @return: independent (mutable) copy of this location
+        '''
+        location = Location(self.latitude, self.longitude, self.altitude, self.osmnxNode)
+        location.gridCoordinates = list(self.gridCoordinates)
+        return location
+
+
+class FrozenLocation(Location):
+    __slots__ = ('frozen',)
+
+    def __init__(self, latitude=0, longitude=0, altitude=0, osmnxNode=None):
+        '''
+        Immutable Location, a single instance can be shared by everyone who refers to the same place (e.g. nodes of
+        the map graph). Copies of it are the instance itself, use toLocation() to obtain a modifiable location.
+        '''
+        super(FrozenLocation, self).__init__(latitude, longitude, altitude, osmnxNode)
+        self.toRoundedString()
+        self.frozen = True
+
+    def __setattr__(self, name, value):
+        if getattr(self, 'frozen', False):
+            raise AttributeError(f"FrozenLocation can not be modified (attribute {name}), use toLocation() first")
+        super(FrozenLocation, self).__setattr__(name, value)
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        return FrozenLocation, (self.latitude, self.longitude, self.altitude, self.osmnxNode)
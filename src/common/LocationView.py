@@ -0,0 +1,75 @@
+from src.common.Location import Location
+
+
+class LocationView:
+    __slots__ = ('locationsTable', 'row')
+
+    def __init__(self, locationsTable, row):
+        '''
+        Read-only view of the current location stored in a row of LocationsTable. Nothing is copied, values are read
+        from the table on every access, so the view always reflects the latest state of the row. It provides the
+        reading part of the Location interface, use toLocation() when an independent copy is needed.
+        @param locationsTable: LocationsTable
+        @param row: row of the table
+        '''
+        self.locationsTable = locationsTable
+        self.row = row
+
+    @property
+    def latitude(self):
+        return float(self.locationsTable.position[self.row, 0])
+
+    @property
+    def longitude(self):
+        return float(self.locationsTable.position[self.row, 1])
+
+    @property
+    def altitude(self):
+        return float(self.locationsTable.position[self.row, 2])
+
+    @property
+    def osmnxNode(self):
+        return None
+
+    @property
+    def gridCoordinates(self):
+        return self.getGridCoordinates()
+
+    def getLatitude(self):
+        return self.latitude
+
+    def getLongitude(self):
+        return self.longitude
+
+    def getAltitude(self):
+        return self.altitude
+
+    def getOsmnxNode(self):
+        return None
+
+    def getGridCoordinates(self):
+        grid = self.locationsTable.grid[self.row]
+        return [int(grid[0]), int(grid[1])]
+
+    def getGridXcoor(self):
+        return int(self.locationsTable.grid[self.row, 0])
+
+    def getGridYcoor(self):
+        return int(self.locationsTable.grid[self.row, 1])
+
+    def equlsWithLocation(self, location):
+        if location is None:
+            return False
+        return self.longitude == location.longitude and self.latitude == location.latitude
+
+    def toLocation(self) -> Location:
+        return self.locationsTable.getLocation(self.row)
+
+    def toJson(self):
+        return self.toLocation().toJson()
+
+    def toString(self):
+        return self.toLocation().toString()
+
+    def toRoundedString(self):
+        return format(self.latitude, '.6f') + "_" + format(self.longitude, '.6f')
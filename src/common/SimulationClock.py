@@ -30,3 +30,7 @@ def toDateTime(milliseconds):
     global START_DATETIME
     return START_DATETIME + timedelta(milliseconds=milliseconds)
 
+
+def timestampToMicrosecondsSinceStart(timestamp):
+    global START_DATETIME
+    return (timestamp - START_DATETIME) // timedelta(microseconds=1)
@@ -0,0 +1,75 @@
+"""
+Measures memory and allocation time of location lists built during route planning.
+
+Routes of vehicles on a synthetic grid of nodes are converted to lists of locations the way
+path_utils.convert_path does it: with a dict-based location (original Location class), with a
+slotted Location per route node, and with shared FrozenLocation instances of the nodes.
+
+usage: python -m src.common.tools.LocationMemoryBenchmark [vehicles] [routeLength]
+"""
+import sys
+import time
+import tracemalloc
+
+import numpy
+
+from src.common.Location import Location, FrozenLocation
+
+
+class DictLocation:
+    # copy of the attributes of Location before it used __slots__
+    def __init__(self, latitude=0, longitude=0, altitude=0, osmnxNode=None):
+        self.latitude = latitude
+        self.longitude = longitude
+        self.altitude = altitude
+        self.osmnxNode = osmnxNode
+        self.gridCoordinates = []
+
+
+def createRoutes(vehicles, routeLength, side=100, seed=0):
+    '''
+    :return: node coordinates and a random walk over the grid of nodes for every vehicle
+    '''
+    rng = numpy.random.default_rng(seed)
+    latitudes = 48.70 + numpy.repeat(numpy.arange(side), side) * 0.0001
+    longitudes = 21.23 + numpy.tile(numpy.arange(side), side) * 0.0001
+    moves = numpy.array([1, -1, side, -side])
+    routes = []
+    for i in range(vehicles):
+        steps = moves[rng.integers(0, 4, routeLength - 1)]
+        routes.append(numpy.cumsum(numpy.concatenate(([rng.integers(0, side * side)], steps))) % (side * side))
+    return latitudes.tolist(), longitudes.tolist(), [route.tolist() for route in routes]
+
+
+def measure(convert, routes):
+    tracemalloc.start()
+    start = time.perf_counter()
+    paths = [convert(route) for route in routes]
+    duration = time.perf_counter() - start
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return duration, current, len(paths)
+
+
+def runBenchmark(vehicles, routeLength):
+    latitudes, longitudes, routes = createRoutes(vehicles, routeLength)
+    nodesById = {node: FrozenLocation(latitudes[node], longitudes[node], osmnxNode=node)
+                 for node in range(len(latitudes))}
+
+    variants = {
+        'dict Location per node': lambda route: [DictLocation(latitudes[node], longitudes[node], osmnxNode=node)
+                                                 for node in route],
+        'slotted Location per node': lambda route: [Location(latitudes[node], longitudes[node], osmnxNode=node)
+                                                    for node in route],
+        'shared FrozenLocation': lambda route: [nodesById[node] for node in route],
+    }
+    print(f"{vehicles} vehicles, {routeLength} nodes per route")
+    print(f"{'variant':>28} {'time':>12} {'memory':>12}")
+    for name, convert in variants.items():
+        duration, memory, count = measure(convert, routes)
+        print(f"{name:>28} {duration * 1000:>10.1f}ms {memory / 2 ** 20:>10.1f}MB")
+
+
+if __name__ == "__main__":
+    arguments = [int(arg) for arg in sys.argv[1:]]
+    runBenchmark(*(arguments + [1000, 500][len(arguments):]))
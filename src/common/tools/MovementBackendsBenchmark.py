@@ -0,0 +1,82 @@
+"""
+Compares execution backends of the walking kernel on synthetic locations tables.
+
+usage: python -m src.common.tools.MovementBackendsBenchmark [actors ...]
+"""
+import copy
+import sys
+import time
+
+import numpy
+from numba import cuda
+
+from src.city.grid.MapGrid import MapGrid
+from src.movement.LocationsTable import LocationsTable
+from src.movement.movementStrategies.MovementBackend import MovementBackend
+from src.movement.movementStrategies.RandomWaypointCityCuda import walking_kernel
+from src.movement.movementStrategies.WalkingBackends import runWalkingKernel
+
+
+class BenchmarkActor:
+    def __init__(self, id):
+        self.id = id
+
+
+def createTable(rows, seed=0, coordinateDtype=numpy.float64):
+    '''
+    Creates locations table with actors spread over ~1 km^2 that walk towards targets up to ~100 m away
+    :param rows: number of actors
+    :param seed: seed of random generator
+    :param coordinateDtype: coordinate type of the table
+    :return: LocationsTable
+    '''
+    rng = numpy.random.default_rng(seed)
+    mapGrid = MapGrid(1000, 10, {}, 48.70, 48.71, 21.23, 21.24)
+    table = LocationsTable(mapGrid, rows, coordinateDtype)
+    table.insertNewActors([BenchmarkActor(id) for id in range(rows)])
+    table.position[:rows, 0] = 48.70 + rng.random(rows) * 0.01
+    table.position[:rows, 1] = 21.23 + rng.random(rows) * 0.01
+    table.target[:rows, 0] = table.position[:rows, 0] + (rng.random(rows) - 0.5) * 0.002
+    table.target[:rows, 1] = table.position[:rows, 1] + (rng.random(rows) - 0.5) * 0.002
+    table.speed[:rows] = 1 + rng.random(rows) * 15
+    return table
+
+
+def measure(backend, table, repeats):
+    # first call is not measured, it includes compilation of numba functions and data transfers
+    runWalkingKernel(backend, copy.deepcopy(table), walking_kernel)
+    durations = []
+    for i in range(repeats):
+        work = copy.deepcopy(table)
+        start = time.perf_counter()
+        runWalkingKernel(backend, work, walking_kernel)
+        durations.append(time.perf_counter() - start)
+    return min(durations), work
+
+
+def runBenchmark(actorCounts, repeats=5):
+    backends = [MovementBackend.NUMPY, MovementBackend.NUMBA_PARALLEL]
+    if cuda.is_available():
+        backends.append(MovementBackend.CUDA)
+
+    for coordinateDtype in [numpy.float64, numpy.float32]:
+        print(f"coordinates: {numpy.dtype(coordinateDtype).name}")
+        print(f"{'actors':>10} {'table size':>12} " + " ".join(f"{backend.value:>15}" for backend in backends))
+        for actors in actorCounts:
+            table = createTable(actors, coordinateDtype=coordinateDtype)
+            results = {}
+            reference = None
+            for backend in backends:
+                duration, moved = measure(backend, table, repeats)
+                results[backend] = duration
+                if reference is None:
+                    reference = moved
+                elif not numpy.allclose(reference.position[:actors], moved.position[:actors], rtol=0, atol=1e-6):
+                    print(f"WARNING backend {backend.value} differs from {backends[0].value} for {actors} actors")
+            print(f"{actors:>10} {table.getNbytes() / 2 ** 20:>10.1f}MB " +
+                  " ".join(f"{results[backend] * 1000:>13.3f}ms" for backend in backends))
+
+
+if __name__ == "__main__":
+    counts = [int(arg) for arg in sys.argv[1:]] or [1000, 10000, 100000, 1000000]
+    runBenchmark(counts)
@@ -39,12 +39,11 @@ class RssCalculator:
 
     def getRssAtLocation(self, location):
 
-        nearBTSs = self.mapGrid.getClosestActorsFromV2(0, self.actorCollections, location)
-        closestBTS = self.com.getClosestActorFromList(location,nearBTSs)
-        distance = self.com.getReal2dDistance(location, closestBTS.getLocation())
+        closestBTS, distance = self.mapGrid.getNearestActors(1, self.actorCollections, location)[0]
+        btsLocation = closestBTS.getLocationView()
 
         log10_f = math.log10(closestBTS.Tx_frequency)
-        log10_hb = math.log10(closestBTS.getLocation().getAltitude())
+        log10_hb = math.log10(btsLocation.getAltitude())
         Tx_dBm = 10 * math.log10(closestBTS.Tx_power) + 30
         correction = 0.8 + (1.1 * log10_f - 0.7) * location.getAltitude() - 1.56 * log10_f
         path_loss_hata = 69.55 + 26.16 * log10_f - 13.82 * log10_hb - correction + \
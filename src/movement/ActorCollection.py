@@ -3,10 +3,12 @@ import json
 from src.city.ZoneType import ZoneType
 from src.common.CommonFunctions import CommonFunctions
 from src.common.FemtocellLoader import FemtocellLoader
+from src.city.grid.StaticActorIndex import StaticActorIndex
 from src.common.Location import Location
 from src.movement.LocationsTable import LocationsTable
 from src.movement.movementStrategies.MovementStrategyFactory import MovementStrategyFactory
 from src.movement.movementStrategies.MovementStrategyType import MovementStrategyType
+from src.movement.movementStrategies.MovementBackend import MovementBackend
 from src.placeable.movable.Drone import Drone
 from src.placeable.movable.Movable import Movable
 from src.placeable.movable.MovementActivity import MovementActivity
@@ -24,7 +26,8 @@ from src.placeable.stationary.Attractor import Attractor
 
 class ActorCollection:
 
-    def __init__(self, name, map, ableOfMovement, movementStrategy, mapGrid, secondsPerTick):
+    def __init__(self, name, map, ableOfMovement, movementStrategy, mapGrid, secondsPerTick,
+                 movementBackend=MovementBackend.CUDA):
         self.name = name
         self.map = map
         self.ableOfMovement = ableOfMovement
@@ -32,11 +35,14 @@ class ActorCollection:
         self.actorSet = {}
         self.mapGrid = mapGrid
         self.secondsPerTick = secondsPerTick
+        self.movementBackend = movementBackend
         self.movementStrategy = MovementStrategyFactory().getStrategy(movementStrategy, self.locationsTable,
-                                                                      self.actorSet, self.map, self.mapGrid)
+                                                                      self.actorSet, self.map, self.mapGrid,
+                                                                      self.movementBackend)
         self.attractors = []
         self.guiEnabled = False
         self.com = CommonFunctions()
+        self.staticIndex = None
 
     def setGuiEnabled(self, value: bool) -> 'ActorCollection':
         self.guiEnabled = value
@@ -141,7 +147,8 @@ class ActorCollection:
         locationPredictor = LocationPredictor()
         return locationPredictor.predictLocationsForNextIterations(self.map, self.getActorsInDestinations(),
                                                                           self.actorSet, self.secondsPerTick,
-                                                                          nuOfIterations, movementBackwardsAllowed)
+                                                                          nuOfIterations, movementBackwardsAllowed,
+                                                                          self.movementBackend)
 
     def addPlaceables(self, placeables) -> 'ActorCollection':
         """
@@ -263,6 +270,23 @@ class ActorCollection:
             features.append(movable.getGeoStruct())
         return features
 
+    def getPositions(self):
+        """
+        @return: (N,2) view of latitudes and longitudes of all actors of this collection (no copy), rows are aligned
+        with getIds()
+        """
+        return self.locationsTable.getPositions()
+
+    def getIds(self):
+        return self.locationsTable.getIds()
+
+    def getLocationsFor(self, ids):
+        """
+        @param ids: ids of actors of this collection
+        @return: (len(ids),2) array of latitudes and longitudes of given actors
+        """
+        return self.locationsTable.getPositionsOf([self.actorSet[int(id)].tableRow for id in ids])
+
     def getActorsAtIntersections(self):
         return list(map(self.actorSet.get, self.locationsTable.getIdsAtIntersections()))
 
@@ -276,11 +300,21 @@ class ActorCollection:
         return self
 
     def getMovablesAtGridXY(self, x, y):
-        ids = self.locationsTable.getIdsAtGridXY(x, y)
-        movables = []
-        for id in ids:
-            movables.append(self.actorSet[id])
-        return movables
+        return [self.actorSet[id] for id in self.locationsTable.getIdsAtGridXY(x, y).tolist()]
+
+    def getStaticIndex(self):
+        """
+        :return: StaticActorIndex of actors of the collection (built on first use and after actors are added), None
+        if the collection is able of movement
+        """
+        if self.ableOfMovement:
+            return None
+        if self.staticIndex is None or self.staticIndex.locationsVersion != self.locationsTable.locationsVersion:
+            self.staticIndex = StaticActorIndex(self.locationsTable)
+        return self.staticIndex
+
+    def getActorsForRows(self, rows):
+        return [self.actorSet[id] for id in self.locationsTable.ids[rows].tolist()]
 
     def attractorEffects(self) -> 'ActorCollection':
         global DATETIME
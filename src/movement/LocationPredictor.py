@@ -6,6 +6,7 @@ from src.common.UniqueID import UniqueID
 from src.movement.LocationsTable import LocationsTable
 from src.movement.movementStrategies.MovementStrategyFactory import MovementStrategyFactory
 from src.movement.movementStrategies.MovementStrategyType import MovementStrategyType
+from src.movement.movementStrategies.MovementBackend import MovementBackend
 from src.placeable.movable.Movable import Movable
 from src.common.SimulationClock import *
 import json
@@ -57,7 +58,8 @@ class LocationPredictor:
         self.comm = CommonFunctions()
 
     def predictLocationsForNextIterations(self, map: Map, actorsAtDestinations, actorSet, secondsPerTick,
-                                                 iterationsCount, movementBackwardsAllowed):
+                                                 iterationsCount, movementBackwardsAllowed,
+                                                 movementBackend=MovementBackend.CUDA):
 
         # self.comm.appendToFile("NewRoutesMethod", f"\n\n---- {getDateTime()} ----------------------------------------\n")
         predictions = []
@@ -94,6 +96,9 @@ class LocationPredictor:
                 # raise ValueError("There might be issue with a prediction because only 1 possible route was found")
 
         # each possible target of each actor will be inserted into location table
+        actors = []
+        targetLocations = []
+        routeIndexes = []
         for actorId, possibleRoutes in possibleRoutesByActorId_dict.items():
             # chosen actor is get
             actor = actorSet[actorId]
@@ -101,40 +106,33 @@ class LocationPredictor:
             # each of his targets is written into table
             routeIndex = 0
             for route in possibleRoutes:
-                rowNumber = locationsTable.insertNewRow(actor,
-                                                        actor.getLocation(),
-                                                        route.pop(0),
-                                                        # route is modified in the process (pop of next location)
-                                                        actor.getSpeed(),
-                                                        routeIndex
-                                                        )
-                # if(actor.getLocation().equlsWithLocation(actor.getTargetLocation())):
-                #     newTargetLocation = self.popNextTargetLocationForAgent(possibleRoutesByActorId_dict,
-                #                                                            actor.id,
-                #                                                            routeIndex)
-                #     locationsTable.setTargetLocation(rowNumber, newTargetLocation)
-                #     print(
-                #     f"WARNING agent {actor.id} was at destination! setting new target{newTargetLocation.toJson()}")
-
-                locationsTable.setTargetReached(rowNumber, False)
+                actors.append(actor)
+                # route is modified in the process (pop of next location)
+                targetLocations.append(route.pop(0))
+                routeIndexes.append(routeIndex)
                 routeIndex = routeIndex + 1
+        # all rows are inserted at once, target reached is False for new rows
+        locationsTable.insertNewRows(actors,
+                                     [actor.getLocation() for actor in actors],
+                                     targetLocations,
+                                     [actor.getSpeed() for actor in actors],
+                                     routeIndexes)
         # locations table should be ready by now
 
-        if (locationsTable.table.shape[0] == 0):
+        if (locationsTable.rows == 0):
             pass
             # print(f"locationsTable is empty, therefore no cuda simulation: {locationsTable.table}")
         else:
             # print(f"locationsTable that is sent to cuda kernel: {locationsTable.table}")
             movementStrategy = MovementStrategyFactory().getStrategy(
                 MovementStrategyType.RANDOM_INTERSECTION_WAYPOINT_CITY_CUDA, locationsTable,
-                actorSet, map, map.mapGrid)
+                actorSet, map, map.mapGrid, movementBackend)
 
             for iteration in range(0, iterationsCount):
                 timestamp = timestamp + timedelta(seconds=secondsPerTick)
                 movementStrategy.move()
 
-                num_rows, num_cols = locationsTable.table.shape
-                for rowIndex in range(0, num_rows):
+                for rowIndex in range(0, locationsTable.rows):
                     prediction = LocationPrediction()
                     prediction.id = UniqueID().getId()
                     prediction.agent = actorSet[locationsTable.getId(rowIndex)]
@@ -2,142 +2,341 @@ import random
 
 import numpy
 
+from src.city.grid.GridCellIndex import GridCellIndex
 from src.city.grid.MapGrid import MapGrid
 from src.common.Location import Location
+from src.common.LocationView import LocationView
 from src.placeable.movable.Movable import Movable
 
 
 class LocationsTable:
 
-    def __init__(self, mapGrid: MapGrid):
+    def __init__(self, mapGrid: MapGrid, initialCapacity=64, coordinateDtype=numpy.float64):
+        """
+        Table of locations of actors stored as separate typed columns (struct of arrays)
+        @param mapGrid: grid used to calculate grid coordinates of actors
+        @param initialCapacity: number of preallocated rows
+        @param coordinateDtype: numpy.float64 or numpy.float32 (coordinates, altitude and speed)
+        """
         self.columns = 18
+        # number of rows in use, storage behind them is preallocated and grows by doubling its capacity
         self.rows = 0
-        self.table = numpy.empty((self.rows, self.columns))
+        self.coordinateDtype = numpy.dtype(coordinateDtype)
         self.mapGrid = mapGrid
 
-    #     TABLE STRUCTURE
+        # grid constants are the same for every row
+        self.latStep = mapGrid.latStep
+        self.latMin = mapGrid.latmin
+        self.lonStep = mapGrid.lonStep
+        self.lonMin = mapGrid.lonmin
+
+        capacity = max(1, initialCapacity)
+        self.position = numpy.zeros((capacity, 3), dtype=self.coordinateDtype)
+        self.target = numpy.zeros((capacity, 3), dtype=self.coordinateDtype)
+        self.speed = numpy.zeros(capacity, dtype=self.coordinateDtype)
+        self.targetReached = numpy.zeros(capacity, dtype=bool)
+        self.grid = numpy.zeros((capacity, 2), dtype=numpy.int32)
+        self.ids = numpy.zeros(capacity, dtype=numpy.int64)
+        self.atIntersection = numpy.zeros(capacity, dtype=bool)
+        self.routeIndex = numpy.zeros(capacity, dtype=numpy.int32)
+        self.targetOsmnxNode = numpy.full(capacity, -1, dtype=numpy.int64)
+
+        # incremented whenever locations may have changed, cell index is rebuilt lazily for a new version
+        self.locationsVersion = 0
+        self.gridCellIndex = GridCellIndex(mapGrid.rows)
+
+    #     COLUMNS                                      LEGACY TABLE STRUCTURE (getTable)
     #
-    # 0 current latitude
-    # 1 current longitude
-    # 2 current altitude
-    # 3 target latitude
-    # 4 target longitude
-    # 5 target altitude
-    # 6 speed
-    # 7 target reached ?
-    # 8 current grid x-coordinate
-    # 9 current grid y-coordinate
-    # 10 id
-    # 11 latStep
-    # 12 latMin
-    # 13 lonStep
-    # 14 lonMin
-    # 15 atIntersection?
-    # 16 routeIndex (for prediction functionality)
-    # 17 targetOsmnxNodeId
-
+    # position[:, 0..2]   current lat, lon, alt        0, 1, 2
+    # target[:, 0..2]     target lat, lon, alt         3, 4, 5
+    # speed                                            6
+    # targetReached       bool                         7
+    # grid[:, 0..1]       current grid x, y (int32)    8, 9
+    # ids                 int64                        10
+    # latStep, latMin, lonStep, lonMin  (constants)    11, 12, 13, 14
+    # atIntersection      bool (isWaiting for persons) 15
+    # routeIndex          int32 (prediction)           16
+    # targetOsmnxNode     int64, -1 = no node          17
+
+    def getColumnNames(self):
+        return ['position', 'target', 'speed', 'targetReached', 'grid', 'ids', 'atIntersection', 'routeIndex',
+                'targetOsmnxNode']
+
+    def getNbytes(self):
+        return sum(getattr(self, name)[:self.rows].nbytes for name in self.getColumnNames())
 
     def getId(self, row):
-        return self.table[row, 10]
+        return self.ids[row]
 
     def setId(self, row, id):
-        self.table[row, 10] = id
+        self.ids[row] = id
 
     def getLocation(self, row):
-        location = Location(self.table[row, 0], self.table[row, 1], self.table[row, 2])
-        location.setGridCoordinates(int(self.table[row, 8]), int(self.table[row, 9]))
+        position = self.position[row]
+        location = Location(float(position[0]), float(position[1]), float(position[2]))
+        location.setGridCoordinates(int(self.grid[row, 0]), int(self.grid[row, 1]))
         return location
 
+    def getLocationView(self, row) -> LocationView:
+        return LocationView(self, row)
+
+    def getPositions(self):
+        """
+        @return: (N,2) view of latitudes and longitudes of rows in use, no data are copied
+        """
+        return self.position[:self.rows, :2]
+
+    def getPositionsOf(self, rows):
+        """
+        @param rows: row numbers
+        @return: (len(rows),2) array of latitudes and longitudes of given rows
+        """
+        return self.position[numpy.asarray(rows, dtype=int), :2]
+
+    def getIds(self):
+        """
+        @return: view of ids of rows in use, aligned with getPositions()
+        """
+        return self.ids[:self.rows]
+
+    def markLocationsChanged(self):
+        '''
+        has to be called after position/grid columns are modified directly (movement strategies and backends)
+        '''
+        self.locationsVersion = self.locationsVersion + 1
+
+    def getGridCellIndex(self) -> GridCellIndex:
+        '''
+        @return: cell index of rows in use, rebuilt if locations changed since the last call
+        '''
+        if self.gridCellIndex.builtForVersion != self.locationsVersion:
+            self.gridCellIndex.build(self.grid[:self.rows])
+            self.gridCellIndex.builtForVersion = self.locationsVersion
+        return self.gridCellIndex
+
     def setLocation(self, row, location: Location):
-        self.table[row, 0] = location.getLatitude()
-        self.table[row, 1] = location.getLongitude()
-        self.table[row, 2] = location.getAltitude()
+        self.locationsVersion = self.locationsVersion + 1
+        self.position[row, 0] = location.getLatitude()
+        self.position[row, 1] = location.getLongitude()
+        self.position[row, 2] = location.getAltitude()
         if (location.getGridCoordinates() != []):
-            self.table[row, 8] = location.getGridXcoor()
-            self.table[row, 9] = location.getGridYcoor()
+            self.grid[row, 0] = location.getGridXcoor()
+            self.grid[row, 1] = location.getGridYcoor()
 
     def getTargetLocation(self, row):
-        return Location(self.table[row, 3], self.table[row, 4], self.table[row, 5], self.table[row, 17])
+        target = self.target[row]
+        return Location(float(target[0]), float(target[1]), float(target[2]), self.getTargetOsmnxNode(row))
 
     def setTargetLocation(self, row, location: Location):
-        self.table[row, 3] = location.getLatitude()
-        self.table[row, 4] = location.getLongitude()
-        self.table[row, 5] = location.getAltitude()
-        self.table[row, 17] = location.getOsmnxNode()
+        self.target[row, 0] = location.getLatitude()
+        self.target[row, 1] = location.getLongitude()
+        self.target[row, 2] = location.getAltitude()
+        self.targetOsmnxNode[row] = self.toStoredNode(location.getOsmnxNode())
+
+    def getTargetOsmnxNode(self, row):
+        node = self.targetOsmnxNode[row]
+        if node < 0:
+            return None
+        return int(node)
+
+    def toStoredNode(self, node):
+        if node is None or node != node:
+            return -1
+        return node
 
     def getTargetReached(self, row):
-        return self.table[row, 7]
+        return self.targetReached[row]
 
     def setTargetReached(self, row, boolValue):
-        self.table[row, 7] = boolValue
+        self.targetReached[row] = boolValue
 
     def getIsAtIntersection(self, row):
-        # print(f"getting value is at intersection for row {row} - {self.table[row, 15]}")
-        return self.table[row, 15]
+        return self.atIntersection[row]
 
     def setIsAtIntersection(self, row, boolValue):
-        # print(f"setting is at intersection for row {row} to {boolValue}")
-        self.table[row, 15] = boolValue
-        # self.getIsAtIntersection(row)
+        self.atIntersection[row] = boolValue
+
+    def getCapacity(self):
+        return len(self.ids)
+
+    def ensureCapacity(self, rows):
+        """
+        makes sure that storage can hold given number of rows, capacity is doubled so that inserts are amortized O(1)
+        @param rows: required number of rows
+        """
+        capacity = self.getCapacity()
+        if rows <= capacity:
+            return
+        while capacity < rows:
+            capacity = capacity * 2
+        for name in self.getColumnNames():
+            column = getattr(self, name)
+            grown = numpy.zeros((capacity,) + column.shape[1:], dtype=column.dtype)
+            grown[:self.rows] = column[:self.rows]
+            setattr(self, name, grown)
+
+    def appendRows(self, count):
+        """
+        reserves given number of new rows filled with default values
+        @param count: number of rows
+        @return: index of the first new row
+        """
+        firstRow = self.rows
+        self.ensureCapacity(self.rows + count)
+        newRows = slice(firstRow, firstRow + count)
+        for name in self.getColumnNames():
+            getattr(self, name)[newRows] = 0
+        self.targetOsmnxNode[newRows] = -1
+        self.rows = self.rows + count
+        self.locationsVersion = self.locationsVersion + 1
+        return firstRow
 
     def insertNewActor(self, movable: Movable):
-        rowNumber = len(self.table)
-
-        self.table = numpy.vstack([self.table,
-                                   [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, movable.id, self.mapGrid.latStep, self.mapGrid.latmin,
-                                    self.mapGrid.lonStep, self.mapGrid.lonmin, False, 0, 0]])
+        rowNumber = self.appendRows(1)
+        self.ids[rowNumber] = movable.id
         return rowNumber
 
-    def insertNewRow(self, movable: Movable, currentLocation: Location, targetLocation: Location, speed, routeIndex):
-        rowNumber = len(self.table)
+    def insertNewActors(self, movables):
+        """
+        inserts all movables at once
+        @param movables: list of Movables
+        @return: range of row numbers, in the same order as movables
+        """
+        firstRow = self.appendRows(len(movables))
+        self.ids[firstRow:self.rows] = [movable.id for movable in movables]
+        return range(firstRow, self.rows)
 
-        self.table = numpy.vstack([self.table,
-                                   [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, movable.id, self.mapGrid.latStep, self.mapGrid.latmin,
-                                    self.mapGrid.lonStep, self.mapGrid.lonmin, False, routeIndex, 0]])
+    def insertNewRow(self, movable: Movable, currentLocation: Location, targetLocation: Location, speed, routeIndex):
+        rowNumber = self.insertNewActor(movable)
+        self.routeIndex[rowNumber] = routeIndex
         self.setLocation(rowNumber, currentLocation)
         self.setTargetLocation(rowNumber, targetLocation)
         self.setSpeed(rowNumber, speed)
         return rowNumber
 
+    def insertNewRows(self, movables, currentLocations, targetLocations, speeds, routeIndexes):
+        """
+        bulk version of insertNewRow, all arguments are lists of the same length
+        @return: range of row numbers
+        """
+        firstRow = self.appendRows(len(movables))
+        rows = slice(firstRow, self.rows)
+        if len(movables) == 0:
+            return range(firstRow, self.rows)
+
+        self.ids[rows] = [movable.id for movable in movables]
+        self.routeIndex[rows] = routeIndexes
+        self.speed[rows] = speeds
+        self.position[rows] = [[location.getLatitude(), location.getLongitude(), location.getAltitude()]
+                               for location in currentLocations]
+        for i, location in enumerate(currentLocations):
+            if (location.getGridCoordinates() != []):
+                self.grid[firstRow + i] = location.getGridCoordinates()
+        self.target[rows] = [[location.getLatitude(), location.getLongitude(), location.getAltitude()]
+                             for location in targetLocations]
+        self.targetOsmnxNode[rows] = [self.toStoredNode(location.getOsmnxNode()) for location in targetLocations]
+        return range(firstRow, self.rows)
+
+    def deleteRows(self, rows):
+        """
+        removes rows from the table, remaining rows are compacted and keep their order
+        @param rows: row numbers to be removed
+        @return: array that maps old row number to the new one (-1 for removed rows), tableRow of Placeables
+        that are kept in the table has to be updated with it
+        """
+        keep = numpy.ones(self.rows, dtype=bool)
+        keep[numpy.asarray(rows, dtype=int)] = False
+        remainingRows = numpy.count_nonzero(keep)
+        newRowNumbers = numpy.full(self.rows, -1, dtype=int)
+        newRowNumbers[keep] = numpy.arange(remainingRows)
+        for name in self.getColumnNames():
+            column = getattr(self, name)
+            column[:remainingRows] = column[:self.rows][keep]
+        self.rows = remainingRows
+        self.locationsVersion = self.locationsVersion + 1
+        return newRowNumbers
+
     def getSpeed(self, row):
-        speed = self.table[row, 6]
+        speed = self.speed[row]
         return speed
 
     def setSpeed(self, row, value):
-        self.table[row, 6] = value
+        self.speed[row] = value
+
+    def getRowNumbersInDestinations(self):
+        return numpy.flatnonzero(self.targetReached[:self.rows])
 
     def getRowsInDestinations(self):
-        rows = self.table[self.table[:, 7] == 1]
-        return rows
+        return self.getTable()[self.getRowNumbersInDestinations()]
 
     def getIdsInDestinations(self):
         # return IDs of walkables from rows
-        return self.getRowsInDestinations()[:, [10]].ravel()
+        return self.ids[:self.rows][self.targetReached[:self.rows]]
+
+    def getRowNumbersAtIntersections(self):
+        return numpy.flatnonzero(self.atIntersection[:self.rows])
 
     def getRowsAtIntersections(self):
-        rows = self.table[self.table[:, 15] == 1]
-        return rows
+        return self.getTable()[self.getRowNumbersAtIntersections()]
 
     def getRouteIndex(self, row):
-        return int(self.table[row, 16])
+        return int(self.routeIndex[row])
 
     def getIdsAtIntersections(self):
-        return self.getRowsAtIntersections()[:, [10]].ravel()
+        return self.ids[:self.rows][self.atIntersection[:self.rows]]
 
     def getTable(self):
-        return self.table
+        """
+        materializes rows in the legacy 18 column float64 layout (see comment above), result is a copy
+        """
+        table = numpy.empty((self.rows, self.columns))
+        table[:, 0:3] = self.position[:self.rows]
+        table[:, 3:6] = self.target[:self.rows]
+        table[:, 6] = self.speed[:self.rows]
+        table[:, 7] = self.targetReached[:self.rows]
+        table[:, 8:10] = self.grid[:self.rows]
+        table[:, 10] = self.ids[:self.rows]
+        table[:, 11] = self.latStep
+        table[:, 12] = self.latMin
+        table[:, 13] = self.lonStep
+        table[:, 14] = self.lonMin
+        table[:, 15] = self.atIntersection[:self.rows]
+        table[:, 16] = self.routeIndex[:self.rows]
+        targetNodes = self.targetOsmnxNode[:self.rows]
+        table[:, 17] = numpy.where(targetNodes < 0, numpy.nan, targetNodes)
+        return table
+
+    def setTable(self, table):
+        """
+        replaces content of the table with rows in the legacy 18 column layout
+        """
+        table = numpy.asarray(table, dtype=float).reshape(-1, self.columns)
+        self.rows = 0
+        self.appendRows(len(table))
+        rows = slice(0, self.rows)
+        self.position[rows] = table[:, 0:3]
+        self.target[rows] = table[:, 3:6]
+        self.speed[rows] = table[:, 6]
+        self.targetReached[rows] = table[:, 7] != 0
+        self.grid[rows] = table[:, 8:10]
+        self.ids[rows] = table[:, 10]
+        self.atIntersection[rows] = table[:, 15] != 0
+        self.routeIndex[rows] = table[:, 16]
+        targetNodes = table[:, 17]
+        self.targetOsmnxNode[rows] = numpy.where(numpy.isnan(targetNodes), -1, targetNodes)
+        self.locationsVersion = self.locationsVersion + 1
+
+    table = property(getTable, setTable)
 
     def getIdsAtGridXY(self, x, y):
-        # rows = self.table[numpy.where(self.table[:, 8] == x)]
-        # rows = rows[numpy.where(rows[:, 9] == y)]
-        # return rows[:, [10]].ravel()
-
-        rows = self.table[self.table[:, 8] == x]
-        rows = rows[rows[:, 9] == y]
-        return rows[:, [10]].flatten()
+        index = self.getGridCellIndex()
+        if index.isInside(x, y):
+            return self.ids[index.getRowsAt(x, y)]
+        grid = self.grid[:self.rows]
+        return self.ids[:self.rows][(grid[:, 0] == x) & (grid[:, 1] == y)]
 
     def getAllIds(self):
-        return self.table[:, [10]].flatten()
+        return self.ids[:self.rows].copy()
 
     def getAllIdsShuffled(self):
-        return random.shuffle(self.table[:, [10]].flatten())
+        return random.shuffle(self.getAllIds())
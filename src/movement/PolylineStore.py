@@ -0,0 +1,162 @@
+import math
+
+import numpy
+
+
+class PolylineStore:
+
+    def __init__(self, latOrigin, lonOrigin, initialCapacity=1024):
+        """
+        Routes of all rows of a LocationsTable stored as polylines projected to a local planar (east, north) system
+        in metres. Every polyline point keeps its arc length, arc lengths grow across all stored routes (routes are
+        separated by a gap), so a single searchsorted finds the current segment of every row at once. Replaced routes
+        are left in place as garbage and the arrays are compacted once there is more garbage than live points.
+        @param latOrigin: latitude of the origin of projection (center of the map)
+        @param lonOrigin: longitude of the origin of projection
+        @param initialCapacity: number of preallocated points
+        """
+        R = 6371000
+        self.latOrigin = latOrigin
+        self.lonOrigin = lonOrigin
+        # equirectangular projection, error on a few km wide city map is far below the size of a vehicle
+        self.metresPerLatDegree = R * math.pi / 180
+        self.metresPerLonDegree = self.metresPerLatDegree * math.cos(math.radians(latOrigin))
+        self.routeGap = 1.0
+
+        self.size = 0
+        self.garbage = 0
+        capacity = max(2, initialCapacity)
+        self.east = numpy.zeros(capacity, dtype=numpy.float64)
+        self.north = numpy.zeros(capacity, dtype=numpy.float64)
+        self.arcLength = numpy.zeros(capacity, dtype=numpy.float64)
+
+        # per table row: first and last point of the route, current arc length, active = route not finished
+        self.firstPoint = numpy.zeros(0, dtype=numpy.int64)
+        self.lastPoint = numpy.zeros(0, dtype=numpy.int64)
+        self.arc = numpy.zeros(0, dtype=numpy.float64)
+        self.active = numpy.zeros(0, dtype=bool)
+
+    def getPointColumnNames(self):
+        return ['east', 'north', 'arcLength']
+
+    def getRowColumnNames(self):
+        return ['firstPoint', 'lastPoint', 'arc', 'active']
+
+    def project(self, latitudes, longitudes):
+        east = (numpy.asarray(longitudes, dtype=numpy.float64) - self.lonOrigin) * self.metresPerLonDegree
+        north = (numpy.asarray(latitudes, dtype=numpy.float64) - self.latOrigin) * self.metresPerLatDegree
+        return east, north
+
+    def unproject(self, east, north):
+        return self.latOrigin + north / self.metresPerLatDegree, self.lonOrigin + east / self.metresPerLonDegree
+
+    def ensureRows(self, rows):
+        if rows <= len(self.firstPoint):
+            return
+        capacity = max(rows, 2 * len(self.firstPoint))
+        for name in self.getRowColumnNames():
+            column = getattr(self, name)
+            grown = numpy.zeros(capacity, dtype=column.dtype)
+            grown[:len(column)] = column
+            setattr(self, name, grown)
+
+    def ensureCapacity(self, points):
+        capacity = len(self.east)
+        if points <= capacity:
+            return
+        while capacity < points:
+            capacity = capacity * 2
+        for name in self.getPointColumnNames():
+            column = getattr(self, name)
+            grown = numpy.zeros(capacity, dtype=column.dtype)
+            grown[:self.size] = column[:self.size]
+            setattr(self, name, grown)
+
+    def getNextArcLength(self):
+        if self.size == 0:
+            return 0.0
+        return self.arcLength[self.size - 1] + self.routeGap
+
+    def compact(self):
+        """
+        keeps only routes of active rows, arc lengths are rebuilt from the start (current arcs of rows are shifted)
+        """
+        live = numpy.flatnonzero(self.active)
+        lengths = self.lastPoint[live] - self.firstPoint[live] + 1
+        newFirst = numpy.cumsum(lengths) - lengths
+        points = numpy.arange(lengths.sum()) + numpy.repeat(self.firstPoint[live] - newFirst, lengths)
+
+        # routes keep their relative arc lengths and are placed one after another
+        routeStart = self.arcLength[self.firstPoint[live]]
+        routeEnd = self.arcLength[self.lastPoint[live]]
+        newStart = numpy.cumsum(routeEnd - routeStart + self.routeGap) - (routeEnd - routeStart + self.routeGap)
+        shift = numpy.repeat(newStart - routeStart, lengths)
+
+        self.east[:len(points)] = self.east[points]
+        self.north[:len(points)] = self.north[points]
+        self.arcLength[:len(points)] = self.arcLength[points] + shift
+        self.arc[live] = self.arc[live] + newStart - routeStart
+        self.firstPoint[live] = newFirst
+        self.lastPoint[live] = newFirst + lengths - 1
+        self.size = len(points)
+        self.garbage = 0
+
+    def setRoute(self, row, latitudes, longitudes):
+        """
+        replaces route of the row, row starts at the first point
+        @param row: row of the locations table
+        @param latitudes: latitudes of route points (current location first)
+        @param longitudes: longitudes of route points
+        """
+        self.ensureRows(row + 1)
+        if self.active[row]:
+            self.garbage = self.garbage + int(self.lastPoint[row] - self.firstPoint[row] + 1)
+            self.active[row] = False
+        if self.garbage > self.size - self.garbage:
+            self.compact()
+
+        east, north = self.project(latitudes, longitudes)
+        count = len(east)
+        segmentLengths = numpy.hypot(numpy.diff(east), numpy.diff(north))
+        self.ensureCapacity(self.size + count)
+        points = slice(self.size, self.size + count)
+        self.east[points] = east
+        self.north[points] = north
+        self.arcLength[points] = self.getNextArcLength() + numpy.concatenate(([0.0], numpy.cumsum(segmentLengths)))
+
+        self.firstPoint[row] = self.size
+        self.lastPoint[row] = self.size + count - 1
+        self.arc[row] = self.arcLength[self.size]
+        self.active[row] = True
+        self.size = self.size + count
+
+    def getActiveRows(self, rows):
+        return numpy.flatnonzero(self.active[:rows])
+
+    def advance(self, rows, distances):
+        """
+        moves rows along their routes, there is no trigonometry involved, only an offset increment and a linear
+        interpolation on the segment found by searchsorted
+        @param rows: active rows
+        @param distances: distance to walk for every row (metres)
+        @return: latitudes, longitudes, reached (row arrived to the last point of its route)
+        """
+        end = self.arcLength[self.lastPoint[rows]]
+        arc = numpy.minimum(self.arc[rows] + distances, end)
+        self.arc[rows] = arc
+        reached = arc >= end
+
+        segment = numpy.searchsorted(self.arcLength[:self.size], arc, side='right') - 1
+        segment = numpy.clip(segment, self.firstPoint[rows], numpy.maximum(self.lastPoint[rows] - 1,
+                                                                           self.firstPoint[rows]))
+        nextPoint = numpy.minimum(segment + 1, self.lastPoint[rows])
+        segmentLength = self.arcLength[nextPoint] - self.arcLength[segment]
+        fraction = numpy.divide(arc - self.arcLength[segment], segmentLength, out=numpy.zeros(len(rows)),
+                                where=segmentLength > 0)
+        east = self.east[segment] + (self.east[nextPoint] - self.east[segment]) * fraction
+        north = self.north[segment] + (self.north[nextPoint] - self.north[segment]) * fraction
+
+        self.active[rows[reached]] = False
+        self.garbage = self.garbage + int((self.lastPoint[rows[reached]] - self.firstPoint[rows[reached]] + 1).sum())
+        latitudes, longitudes = self.unproject(east, north)
+        return latitudes, longitudes, reached
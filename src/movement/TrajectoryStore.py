@@ -0,0 +1,240 @@
+import numpy
+
+from src.common.Location import Location
+from src.common.SimulationClock import timestampToMicrosecondsSinceStart
+
+
+class TrajectoryStore:
+
+    def __init__(self, initialCapacity=1024):
+        """
+        Preloaded trajectories of all rows of a LocationsTable kept in one ragged array. Points of a row are stored
+        in a contiguous block sorted by their tick (microseconds since start of the simulation), row keeps offset and
+        length of its block. Replaced blocks are left in place as garbage and the arrays are compacted once there is
+        more garbage than live points.
+        @param initialCapacity: number of preallocated points
+        """
+        # number of points in use (including garbage), storage behind them grows by doubling its capacity
+        self.size = 0
+        self.garbage = 0
+
+        capacity = max(1, initialCapacity)
+        self.ticks = numpy.zeros(capacity, dtype=numpy.int64)
+        self.position = numpy.zeros((capacity, 3), dtype=numpy.float64)
+        self.osmnxNode = numpy.full(capacity, -1, dtype=numpy.int64)
+        self.grid = numpy.zeros((capacity, 2), dtype=numpy.int32)
+        self.hasGrid = numpy.zeros(capacity, dtype=bool)
+
+        # per table row, length 0 = no trajectory, tickStep 0 = ticks are not evenly spaced,
+        # destinationNode -1 = arrivals are not tracked
+        self.offset = numpy.zeros(0, dtype=numpy.int64)
+        self.length = numpy.zeros(0, dtype=numpy.int64)
+        self.firstTick = numpy.zeros(0, dtype=numpy.int64)
+        self.tickStep = numpy.zeros(0, dtype=numpy.int64)
+        self.destinationNode = numpy.zeros(0, dtype=numpy.int64)
+
+    def getPointColumnNames(self):
+        return ['ticks', 'position', 'osmnxNode', 'grid', 'hasGrid']
+
+    def getRowColumnNames(self):
+        return ['offset', 'length', 'firstTick', 'tickStep', 'destinationNode']
+
+    def getNbytes(self):
+        return (sum(getattr(self, name)[:self.size].nbytes for name in self.getPointColumnNames()) +
+                sum(getattr(self, name).nbytes for name in self.getRowColumnNames()))
+
+    def toTick(self, timestamp):
+        return timestampToMicrosecondsSinceStart(timestamp)
+
+    def ensureRows(self, rows):
+        if rows <= len(self.offset):
+            return
+        capacity = max(rows, 2 * len(self.offset))
+        for name in self.getRowColumnNames():
+            column = getattr(self, name)
+            grown = numpy.zeros(capacity, dtype=column.dtype)
+            grown[:len(column)] = column
+            setattr(self, name, grown)
+
+    def ensureCapacity(self, points):
+        capacity = len(self.ticks)
+        if points <= capacity:
+            return
+        while capacity < points:
+            capacity = capacity * 2
+        for name in self.getPointColumnNames():
+            column = getattr(self, name)
+            grown = numpy.zeros((capacity,) + column.shape[1:], dtype=column.dtype)
+            grown[:self.size] = column[:self.size]
+            setattr(self, name, grown)
+
+    def compact(self):
+        """
+        moves blocks of all rows to the beginning of the arrays, garbage left by replaced trajectories is dropped
+        """
+        live = numpy.flatnonzero(self.length > 0)
+        lengths = self.length[live]
+        newOffsets = numpy.cumsum(lengths) - lengths
+        points = numpy.arange(lengths.sum()) + numpy.repeat(self.offset[live] - newOffsets, lengths)
+        for name in self.getPointColumnNames():
+            column = getattr(self, name)
+            column[:len(points)] = column[points]
+        self.offset[live] = newOffsets
+        self.size = len(points)
+        self.garbage = 0
+
+    def clearTrajectory(self, row):
+        if row < len(self.length):
+            self.garbage = self.garbage + int(self.length[row])
+            self.length[row] = 0
+
+    def setTrajectory(self, row, dictionary, destinationNode=None):
+        """
+        replaces trajectory of the row
+        @param row: row of the locations table
+        @param dictionary: {datetime: Location}
+        @param destinationNode: osmnx node at which the row arrives to its destination (see getArrivals)
+        """
+        timestamps = sorted(dictionary)
+        ticks = numpy.fromiter((self.toTick(timestamp) for timestamp in timestamps), dtype=numpy.int64,
+                               count=len(timestamps))
+        locations = [dictionary[timestamp] for timestamp in timestamps]
+        self.setTrajectoryArrays(row, ticks, locations, destinationNode)
+
+    def setTrajectoryArrays(self, row, ticks, locations, destinationNode=None):
+        """
+        @param row: row of the locations table
+        @param ticks: sorted array of ticks
+        @param locations: Location for every tick
+        @param destinationNode: osmnx node at which the row arrives to its destination
+        """
+        self.ensureRows(row + 1)
+        self.clearTrajectory(row)
+        self.destinationNode[row] = -1 if destinationNode is None else destinationNode
+        count = len(ticks)
+        if count == 0:
+            return
+        if self.garbage > self.size - self.garbage:
+            self.compact()
+
+        self.ensureCapacity(self.size + count)
+        points = slice(self.size, self.size + count)
+        self.ticks[points] = ticks
+        self.position[points] = [[location.getLatitude(), location.getLongitude(), location.getAltitude()]
+                                 for location in locations]
+        self.osmnxNode[points] = [-1 if location.getOsmnxNode() is None else location.getOsmnxNode()
+                                  for location in locations]
+        for i, location in enumerate(locations):
+            if location.getGridCoordinates() != []:
+                self.grid[self.size + i] = location.getGridCoordinates()
+                self.hasGrid[self.size + i] = True
+            else:
+                self.hasGrid[self.size + i] = False
+
+        steps = numpy.diff(ticks)
+        self.offset[row] = self.size
+        self.length[row] = count
+        self.firstTick[row] = ticks[0]
+        self.tickStep[row] = steps[0] if count > 1 and steps[0] > 0 and numpy.all(steps == steps[0]) else 0
+        self.size = self.size + count
+
+    def addPoint(self, row, timestamp, location: Location):
+        """
+        inserts (or replaces) single point of the trajectory, whole block of the row is rewritten
+        """
+        tick = self.toTick(timestamp)
+        ticks, locations = [], []
+        destinationNode = None
+        if row < len(self.length):
+            if self.destinationNode[row] >= 0:
+                destinationNode = int(self.destinationNode[row])
+            for point in range(self.offset[row], self.offset[row] + self.length[row]):
+                if self.ticks[point] != tick:
+                    ticks.append(int(self.ticks[point]))
+                    locations.append(self.getPointLocation(point))
+        index = numpy.searchsorted(ticks, tick)
+        ticks.insert(index, tick)
+        locations.insert(index, location)
+        self.setTrajectoryArrays(row, numpy.asarray(ticks, dtype=numpy.int64), locations, destinationNode)
+
+    def getPointLocation(self, point):
+        position = self.position[point]
+        node = self.osmnxNode[point]
+        location = Location(float(position[0]), float(position[1]), float(position[2]),
+                            None if node < 0 else int(node))
+        if self.hasGrid[point]:
+            location.setGridCoordinates(int(self.grid[point, 0]), int(self.grid[point, 1]))
+        return location
+
+    def getPointsAt(self, rows, tick):
+        """
+        finds points of given rows that belong to the tick
+        @param rows: array of table rows
+        @param tick: tick (see toTick)
+        @return: (rows, points) rows that have a point at the tick and indexes of those points
+        """
+        rows = numpy.asarray(rows, dtype=numpy.int64)
+        rows = rows[rows < len(self.length)]
+        rows = rows[self.length[rows] > 0]
+
+        # evenly spaced trajectories are indexed directly, the rest is searched
+        step = self.tickStep[rows]
+        delta = tick - self.firstTick[rows]
+        regular = step > 0
+        index = numpy.full(len(rows), -1, dtype=numpy.int64)
+        index[regular] = numpy.where(delta[regular] % step[regular] == 0, delta[regular] // step[regular], -1)
+        for i in numpy.flatnonzero(~regular):
+            block = self.ticks[self.offset[rows[i]]:self.offset[rows[i]] + self.length[rows[i]]]
+            found = numpy.searchsorted(block, tick)
+            if found < len(block) and block[found] == tick:
+                index[i] = found
+
+        found = (index >= 0) & (index < self.length[rows])
+        return rows[found], self.offset[rows[found]] + index[found]
+
+    def getLocation(self, row, timestamp):
+        """
+        @return: Location of the row at the timestamp or None
+        """
+        rows, points = self.getPointsAt([row], self.toTick(timestamp))
+        if len(points) == 0:
+            return None
+        return self.getPointLocation(points[0])
+
+    def gatherInto(self, locationsTable, tick):
+        """
+        writes locations of all rows of the table that have a point at the tick, grid coordinates are written only
+        for points that had them, as in LocationsTable.setLocation
+        @return: rows that were updated and indexes of their points
+        """
+        rows, points = self.getPointsAt(numpy.arange(locationsTable.rows), tick)
+        locationsTable.markLocationsChanged()
+        locationsTable.position[rows] = self.position[points]
+        withGrid = self.hasGrid[points]
+        locationsTable.grid[rows[withGrid]] = self.grid[points[withGrid]]
+        return rows, points
+
+    def getArrivals(self, rows, points):
+        """
+        @param rows: rows returned by getPointsAt/gatherInto
+        @param points: points returned by getPointsAt/gatherInto
+        @return: rows whose point is their destination node
+        """
+        destinationNode = self.destinationNode[rows]
+        return rows[(destinationNode >= 0) & (self.osmnxNode[points] == destinationNode)]
+
+    def remapRows(self, newRowNumbers):
+        """
+        follows LocationsTable.deleteRows, trajectories of removed rows are dropped
+        @param newRowNumbers: array returned by LocationsTable.deleteRows
+        """
+        newRowNumbers = numpy.asarray(newRowNumbers)
+        old = numpy.arange(min(len(newRowNumbers), len(self.length)))
+        removed = old[newRowNumbers[old] < 0]
+        self.garbage = self.garbage + int(self.length[removed].sum())
+        kept = old[newRowNumbers[old] >= 0]
+        for name in self.getRowColumnNames():
+            column = getattr(self, name)
+            remapped = numpy.zeros_like(column)
+            remapped[newRowNumbers[kept]] = column[kept]
+            setattr(self, name, remapped)
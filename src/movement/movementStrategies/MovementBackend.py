@@ -0,0 +1,6 @@
+from enum import Enum
+
+class MovementBackend(Enum):
+    CUDA = "Cuda"
+    NUMPY = "Numpy"
+    NUMBA_PARALLEL = "NumbaParallel"
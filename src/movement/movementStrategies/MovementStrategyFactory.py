@@ -3,32 +3,38 @@ from src.movement.movementStrategies.PreloadedLocationsStrategy import Preloaded
 from src.movement.movementStrategies.RandomWaypointBlankEnvCuda import RandomWaypointBlankEnvCuda
 from src.movement.movementStrategies.RandomWaypointCity import RandomWaypointCity
 from src.movement.movementStrategies.RandomWaypointCityCuda import RandomWaypointCityCuda
+from src.movement.movementStrategies.RandomWaypointCityPolyline import RandomWaypointCityPolyline
 from src.movement.movementStrategies.RandomIntersectionWaypointCityCuda import RandomIntersectionWaypointCityCuda
 
 from src.movement.movementStrategies.PersonBehaviorCityCuda import PersonBehaviourCityCuda
 from src.movement.movementStrategies.MovementStrategyType import MovementStrategyType
+from src.movement.movementStrategies.MovementBackend import MovementBackend
 
 
 class MovementStrategyFactory:
-    def getStrategy(self, type: MovementStrategyType, locationsTable, actorSet, map, mapGrid):
+    def getStrategy(self, type: MovementStrategyType, locationsTable, actorSet, map, mapGrid,
+                    backend: MovementBackend = MovementBackend.CUDA):
 
         if (type == MovementStrategyType.RANDOM_WAYPOINT_CITY_CUDA):
-            return RandomWaypointCityCuda(locationsTable, actorSet, map, mapGrid, type)
+            return RandomWaypointCityCuda(locationsTable, actorSet, map, mapGrid, type, backend)
 
         if (type == MovementStrategyType.RANDOM_WAYPOINT_CITY):
             return RandomWaypointCity(locationsTable, actorSet, map, mapGrid, type)
 
+        if (type == MovementStrategyType.RANDOM_WAYPOINT_CITY_POLYLINE):
+            return RandomWaypointCityPolyline(locationsTable, actorSet, map, mapGrid, type)
+
         if (type == MovementStrategyType.RANDOM_WAYPOINT_BLANK_ENV_CUDA):
-            return RandomWaypointBlankEnvCuda(locationsTable, actorSet, map, mapGrid, type)
+            return RandomWaypointBlankEnvCuda(locationsTable, actorSet, map, mapGrid, type, backend)
 
         if (type == MovementStrategyType.DRONE_MOVEMENT_CUDA):
-            return DroneMovementCuda(locationsTable, actorSet, map, mapGrid, type)
+            return DroneMovementCuda(locationsTable, actorSet, map, mapGrid, type, backend)
 
         if (type == MovementStrategyType.PERSON_BEHAVIOUR_CITY_CUDA):
-            return PersonBehaviourCityCuda(locationsTable, actorSet, map, mapGrid, type)
+            return PersonBehaviourCityCuda(locationsTable, actorSet, map, mapGrid, type, backend)
 
         if (type == MovementStrategyType.RANDOM_INTERSECTION_WAYPOINT_CITY_CUDA):
-            return RandomIntersectionWaypointCityCuda(locationsTable, actorSet, map, mapGrid, type)
+            return RandomIntersectionWaypointCityCuda(locationsTable, actorSet, map, mapGrid, type, backend)
 
         if (type == MovementStrategyType.PRELOADED_LOCATIONS_STRATEGY):
             return PreloadedLocationsStrategy(locationsTable, actorSet, map, mapGrid, type)
@@ -1,62 +1,39 @@
 from src.common.Location import Location
 from src.movement.movementStrategies.MovementStrategy import MovementStrategy
 from src.common.SimulationClock import *
+from src.movement.TrajectoryStore import TrajectoryStore
 
 from src.placeable.movable.Movable import Movable
 from src.placeable.movable.Person import Person
 
 
 class PreloadedLocationsStrategy(MovementStrategy):
-    preloaded_locations_dict = dict()
 
     def __init__(self, locationsTable, movableSet, map, mapGrid, strategyType):
         super(PreloadedLocationsStrategy, self).__init__(locationsTable, movableSet, map, mapGrid, strategyType)
+        # trajectories are stored per row of the locations table
+        self.trajectoryStore = TrajectoryStore()
 
     def move(self):
         # print("Before move-------\n", self.locationsTable.table)
-        for actorId in self.locationsTable.getAllIds():
-            walkable: Movable = self.movableSet[int(actorId)]
-            walkable.setLocation(self.getPreloadedLocation(walkable, getDateTime()))
+        self.moveAlongTrajectories()
         # print("After move-------\n", self.locationsTable.table)
 
+    def moveAlongTrajectories(self):
+        '''
+        moves every row to its preloaded location for the current time in one pass over the table
+        @return: rows that reached their destination node (only rows preloaded with destinationNode are checked)
+        '''
+        rows, points = self.trajectoryStore.gatherInto(self.locationsTable, self.trajectoryStore.toTick(getDateTime()))
+        arrived = self.trajectoryStore.getArrivals(rows, points)
+        self.locationsTable.targetReached[arrived] = True
+        return arrived
+
     def preloadLocationForWalkable(self, walkable, timestamp, location):
-        if (walkable.id not in self.preloaded_locations_dict):
-            self.preloaded_locations_dict[walkable.id] = dict()
-        self.preloaded_locations_dict[walkable.id][timestamp] = location
+        self.trajectoryStore.addPoint(walkable.tableRow, timestamp, location)
 
-    def preloadLocationsDictForWalkable(self, walkable, dictionary):
-        # if (walkable.id not in self.preloaded_locations_dict):
-        #     self.preloaded_locations_dict[walkable.id] = dict()
-        # self.preloaded_locations_dict[walkable.id] = {**self.preloaded_locations_dict[walkable.id], **dictionary}
-        self.preloaded_locations_dict[walkable.id] = dictionary
+    def preloadLocationsDictForWalkable(self, walkable, dictionary, destinationNode=None):
+        self.trajectoryStore.setTrajectory(walkable.tableRow, dictionary, destinationNode)
 
     def getPreloadedLocation(self, walkable, timestamp):
-        if walkable.id not in self.preloaded_locations_dict:
-            return None
-        if timestamp not in self.preloaded_locations_dict[walkable.id]:
-            return None
-        return self.preloaded_locations_dict[walkable.id][timestamp]
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
+        return self.trajectoryStore.getLocation(walkable.tableRow, timestamp)
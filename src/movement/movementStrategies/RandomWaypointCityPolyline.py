@@ -0,0 +1,57 @@
+import numpy
+
+from src.common.Location import Location
+from src.movement.PolylineStore import PolylineStore
+from src.movement.movementStrategies.MovementStrategy import MovementStrategy
+from src.placeable.movable.Person import Person
+
+
+class RandomWaypointCityPolyline(MovementStrategy):
+
+    def __init__(self, locationsTable, movableSet, map, mapGrid, strategyType):
+        '''
+        Random waypoint movement over the drive graph, like RandomWaypointCityCuda, but whole route is planned at once
+        as a planar polyline (see PolylineStore). Each move() advances every walking row by its speed along the
+        polyline without any trigonometry. Routes returned to the actor collection contain only the destination,
+        nodes in between are followed by the strategy itself.
+        '''
+        super(RandomWaypointCityPolyline, self).__init__(locationsTable, movableSet, map, mapGrid, strategyType)
+        self.polylineStore = PolylineStore((mapGrid.latmin + mapGrid.latmax) / 2,
+                                           (mapGrid.lonmin + mapGrid.lonmax) / 2)
+
+    def move(self):
+        table = self.locationsTable
+        rows = self.polylineStore.getActiveRows(table.rows)
+        if len(rows) == 0:
+            return
+        latitudes, longitudes, reached = self.polylineStore.advance(rows, table.speed[rows])
+        table.markLocationsChanged()
+
+        # rows at the end of the route are moved exactly to their target, grid coordinates are kept as in the kernels
+        table.position[rows, 0] = numpy.where(reached, table.target[rows, 0], latitudes)
+        table.position[rows, 1] = numpy.where(reached, table.target[rows, 1], longitudes)
+        table.targetReached[rows] = reached
+        moved = rows[~reached]
+        table.grid[moved, 0] = numpy.floor_divide(latitudes[~reached] - table.latMin, table.latStep)
+        table.grid[moved, 1] = numpy.floor_divide(longitudes[~reached] - table.lonMin, table.lonStep)
+
+    def getNewRoute(self, walkable):
+        return self.getRouteTo(walkable, self.map.getRandomNode(walkable.getLocation()))
+
+    def getRouteTo(self, walkable, location: Location):
+        current = walkable.getLocation()
+        route = self.map.getRouteBetweenNodes(current, location)
+        if len(route) == 0:
+            route = [location]
+        self.polylineStore.setRoute(walkable.tableRow,
+                                    [current.getLatitude()] + [node.getLatitude() for node in route],
+                                    [current.getLongitude()] + [node.getLongitude() for node in route])
+        return [route[-1]]
+
+    def onDayChange(self, person: Person):
+        '''
+        No activity is needed on day change for this Strategy
+        :param person:
+        :return:
+        '''
+        return
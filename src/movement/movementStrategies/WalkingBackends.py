@@ -0,0 +1,192 @@
+import math
+
+import numpy
+from numba import njit, prange
+
+from src.movement.movementStrategies.MovementBackend import MovementBackend
+
+
+def getKernelArguments(locationsTable):
+    '''
+    :param locationsTable: LocationsTable
+    :return: views of the columns used by walking kernels (rows in use only) followed by grid constants
+    '''
+    rows = locationsTable.rows
+    return (locationsTable.position[:rows], locationsTable.target[:rows], locationsTable.speed[:rows],
+            locationsTable.targetReached[:rows], locationsTable.grid[:rows], locationsTable.atIntersection[:rows],
+            locationsTable.latStep, locationsTable.latMin, locationsTable.lonStep, locationsTable.lonMin)
+
+
+def walkingNumpy(position, target, speed, targetReached, grid, isWaiting, latStep, latMin, lonStep, lonMin,
+                 inclusiveArrival=False, waitingEnabled=False):
+    '''
+    CPU counterpart of walking_kernel from the *Cuda movement strategies. Every row of the table is moved at once
+    with whole-array operations, formulas (including their order of evaluation) are the same as in the kernel, so
+    both backends produce the same locations. Arguments are columns of LocationsTable (see getKernelArguments),
+    they are modified in place.
+    :param inclusiveArrival: target is reached also when the distance to walk equals the distance to the target
+    :param waitingEnabled: rows with isWaiting flag set are not moved at all
+    :return:
+    '''
+    if len(position) == 0:
+        return
+
+    if waitingEnabled:
+        rows = numpy.flatnonzero(~isWaiting)
+        if len(rows) == 0:
+            return
+    else:
+        rows = slice(None)
+
+    # computation is done in float64 also for tables with float32 coordinates
+    lat1 = numpy.asarray(position[rows, 0], dtype=numpy.float64)
+    lon1 = numpy.asarray(position[rows, 1], dtype=numpy.float64)
+    lat2 = numpy.asarray(target[rows, 0], dtype=numpy.float64)
+    lon2 = numpy.asarray(target[rows, 1], dtype=numpy.float64)
+    distanceToWalk = numpy.asarray(speed[rows], dtype=numpy.float64)  # speed actually
+
+    d = distanceToWalk
+    R = 6371000
+    with numpy.errstate(invalid='ignore', divide='ignore'):
+        lat1rad = numpy.radians(lat1)
+        lat2rad = numpy.radians(lat2)
+        dLat = numpy.radians(lat2 - lat1)
+        dLon = numpy.radians(lon2 - lon1)
+
+        a = numpy.sin(dLat / 2) * numpy.sin(dLat / 2) + numpy.cos(lat1rad) * numpy.cos(lat2rad) * numpy.sin(
+            dLon / 2) * numpy.sin(dLon / 2)
+        c = 2 * numpy.arctan2(numpy.sqrt(a), numpy.sqrt(1 - a))
+        distanceBetweenPoints = R * c
+
+        if inclusiveArrival:
+            reached = distanceToWalk >= distanceBetweenPoints
+        else:
+            reached = distanceToWalk > distanceBetweenPoints
+
+        lat1rad = lat1 * math.pi / 180
+        lon1rad = lon1 * math.pi / 180
+        lat2rad = lat2 * math.pi / 180
+        diffLong = (lon2 - lon1) * math.pi / 180
+
+        x = numpy.sin(diffLong) * numpy.cos(lat2rad)
+        y = numpy.cos(lat1rad) * numpy.sin(lat2rad) - (
+                    numpy.sin(lat1rad) * numpy.cos(lat2rad) * numpy.cos(diffLong))
+        initial_bearing = numpy.arctan2(x, y)
+        initial_bearing = initial_bearing * 180 / math.pi
+        brng = ((initial_bearing + 360) % 360) * math.pi / 180
+
+        lat3rad = numpy.arcsin(
+            numpy.sin(lat1rad) * numpy.cos(d / R) + numpy.cos(lat1rad) * numpy.sin(d / R) * numpy.cos(brng))
+        lon3rad = lon1rad + numpy.arctan2(numpy.sin(brng) * numpy.sin(d / R) * numpy.cos(lat1rad),
+                                          numpy.cos(d / R) - numpy.sin(lat1rad) * numpy.sin(lat2rad))
+        lat3 = lat3rad * 180 / math.pi
+        lon3 = lon3rad * 180 / math.pi
+
+        gridX = numpy.floor_divide(lat3 - latMin, latStep)
+        gridY = numpy.floor_divide(lon3 - lonMin, lonStep)
+
+    # rows that reached their target are moved to it, grid coordinates are kept as in the kernel
+    position[rows, 0] = numpy.where(reached, lat2, lat3)
+    position[rows, 1] = numpy.where(reached, lon2, lon3)
+    targetReached[rows] = reached
+    moved = ~reached
+    if waitingEnabled:
+        movedRows = rows[moved]
+    else:
+        movedRows = moved
+    grid[movedRows, 0] = gridX[moved]
+    grid[movedRows, 1] = gridY[moved]
+
+
+@njit(parallel=True, cache=True)
+def walkingNumbaParallel(position, target, speed, targetReached, grid, isWaiting, latStep, latMin, lonStep, lonMin,
+                         inclusiveArrival=False, waitingEnabled=False):
+    '''
+    Compiled multicore counterpart of walking_kernel. Rows are split across cores with prange and each row is
+    updated in a single fused pass (lat/lon, target reached, grid x/y) without temporary arrays. Arguments are the
+    same as for walkingNumpy.
+    :return:
+    '''
+    R = 6371000
+    for pos in prange(position.shape[0]):
+        if waitingEnabled and isWaiting[pos]:
+            continue
+
+        lat1 = numpy.float64(position[pos, 0])
+        lon1 = numpy.float64(position[pos, 1])
+        lat2 = numpy.float64(target[pos, 0])
+        lon2 = numpy.float64(target[pos, 1])
+        distanceToWalk = numpy.float64(speed[pos])  # speed actually
+
+        d = distanceToWalk
+        lat1rad = math.radians(lat1)
+        lat2rad = math.radians(lat2)
+        dLat = math.radians(lat2 - lat1)
+        dLon = math.radians(lon2 - lon1)
+
+        a = math.sin(dLat / 2) * math.sin(dLat / 2) + math.cos(lat1rad) * math.cos(lat2rad) * math.sin(
+            dLon / 2) * math.sin(dLon / 2)
+        c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+        distanceBetweenPoints = R * c
+
+        if inclusiveArrival:
+            reached = distanceToWalk >= distanceBetweenPoints
+        else:
+            reached = distanceToWalk > distanceBetweenPoints
+
+        if reached:
+            position[pos, 0] = lat2
+            position[pos, 1] = lon2
+            targetReached[pos] = True
+        else:
+            targetReached[pos] = False
+            lat1rad = lat1 * math.pi / 180
+            lon1rad = lon1 * math.pi / 180
+            lat2rad = lat2 * math.pi / 180
+            diffLong = (lon2 - lon1) * math.pi / 180
+
+            x = math.sin(diffLong) * math.cos(lat2rad)
+            y = math.cos(lat1rad) * math.sin(lat2rad) - (math.sin(lat1rad) * math.cos(lat2rad) * math.cos(diffLong))
+            initial_bearing = math.atan2(x, y)
+            initial_bearing = initial_bearing * 180 / math.pi
+            brng = ((initial_bearing + 360) % 360) * math.pi / 180
+
+            lat3rad = math.asin(
+                math.sin(lat1rad) * math.cos(d / R) + math.cos(lat1rad) * math.sin(d / R) * math.cos(brng))
+            lon3rad = lon1rad + math.atan2(math.sin(brng) * math.sin(d / R) * math.cos(lat1rad),
+                                           math.cos(d / R) - math.sin(lat1rad) * math.sin(lat2rad))
+            lat3 = lat3rad * 180 / math.pi
+            lon3 = lon3rad * 180 / math.pi
+
+            position[pos, 0] = lat3
+            position[pos, 1] = lon3
+
+            grid[pos, 0] = int((lat3 - latMin) // latStep)
+            grid[pos, 1] = int((lon3 - lonMin) // lonStep)
+
+
+def runWalkingKernel(backend: MovementBackend, locationsTable, cudaKernel, inclusiveArrival=False,
+                     waitingEnabled=False):
+    '''
+    Moves all rows of the locations table with the selected backend
+    :param backend: MovementBackend
+    :param locationsTable: LocationsTable
+    :param cudaKernel: walking_kernel of the calling strategy, used with MovementBackend.CUDA
+    :param inclusiveArrival: has to match the comparison used in cudaKernel
+    :param waitingEnabled: has to match the isWaiting check used in cudaKernel
+    :return:
+    '''
+    if locationsTable.rows == 0:
+        return
+    locationsTable.markLocationsChanged()
+    arguments = getKernelArguments(locationsTable)
+    if backend == MovementBackend.CUDA:
+        threadsperblock = 256
+        blockspergrid = math.ceil(locationsTable.rows / threadsperblock)
+        cudaKernel[blockspergrid, threadsperblock](*arguments)
+    elif backend == MovementBackend.NUMPY:
+        walkingNumpy(*arguments, inclusiveArrival, waitingEnabled)
+    elif backend == MovementBackend.NUMBA_PARALLEL:
+        walkingNumbaParallel(*arguments, inclusiveArrival, waitingEnabled)
+    else:
+        raise ValueError(f"Unknown movement backend: {backend}")
@@ -28,6 +28,18 @@ class Placeable:
     def setLocation(self, loc):
         self.locationsTable.setLocation(self.tableRow, loc)
 
+    def getLocationView(self):
+        '''
+        @return: read-only LocationView of the current location, cheaper than getLocation() when only reading
+        '''
+        return self.locationsTable.getLocationView(self.tableRow)
+
+    def getPosition(self):
+        '''
+        @return: view [latitude, longitude, altitude] of the current location in the locations table
+        '''
+        return self.locationsTable.position[self.tableRow]
+
     def getGeoStruct(self):
         '''
         returns structure of data needed when creating geoJSON representation of this object
@@ -40,13 +52,13 @@ class Placeable:
         properties = {}
         properties["type"] = self.__class__.__name__
         properties["id"] = self.id
-        properties["gridCoordinates"] = self.getLocation().getGridCoordinates()
+        location = self.getLocationView()
+        properties["gridCoordinates"] = location.getGridCoordinates()
         # properties["nearPlaceables"] = self.nearPlaceablesCounter
         data["properties"] = properties
 
         geometry = {}
         geometry["type"] = "Point"
-        location = self.getLocation()
         geometry["coordinates"] = [location.getLongitude(), location.getLatitude(), location.getAltitude()]
         data["geometry"] = geometry
 
@@ -21,8 +21,9 @@ class Attractor(Placeable):
         properties = {}
         properties["type"] = self.__class__.__name__
         properties["id"] = self.id
-        properties["height"] = self.getLocation().getAltitude()
-        properties["gridCoordinates"] = self.getLocation().gridCoordinates
+        location = self.getLocationView()
+        properties["height"] = location.getAltitude()
+        properties["gridCoordinates"] = location.getGridCoordinates()
 
         attractorDetails = {}
         attractorDetails['name'] = self.name
@@ -35,8 +36,7 @@ class Attractor(Placeable):
 
         geometry = {}
         geometry["type"] = "Point"
-        geometry["coordinates"] = [self.getLocation().getLongitude(), self.getLocation().getLatitude(),
-                                   self.getLocation().getAltitude()]
+        geometry["coordinates"] = [location.getLongitude(), location.getLatitude(), location.getAltitude()]
         data["geometry"] = geometry
 
         json_data = data